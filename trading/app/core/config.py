@@ -48,6 +48,12 @@ class Settings(BaseSettings):
 
     UVICORN_HOST: str = "0.0.0.0"  # Default host
     UVICORN_PORT: int = 8080  # Default port
+    UVICORN_LOOP: str = "asyncio"  # asyncio | uvloop | auto (uvloop nếu đã cài)
+
+    # Đo độ trễ event loop (0 = tắt)
+    LOOP_LAG_INTERVAL: float = 0.5
+    LOOP_LAG_WARN_MS: float = 100.0
+    LOOP_LAG_CRITICAL_MS: float = 1000.0
 
     # Logging
     LOG_LEVEL: str = LogLevel.INFO
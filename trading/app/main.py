@@ -4,7 +4,7 @@ from typing import Set
 from colorama import Back
 from fastapi import FastAPI, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
@@ -13,6 +13,8 @@ from app.core.logging import configure_logging
 from app.db import init_db
 from app.schemas.error import APIValidationError, CommonHTTPError
 from app.utils import log
+from app.utils.metrics import metrics
+from app.utils.loop_monitor import LoopLagMonitor
 from app.services import run_services
 from app.routes import graphql_app
 
@@ -21,10 +23,17 @@ from app.routes import graphql_app
 async def lifespan(application: FastAPI):  # noqa
     configure_logging()
     
+    loop_monitor = None
+    if settings.LOOP_LAG_INTERVAL > 0:
+        loop_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL, settings.LOOP_LAG_WARN_MS, settings.LOOP_LAG_CRITICAL_MS)
+        loop_monitor.start()
+
     await init_db.init()
     await run_services()
 
     yield
+    if loop_monitor:
+        await loop_monitor.stop()
     log.info(f"{Back.RED}Chương trình kết thúc")
 
 
@@ -86,6 +95,12 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 app.include_router(graphql_app, prefix="/graphql")
 
 
+# metrics trong process (stream, độ trễ, ...) theo định dạng Prometheus
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics() -> str:
+    return metrics.to_prometheus()
+
+
 # Set all CORS enabled origins
 if settings.CORS_ORIGINS:
     from fastapi.middleware.cors import CORSMiddleware
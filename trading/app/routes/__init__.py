@@ -7,11 +7,12 @@ from app.routes.trading.mutation import TradingMutation
 from app.routes.trading.subscription import TradingSubscription
 from app.routes.users import UserQuery, UserMutation, UserSubscription
 from app.routes.mt5 import MT5Query, MT5Mutation
+from app.routes.metrics import MetricsQuery
 
 # strawberry GraphQL
 
 @strawberry.type
-class Query(TradingQuery, UserQuery, MT5Query):
+class Query(TradingQuery, UserQuery, MT5Query, MetricsQuery):
     @strawberry.field
     def ping(self) -> str:
         return "pong"
@@ -0,0 +1,16 @@
+from typing import List, Optional
+import strawberry
+
+from app.schemas.metrics import MetricType
+from app.utils.metrics import metrics as metrics_registry
+
+
+@strawberry.type
+class MetricsQuery:
+    @strawberry.field
+    def metrics(self, name: Optional[str] = None) -> List[MetricType]:
+        """
+        Metric trong process: số message/s, byte/s của từng stream, histogram độ trễ, ...
+        Lọc theo tên metric (VD: "stream_exchange_latency_us").
+        """
+        return [MetricType(**item) for item in metrics_registry.snapshot(name)]
@@ -0,0 +1,25 @@
+import strawberry
+from typing import Optional
+from strawberry.scalars import JSON
+
+
+@strawberry.type
+class MetricType:
+    """Giá trị hiện tại của một metric trong process (counter / meter / histogram)"""
+    name: str
+    kind: str
+    labels: JSON
+    # counter
+    value: Optional[float] = None
+    # meter: tổng và tốc độ trung bình mỗi giây
+    total: Optional[float] = None
+    rate: Optional[float] = None
+    # histogram (đơn vị theo tên metric, VD: _us = micro giây)
+    count: Optional[int] = None
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+    p999: Optional[float] = None
+    max: Optional[float] = None
@@ -1,5 +1,4 @@
 import asyncio
-import os
 import time
 from datetime import datetime, timedelta, timezone
 import re
@@ -8,10 +7,18 @@ from colorama import Fore
 import httpx
 from websockets import State, connect
 import json
-from typing import List, Dict, Union
+from typing import List, Dict, Optional, Union
 
 from app.utils.log import log
 from app.utils.timeframe import Timeframe, timeframe_to_ms
+from .ws_pool import WebSocketPool, backoff_delay
+from .klines import KlineFrame, KlineFrameBuilder
+from .rest import rest_method
+from .single_flight import coalesce
+
+
+# Các cặp đòn bẩy / token đặc biệt bị loại khỏi ticker_24hr
+EXCLUDED_SYMBOL_PATTERN = re.compile("1000|BEAR|BULL|UP|DOWN|_")
 
 
 class Future:
@@ -21,15 +28,24 @@ class Future:
     url = "wss://fstream.binance.com/ws"
     url_http = "https://fapi.binance.com/fapi/v1"
     
-    def __init__(self, url: str = "wss://fstream.binance.com/ws", url_http: str = "https://fapi.binance.com/fapi/v1"):
+    def __init__(self, url: str = "wss://fstream.binance.com/ws", url_http: str = "https://fapi.binance.com/fapi/v1", pool: Optional[WebSocketPool] = None):
+        """
+        :param url: URL WebSocket API.
+        :param url_http: URL REST API, dùng cho các hàm REST khi gọi qua instance (xem `rest_method`).
+        :param pool: (tùy chọn) `WebSocketPool` dùng thay cho kết nối đơn, tự reconnect và phân tải request weight.
+        """
         self.url = url
         self.url_http = url_http
         self.connection = None
+        self.pool = pool
 
     async def connect(self):
         """
         Kết nối WebSocket.
         """
+        if self.pool:
+            await self.pool.start()
+            return
         self.connection = await connect(self.url)
         log.info(f"{Fore.GREEN}Connected to Binance Future WebSocket")
 
@@ -37,6 +53,9 @@ class Future:
         """
         Ngắt kết nối WebSocket.
         """
+        if self.pool:
+            await self.pool.stop()
+            return
         if self.connection:
             await self.connection.close()
             self.connection = None
@@ -47,12 +66,16 @@ class Future:
             Kiểm tra trạng thái kết nối WebSocket.
             Trả về True nếu kết nối đang mở, ngược lại là False.
             """
+            if self.pool:
+                return self.pool.is_connected()
             return self.connection is not None and self.connection.state == State.OPEN
 
     async def send_request(self, payload: dict) -> dict:
         """
         Gửi yêu cầu qua WebSocket và nhận phản hồi.
         """
+        if self.pool:
+            return await self.pool.send(payload)
         if not self.connection:
             raise RuntimeError("WebSocket connection not established")
 
@@ -129,7 +152,7 @@ class Future:
         :param limit: số trades trả về (mặc định 500, tối đa 1000)
         :return: Danh sách trade (JSON)
         """
-        if not self.connection:
+        if not self.connection and not self.pool:
             raise RuntimeError("WebSocket connection not established")
         payload = {
             "id": int(time.time() * 1000),
@@ -164,7 +187,7 @@ class Future:
         :param limit_per_call: số trade lấy mỗi lần (mặc định 1000)
         :return: List trades trong khoảng thời gian
         """
-        if not self.connection:
+        if not self.connection and not self.pool:
             raise RuntimeError("WebSocket connection not established")
 
         all_trades = []
@@ -203,27 +226,28 @@ class Future:
                     log.error(f"🚨 Max retries reached for {symbol}")
                     break
 
-                # Nếu lỗi policy violation thì disconnect và reconnect
+                # Nếu lỗi policy violation thì reconnect với jittered backoff (pool tự phục hồi kết nối)
                 if "1008" in str(e) or "policy violation" in str(e).lower():
-                    os._exit(1)   # kết thúc process ngay lập tức
-                    await asyncio.sleep(5 * retry)  # exponential backoff
-                    await self.disconnect()
-                    # nghỉ 1 phút 
-                    await asyncio.sleep(60)
-                    await self.connect()
+                    await asyncio.sleep(backoff_delay(retry, base=5, cap=60))
+                    if not self.pool:
+                        await self.disconnect()
+                        await self.connect()
                 else:
-                    await asyncio.sleep(3 * retry)
+                    await asyncio.sleep(backoff_delay(retry, base=3, cap=30))
 
         # 3) Lọc trong khoảng thời gian yêu cầu
         result = [t for t in all_trades if start_time <= t["time"] <= end_time]
         return result
 
-    @staticmethod
+    @rest_method
+    @coalesce("future.klines")
     async def get_klines(
         symbol: str,
         start_time: int,
         end_time: int,
-        timeframe: Timeframe
+        timeframe: Timeframe,
+        *,
+        url_http: str,
     ) -> List[Dict[str, Union[int, float]]]:
         """
         Lấy dữ liệu đồ thị nến từ Binance API trong khoảng thời gian.
@@ -233,7 +257,7 @@ class Future:
         :param timeframe: Khoảng thời gian nến (VD: "1m", "1d").
         :return: Danh sách các nến.
         """
-        url = f"{Future.url_http}/klines"
+        url = f"{url_http}/klines"
         limit = 1000  # Binance API giới hạn 1000 nến mỗi lần truy vấn
         result = []
 
@@ -277,13 +301,114 @@ class Future:
 
         return result
     
-    @staticmethod
-    async def ticker_24hr(stable_coins = ["USDT"]) -> List[Dict[str, Union[str, float]]]:
+    @rest_method
+    async def get_agg_trades(
+        symbol: str,
+        from_id: Optional[int] = None,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 1000,
+        *,
+        url_http: str,
+    ) -> List[dict]:
         """
-        Lấy dữ liệu ticker 24hr từ Binance API.
-        :return: Danh sách các ticker với dữ liệu 24 giờ.
+        Lấy aggregate trades qua REST `/aggTrades` (dùng để bù các aggTrade bị mất khi stream mất kết nối).
+        :param symbol: Cặp tiền (VD: "BTCUSDT").
+        :param from_id: Aggregate trade ID bắt đầu (bao gồm).
+        :param start_time: Thời gian bắt đầu (epoch milliseconds).
+        :param end_time: Thời gian kết thúc (epoch milliseconds).
+        :param limit: Số aggTrade tối đa (tối đa 1000).
+        :return: Danh sách aggTrade dạng {"a", "p", "q", "f", "l", "T", "m"}.
+        """
+        params = {"symbol": symbol, "limit": limit}
+        if from_id is not None:
+            params["fromId"] = from_id
+        if start_time is not None:
+            params["startTime"] = start_time
+        if end_time is not None:
+            params["endTime"] = end_time
+
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{url_http}/aggTrades", params=params)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch aggTrades: {response.text}")
+        return response.json()
+
+    @rest_method
+    @coalesce("future.depth")
+    async def get_depth(symbol: str, limit: int = 1000, *, url_http: str) -> dict:
+        """
+        Lấy snapshot order book qua REST `/depth`.
+        :param symbol: Cặp tiền (VD: "BTCUSDT").
+        :param limit: Số mức giá mỗi phía (5, 10, 20, 50, 100, 500, 1000).
+        :return: {"lastUpdateId", "bids": [[price, qty], ...], "asks": [[price, qty], ...]}.
+        """
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{url_http}/depth", params={"symbol": symbol, "limit": limit})
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Failed to fetch depth: {response.text}")
+        return response.json()
+
+    @rest_method
+    @coalesce("future.klines_frame")
+    async def get_klines_frame(
+        symbol: str,
+        start_time: int,
+        end_time: int,
+        timeframe: Timeframe,
+        *,
+        url_http: str,
+    ) -> KlineFrame:
+        """
+        Giống `get_klines` nhưng giải mã thẳng vào các mảng NumPy có kiểu (xem `KlineFrame`),
+        không giữ list các chuỗi. Nên dùng khi backfill số lượng lớn.
+        :param symbol: Cặp tiền (VD: "BTCUSDT").
+        :param start_time: Thời gian bắt đầu (epoch milliseconds).
+        :param end_time: Thời gian kết thúc (epoch milliseconds).
+        :param timeframe: Khoảng thời gian nến (VD: "1m", "1d").
+        :return: KlineFrame.
+        """
+        url = f"{url_http}/klines"
+        limit = 1000
+        timeframe_ms = timeframe_to_ms(timeframe)
+        builder = KlineFrameBuilder(max((end_time - start_time) // timeframe_ms + 1, 1))
+        interval = Timeframe(timeframe).value
+
+        current_start_time = start_time
+        async with httpx.AsyncClient() as client:
+            while current_start_time < end_time:
+                current_end_time = min(current_start_time + timeframe_ms * limit, end_time)
+                params = {
+                    "symbol": symbol,
+                    "interval": interval,
+                    "startTime": current_start_time,
+                    "endTime": current_end_time,
+                    "limit": limit,
+                }
+
+                response = await client.get(url, params=params)
+                if response.status_code != 200:
+                    raise RuntimeError(f"Failed to fetch klines: {response.text}")
+
+                count = builder.append(response.content)
+                if count == 0:
+                    break
+
+                current_start_time = builder.last_open_time() + timeframe_ms
+                if count < limit:
+                    break
+
+        return builder.build()
+
+    @rest_method
+    @coalesce("future.ticker_24hr")
+    async def ticker_24hr_all(*, url_http: str) -> List[Dict[str, Union[str, float]]]:
         """
-        url = Future.url_http + "/ticker/24hr"
+        Lấy dữ liệu ticker 24hr của tất cả các cặp từ Binance API (không lọc).
+        """
+        url = url_http + "/ticker/24hr"
 
         # Gửi yêu cầu HTTP
         async with httpx.AsyncClient() as client:
@@ -293,24 +418,37 @@ class Future:
         if response.status_code != 200:
             raise RuntimeError(f"Failed to fetch data: {response.text}")
 
+        return response.json()
+
+    @rest_method
+    async def ticker_24hr(stable_coins = ["USDT"], *, url_http: str) -> List[Dict[str, Union[str, float]]]:
+        """
+        Lấy dữ liệu ticker 24hr từ Binance API.
+        Cần truy vấn lặp lại nhiều lần thì dùng `MarketScanner` (cache, không gọi lại API).
+        :return: Danh sách các ticker với dữ liệu 24 giờ.
+        """
+        tickers = await Future.ticker_24hr_all(url_http=url_http)
+
         # Lọc bỏ những cặp mà có  lastQty = 0 và volume=0, nhớ chuyển thành số trước
         # bỏ closeTime quá lâu 1 ngày trước 
         yesterday = (datetime.now(timezone.utc) - timedelta(days=1)).timestamp() * 1000
-        filtered_data = [item for item in response.json() 
-                        if float(item["lastQty"]) != 0.0 
-                        and float(item["volume"]) != 0.0
-                        and not re.search("1000|BEAR|BULL|UP|DOWN|_", item["symbol"])
-                        and item["closeTime"] > yesterday
-                        and any(item["symbol"].endswith(coin) for coin in stable_coins)]
+        stable_coins = tuple(stable_coins)
+        filtered_data = [item for item in tickers 
+                        if item["closeTime"] > yesterday
+                        and item["symbol"].endswith(stable_coins)
+                        and not EXCLUDED_SYMBOL_PATTERN.search(item["symbol"])
+                        and float(item["lastQty"]) != 0.0 
+                        and float(item["volume"]) != 0.0]
         # Trả về kết quả dưới dạng JSON
         return filtered_data
     
-    @staticmethod
-    async def exchangeInfo() -> List[Dict[str, Union[str, float]]]:
+    @rest_method
+    @coalesce("future.exchangeInfo")
+    async def exchangeInfo(*, url_http: str) -> List[Dict[str, Union[str, float]]]:
         """
         Lấy dữ liệu exchangeInfo từ Binance API.
         """
-        url = Future.url_http + "/exchangeInfo"
+        url = url_http + "/exchangeInfo"
 
         # Gửi yêu cầu HTTP
         async with httpx.AsyncClient() as client:
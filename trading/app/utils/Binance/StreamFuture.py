@@ -1,47 +1,115 @@
 import asyncio
 import json
+import time
+import orjson
 from datetime import datetime
 from websockets import State, connect
-from typing import Callable, Coroutine, List
+from collections import deque
+from typing import Callable, Coroutine, Deque, Dict, List, Optional, Set, Tuple
 from colorama import Fore, Style
 from .types import KlineMap
+from .dispatch import Dispatcher, DispatchMode, OverflowPolicy, stream_route_key
+from .events import EventFormat, split_combined
 from .Future import Future
+from .ws_pool import ConnectionLostError, WeightLimiter, backoff_delay
+from .stream_metrics import StreamMetrics, raw_event_time
 
 from app.utils.log import log
+from app.utils.metrics import MetricsRegistry, metrics as metrics_registry
 from app.utils.timeframe import timeframe_to_second, TimeframeEventValue
 
-event_to_stream = {
-    "markPriceUpdate": "markPrice",
-    "depthUpdate": "depth",
-    "trade": "trade",
-    "aggTrade": "aggTrade",
-    "klineUpdate": "kline",  # Ví dụ với mốc thời gian 1 phút
-    "24hrTicker": "24hrTicker",
-    # Bạn có thể thêm nhiều Event Type khác ở đây...
+# Các stream "tất cả symbol" trả về mảng event, nhận diện theo Event Type của phần tử đầu
+array_event_to_stream = {
+    "24hrTicker": "!ticker@arr",
+    "24hrMiniTicker": "!miniTicker@arr",
+    "markPriceUpdate": "!markPrice@arr",
 }
 
 class StreamFuture:
-    def __init__(self, url: str = "wss://fstream.binance.com/ws"):
+    market = "future"  # Nhãn `market` của các metric, tránh trùng stream name giữa Futures và Spot
+
+    def __init__(
+        self,
+        url: str = "wss://fstream.binance.com/ws",
+        queue_size: int = 1000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        concurrency: int = 4,
+        mode: DispatchMode = DispatchMode.CONCURRENT,
+        combined: bool = False,
+        reconnect: bool = True,
+        max_connection_age: float = 23 * 60 * 60,
+        gap_fill: bool = True,
+        url_http: Optional[str] = None,
+        control_batch_size: int = 100,
+        control_rate: float = 5,
+        ack_timeout: float = 10.0,
+        recorder=None,
+        metrics: Optional[MetricsRegistry] = metrics_registry,
+    ):
         """
         Initialize the BinanceStreamFuture class.
         :param url: Base WebSocket URL (default is for Binance futures).
-        """
+        :param queue_size: Max queued messages per (stream, callback) before `overflow_policy` applies.
+        :param overflow_policy: What to do when a callback falls behind (block, drop oldest, conflate latest).
+        :param concurrency: Number of consumer tasks per (stream, callback).
+        :param mode: `DispatchMode.ORDERED` delivers each stream's events to each callback strictly in sequence.
+        :param combined: Use the combined-stream endpoint (`wss://fstream.binance.com/stream`), messages are routed by their `stream` field.
+        :param reconnect: Reconnect with backoff and resubscribe everything when the connection drops.
+        :param max_connection_age: Reconnect proactively after this many seconds, before Binance's 24h forced disconnect (0 to disable).
+        :param gap_fill: After a reconnect, backfill missed aggTrades over REST using the aggregate trade ID sequence.
+        :param url_http: REST URL used by `gap_fill` (default `Future.url_http`).
+        :param control_batch_size: Max streams per SUBSCRIBE/UNSUBSCRIBE message.
+        :param control_rate: Max control messages sent per second (Binance Futures allows 10 incoming messages per second per connection).
+        :param ack_timeout: Seconds to wait for the server to acknowledge a control message.
+        :param recorder: (optional) `StreamRecorder` that stores every received frame for later replay.
+        :param metrics: Registry for per-stream message/byte rates and latency histograms (None to disable).
+        """
+        if combined and url.endswith("/ws"):
+            url = url[:-len("/ws")] + "/stream"
         self.base_url = url
         self.connection = None
         self.subscriptions = {}  # Store active subscriptions {stream_name: [callbacks]}
+        self.dispatcher = Dispatcher(queue_size, overflow_policy, concurrency, mode, metrics=metrics, metric_labels={"market": self.market})
+        self.routes = {}  # Route keys of `/ws` messages {(event, SYMBOL[, interval]): [stream_name]}
+        self.reconnect = reconnect
+        self.max_connection_age = max_connection_age
+        self.gap_fill = gap_fill
+        self.url_http = url_http
+        self.last_agg_ids: Dict[str, int] = {}  # Last aggregate trade ID delivered {stream_name: id}
+        self._held: Dict[str, Deque[Tuple[dict, Optional[str], float]]] = {}  # Live aggTrades held during a backfill
+        self._fills: Set[asyncio.Task] = set()  # Backfills of gaps in the aggTrade sequence
+        self._recovery: Optional[asyncio.Task] = None  # Resubscribe + backfill after a reconnect
+        self._reconnect_attempt = 0
+        self.reconnects = 0
+        self.gap_filled = 0
+        self._closing = False
+        self._supervisor = None
+        self.control_batch_size = control_batch_size
+        self.ack_timeout = ack_timeout
+        self._control_limiter = WeightLimiter(control_rate, 1.0)
+        self._outbox: Deque[Tuple[str, List[str], asyncio.Future]] = deque()  # (method, stream_names, waiter)
+        self._sender: Optional[asyncio.Task] = None
+        self._requests: Dict[int, asyncio.Future] = {}  # Control messages awaiting a reply {id: future}
+        self._next_id = 0
+        self._live: Dict[str, asyncio.Event] = {}  # Set once the server has acknowledged the stream's SUBSCRIBE
+        self.recorder = recorder
+        self.metrics = metrics
+        self._stream_metrics: Dict[str, StreamMetrics] = {}
 
     async def connect(self):
         """
         Connect to the Binance WebSocket.
         """
         self.connection = await connect(self.base_url)
+        self._closing = False
         log.info("Connected to Binance StreamFuture WebSocket")
-        asyncio.create_task(self.on_message())  # Automatically start listening
+        self._supervisor = asyncio.create_task(self._supervise())  # Automatically start listening
 
     async def disconnect(self):
         """
         Disconnect from the Binance WebSocket.
         """
+        self._closing = True
         if self.connection:
             await self.connection.close()
             log.error(f"{Fore.RED}Disconnected from Binance Stream Future WebSocket")
@@ -59,17 +127,36 @@ class StreamFuture:
         """
         return self.connection.state == State.OPEN
     
-    async def subscribe(self, stream_name: str, callback: Callable):
+    async def subscribe(
+        self,
+        stream_name: str,
+        callback: Callable,
+        policy: Optional[OverflowPolicy] = None,
+        mode: Optional[DispatchMode] = None,
+        event_format: Optional[EventFormat] = None,
+    ):
         """
         Subscribe to a stream and add a callback to handle the data.
         :param stream_name: The stream name (e.g., 'btcusdt@depth@100ms').
         :param callback: A function to handle incoming data for this stream.
-        """
-        if stream_name not in self.subscriptions:
-            self.subscriptions[stream_name] = []
-            # Send subscription request to the server
-            await self._send_subscription(stream_name)
+        :param policy: (optional) Overflow policy for this callback, defaults to the instance policy.
+        :param mode: (optional) Dispatch mode for this callback, defaults to the instance mode.
+        :param event_format: (optional) `EventFormat.TYPED` for typed events with numbers already converted,
+            `EventFormat.RAW` for the raw JSON payload without parsing (default: dict).
+        :raises RuntimeError: The server rejected or did not acknowledge the SUBSCRIBE. The stream stays registered
+            and is resubscribed on the next reconnect.
+        :raises ConnectionLostError: The connection was replaced before the SUBSCRIBE was acknowledged, the stream
+            is resubscribed by the reconnect.
+        """
+        new = stream_name not in self.subscriptions
+        if new:
+            self._register(stream_name)
         self.subscriptions[stream_name].append(callback)
+        self.dispatcher.add(stream_name, callback, policy=policy, mode=mode, event_format=event_format)
+        if new:
+            # Send subscription request to the server and wait for its acknowledgement
+            await self._control("SUBSCRIBE", [stream_name])
+            log.info(f"Subscribed to {stream_name}")
         
     async def subscribe_multiple(self, stream_names: List[str], callback: Callable):
         """
@@ -77,18 +164,17 @@ class StreamFuture:
         :param stream_names: A list of stream names (e.g., ['btcusdt@depth@100ms', 'ethusdt@trade']).
         :param callback: A function to handle incoming data for these streams.
         """
-        message = {
-            "method": "SUBSCRIBE",
-            "params": stream_names,
-            "id": 1
-        }
-        await self.connection.send(json.dumps(message))
-        log.info(f"Subscribed to {stream_names}")
-        
+        new_streams = []
         for stream_name in stream_names:
             if stream_name not in self.subscriptions:
-                self.subscriptions[stream_name] = []
+                self._register(stream_name)
+                new_streams.append(stream_name)
             self.subscriptions[stream_name].append(callback)
+            self.dispatcher.add(stream_name, callback)
+
+        if new_streams:
+            await self._control("SUBSCRIBE", new_streams)
+        log.info(f"Subscribed to {stream_names}")
 
     async def unsubscribe(self, stream_name: str, callback: Callable = None):
         """
@@ -96,53 +182,210 @@ class StreamFuture:
         :param stream_name: The stream name (e.g., 'btcusdt@depth@100ms').
         :param callback: The callback to remove (if None, unsubscribe from stream completely).
         """
-        if stream_name in self.subscriptions:
-            if callback:
-                self.subscriptions[stream_name].remove(callback)
-                if not self.subscriptions[stream_name]:  # If no callbacks remain
-                    del self.subscriptions[stream_name]
-                    await self._send_unsubscription(stream_name)
-            else:
-                del self.subscriptions[stream_name]
-                await self._send_unsubscription(stream_name)
+        if self._unregister(stream_name, callback):
+            await self._control("UNSUBSCRIBE", [stream_name])
+            log.info(f"Unsubscribed from {stream_name}")
                 
     async def unsubscribe_multiple(self, stream_names: List[str]):
         """
-        Unsubscribe from multiple streams.
+        Unsubscribe from multiple streams (batched into as few UNSUBSCRIBE messages as possible).
         """
-        for stream_name in stream_names:
-            await self.unsubscribe(stream_name)
+        removed = [stream_name for stream_name in stream_names if self._unregister(stream_name)]
+        if removed:
+            await self._control("UNSUBSCRIBE", removed)
+            log.info(f"Unsubscribed from {removed}")
             
     async def unsubscribe_multiple_callback(self, stream_names: List[str], callback: Callable):
         """
         Unsubscribe from multiple streams and remove a specific callback.
         """
-        for stream_name in stream_names:
-            await self.unsubscribe(stream_name, callback)
+        removed = [stream_name for stream_name in stream_names if self._unregister(stream_name, callback)]
+        if removed:
+            await self._control("UNSUBSCRIBE", removed)
+            log.info(f"Unsubscribed from {removed}")
+
+    def _register(self, stream_name: str):
+        self.subscriptions[stream_name] = []
+        self._add_route(stream_name)
+        self._live[stream_name] = asyncio.Event()
+        if self.metrics is not None:
+            self._stream_metrics[stream_name] = StreamMetrics(self.metrics, stream_name, self.market)
+
+    def _unregister(self, stream_name: str, callback: Callable = None) -> bool:
+        """
+        Remove a callback (or every callback) of a stream. Returns True when no callbacks remain and the
+        stream must be unsubscribed on the server.
+        """
+        if stream_name not in self.subscriptions:
+            return False
+        self.dispatcher.remove(stream_name, callback)
+        if callback:
+            self.subscriptions[stream_name].remove(callback)
+            if self.subscriptions[stream_name]:  # Other callbacks remain
+                return False
+        del self.subscriptions[stream_name]
+        self._remove_route(stream_name)
+        self._live.pop(stream_name, None)
+        if self._stream_metrics.pop(stream_name, None) is not None:
+            StreamMetrics.remove(self.metrics, stream_name, self.market)
+        return True
+
+    @property
+    def live_streams(self) -> List[str]:
+        """
+        Streams whose SUBSCRIBE has been acknowledged on the current connection.
+        """
+        return [stream_name for stream_name, live in self._live.items() if live.is_set()]
+
+    @property
+    def pending_streams(self) -> List[str]:
+        """
+        Subscribed streams still waiting for the server's acknowledgement (e.g. right after a reconnect).
+        """
+        return [stream_name for stream_name, live in self._live.items() if not live.is_set()]
+
+    async def wait_until_live(self, stream_names: Optional[List[str]] = None, timeout: Optional[float] = None):
+        """
+        Wait until the server has acknowledged the subscription of `stream_names` (default: every subscribed stream).
+        :raises ValueError: A stream is not subscribed.
+        :raises TimeoutError: Not live within `timeout` seconds.
+        """
+        waits = []
+        for stream_name in self._live if stream_names is None else stream_names:
+            live = self._live.get(stream_name)
+            if live is None:
+                raise ValueError(f"{stream_name} is not subscribed")
+            waits.append(live.wait())
+        await asyncio.wait_for(asyncio.gather(*waits), timeout)
+
+    async def list_subscriptions(self) -> List[str]:
+        """
+        Ask the server which streams this connection is subscribed to (`LIST_SUBSCRIPTIONS`).
+        """
+        await self._control_limiter.acquire(1)
+        return await self._request("LIST_SUBSCRIPTIONS", [])
+
+    def _add_route(self, stream_name: str):
+        key = stream_route_key(stream_name)
+        if key is not None:
+            self.routes.setdefault(key, []).append(stream_name)
+
+    def _remove_route(self, stream_name: str):
+        key = stream_route_key(stream_name)
+        streams = self.routes.get(key)
+        if streams and stream_name in streams:
+            streams.remove(stream_name)
+            if not streams:
+                del self.routes[key]
+        self.last_agg_ids.pop(stream_name, None)
 
-    async def _send_subscription(self, stream_name: str):
+    async def _control(self, method: str, stream_names: List[str]):
         """
-        Send subscription message to the server.
+        Queue a SUBSCRIBE/UNSUBSCRIBE for `stream_names` and wait until the server acknowledges it.
         """
-        message = {
-            "method": "SUBSCRIBE",
-            "params": [stream_name],
-            "id": 1
-        }
-        await self.connection.send(json.dumps(message))
-        log.info(f"Subscribed to {stream_name}")
+        results = await asyncio.gather(*self._enqueue_control(method, stream_names), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    def _enqueue_control(self, method: str, stream_names: List[str]) -> List[asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        waiters = []
+        for i in range(0, len(stream_names), self.control_batch_size):
+            waiter = loop.create_future()
+            self._outbox.append((method, stream_names[i:i + self.control_batch_size], waiter))
+            waiters.append(waiter)
+        if self._sender is None or self._sender.done():
+            self._sender = asyncio.create_task(self._send_controls())
+        return waiters
+
+    async def _send_controls(self):
+        """
+        Send queued control requests in order, rate limited. Consecutive requests with the same method
+        are merged into one message of up to `control_batch_size` streams, each message has a unique id.
+        """
+        outbox = self._outbox
+        while outbox:
+            await self._control_limiter.acquire(1)
+            method = outbox[0][0]
+            stream_names, waiters = [], []
+            while outbox and outbox[0][0] == method and len(stream_names) + len(outbox[0][1]) <= self.control_batch_size:
+                _, batch, waiter = outbox.popleft()
+                stream_names.extend(batch)
+                waiters.append(waiter)
 
-    async def _send_unsubscription(self, stream_name: str):
+            error = None
+            try:
+                await self._request(method, stream_names)
+            except asyncio.CancelledError:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(ConnectionLostError("Connection replaced before the request was acknowledged"))
+                raise
+            except Exception as e:
+                error = e
+                log.error(f"{Fore.RED}⚠️ {method} of {len(stream_names)} streams failed: {e}")
+            if error is None and method == "SUBSCRIBE":
+                for stream_name in stream_names:
+                    live = self._live.get(stream_name)
+                    if live is not None:
+                        live.set()
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(error)
+
+    async def _request(self, method: str, params: List[str]):
+        """
+        Send a control message with a unique id and return the `result` of its reply.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        reply = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = reply
+        try:
+            await self.connection.send(json.dumps({"method": method, "params": params, "id": request_id}))
+            return await asyncio.wait_for(reply, self.ack_timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"{method} (id {request_id}) was not acknowledged within {self.ack_timeout}s")
+        finally:
+            self._requests.pop(request_id, None)
+
+    def _on_reply(self, data: dict):
         """
-        Send unsubscription message to the server.
+        Resolve the control message a `{"result": ..., "id": ...}` / `{"error": ..., "id": ...}` reply belongs to.
         """
-        message = {
-            "method": "UNSUBSCRIBE",
-            "params": [stream_name],
-            "id": 1
-        }
-        await self.connection.send(json.dumps(message))
-        log.info(f"Unsubscribed from {stream_name}")
+        reply = self._requests.get(data.get("id"))
+        if reply is None or reply.done():
+            return
+        error = data.get("error")
+        if error:
+            reply.set_exception(RuntimeError(f"Binance rejected request {data.get('id')}: {error}"))
+        else:
+            reply.set_result(data.get("result"))
+
+    def _fail_requests(self):
+        for reply in self._requests.values():
+            if not reply.done():
+                reply.set_exception(ConnectionLostError("Connection closed before the request was acknowledged"))
+
+    def _reset_controls(self):
+        """
+        Drop the control messages of the replaced connection so the resubscribe is the first thing the new one sends:
+        the sender is cancelled and queued or in-flight requests fail with `ConnectionLostError`.
+        Their streams stay in `subscriptions` and are resubscribed by `_recover`.
+        """
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        self._fail_requests()
+        while self._outbox:
+            _, _, waiter = self._outbox.popleft()
+            if not waiter.done():
+                waiter.set_exception(ConnectionLostError("Connection replaced before the request was sent"))
 
     async def on_message(self):
         """
@@ -150,19 +393,62 @@ class StreamFuture:
         """
     # try:
         async for message in self.connection:
-            data = json.loads(message)
+            received = time.time()
+            if self.recorder is not None:
+                self.recorder.record(message)
+            # Combined stream: {"stream": "<streamName>", "data": <rawPayload>}, routed without parsing
+            combined = split_combined(message) if message.__class__ is str else None
+            if combined is not None:
+                stream_name, raw = combined
+                if stream_name not in self.subscriptions:
+                    continue
+                stats = self._stream_metrics.get(stream_name)
+                if stats is not None:
+                    stats.observe(len(message), raw_event_time(raw), received)
+                data = None
+                if self.gap_fill and stream_name.endswith("@aggTrade"):
+                    data = orjson.loads(raw)
+                    if not self._accept_agg_trade(stream_name, data, raw, received):
+                        continue
+                await self.dispatcher.dispatch(stream_name, data, raw, received)
+                continue
+
+            data = orjson.loads(message)
+            if isinstance(data, list):
+                stream_name = array_event_to_stream.get(data[0].get("e")) if data else None
+                stats = self._stream_metrics.get(stream_name)
+                if stats is not None:
+                    stats.observe(len(message), data[0].get("E"), received)
+                await self.dispatcher.dispatch(stream_name, data, message, received)
+                continue
+
+            stream_name = data.get("stream")
+            if stream_name is not None:
+                payload = data["data"]
+                stats = self._stream_metrics.get(stream_name)
+                if stats is not None and payload.__class__ is dict:
+                    stats.observe(len(message), payload.get("E") or payload.get("T"), received)
+                if self.gap_fill and payload.__class__ is dict and payload.get("e") == "aggTrade" and not self._accept_agg_trade(stream_name, payload, None, received):
+                    continue
+                await self.dispatcher.dispatch(stream_name, payload, received=received)
+                continue
+
             data_type = data.get("e")
-            symbol = data.get("s")
-            if not symbol or not data_type or data_type not in event_to_stream:
+            if data_type is None:
+                if "id" in data:
+                    self._on_reply(data)
                 continue
-            
-            stream_name = f"{symbol.lower()}@{event_to_stream[data_type]}"
             if data_type == "kline":
-                stream_name = f"{symbol.lower()}@{event_to_stream[data_type]}_{data.get('k').get('i')}"
-
-            if stream_name and stream_name in self.subscriptions:
-                for callback in self.subscriptions[stream_name]:
-                    asyncio.create_task(callback(data))
+                key = (data_type, data.get("s"), data["k"].get("i"))
+            else:
+                key = (data_type, data.get("s"))
+            for stream_name in self.routes.get(key, ()):
+                stats = self._stream_metrics.get(stream_name)
+                if stats is not None:
+                    stats.observe(len(message), data.get("E") or data.get("T"), received)
+                if self.gap_fill and data_type == "aggTrade" and not self._accept_agg_trade(stream_name, data, message, received):
+                    continue
+                await self.dispatcher.dispatch(stream_name, data, message, received)
                     
     # except websockets.exceptions.ConnectionClosed as e:
     #     log.info(f"{Fore.RED}Connection closed: {e} {Fore.RESET}")
@@ -172,6 +458,178 @@ class StreamFuture:
     # finally:
     #     await self.disconnect()
 
+    def _accept_agg_trade(self, stream_name: str, data: dict, raw: Optional[str] = None, received: float = 0.0) -> bool:
+        """
+        Track the aggregate trade ID sequence of a live aggTrade, returns False when it must not be dispatched now:
+            - aggTrades already delivered (e.g. by a gap fill) are dropped,
+            - while the stream is being backfilled, aggTrades are held and delivered after the backfill,
+            - a jump in the sequence (`a > last + 1`) holds the stream and backfills the missing IDs over REST.
+        """
+        held = self._held.get(stream_name)
+        if held is not None:
+            held.append((data, raw, received))
+            return False
+        last_id = self.last_agg_ids.get(stream_name)
+        if last_id is not None and data["a"] > last_id + 1:
+            log.warning(f"{Fore.YELLOW}⚠️ {stream_name}: aggTrades {last_id + 1}..{data['a'] - 1} missing, backfilling")
+            self._held[stream_name] = deque([(data, raw, received)])
+            task = asyncio.create_task(self._fill_stream(stream_name))
+            self._fills.add(task)
+            task.add_done_callback(self._fills.discard)
+            return False
+        return self._advance(stream_name, data["a"])
+
+    def _advance(self, stream_name: str, agg_id: int) -> bool:
+        """
+        Move the stream's last delivered ID to `agg_id`, False if it was already delivered.
+        """
+        last_id = self.last_agg_ids.get(stream_name)
+        if last_id is not None and agg_id <= last_id:
+            return False
+        self.last_agg_ids[stream_name] = agg_id
+        return True
+
+    async def _supervise(self):
+        """
+        Run the message loop; when the connection drops, reconnect, resubscribe and backfill aggTrades.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            recycle = loop.call_later(self.max_connection_age, self._recycle) if self.max_connection_age else None
+            try:
+                await self.on_message()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"{Fore.RED}🚨 Binance Stream Future connection lost: {e}")
+            finally:
+                if recycle:
+                    recycle.cancel()
+                self._fail_requests()
+                for live in self._live.values():
+                    live.clear()
+            if self._closing or not self.reconnect:
+                self._stop_recovery()
+                return
+            await self._reconnect()
+
+    def _recycle(self):
+        """
+        Close the connection before Binance's 24h limit, the supervisor reconnects right away.
+        """
+        if self.connection and not self._closing:
+            log.info(f"{Fore.YELLOW}Recycling Binance Stream Future connection after {self.max_connection_age}s")
+            asyncio.create_task(self.connection.close())
+
+    async def _reconnect(self):
+        """
+        Reconnect with backoff. Resubscribing and the aggTrade backfill run in `_recover` while the message loop
+        reads the acknowledgements, live aggTrades of the backfilled streams are held until the backfill is delivered.
+        """
+        self._stop_recovery()
+        while not self._closing:
+            await asyncio.sleep(backoff_delay(self._reconnect_attempt, base=1, cap=60))
+            self._reconnect_attempt += 1
+            try:
+                self.connection = await connect(self.base_url)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"{Fore.RED}⚠️ Reconnect attempt {self._reconnect_attempt} failed: {e}")
+                continue
+            self._reset_controls()
+            if self.gap_fill:
+                self._held = {stream_name: deque() for stream_name in self.last_agg_ids}
+            self._recovery = asyncio.create_task(self._recover(self.connection))
+            return
+
+    async def _recover(self, connection):
+        """
+        Resubscribe every stream and wait for the acknowledgements, then backfill the aggTrades missed while
+        disconnected: trades before the SUBSCRIBE took effect come from REST, later ones from the stream.
+        On failure the new connection is closed and the supervisor reconnects.
+        """
+        try:
+            await self._control("SUBSCRIBE", list(self.subscriptions))
+            if self.gap_fill:
+                await self._fill_gaps()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"{Fore.RED}⚠️ Recovery after reconnect attempt {self._reconnect_attempt} failed: {e}")
+            await connection.close()
+            return
+        self._reconnect_attempt = 0
+        self.reconnects += 1
+        log.info(f"{Fore.GREEN}Reconnected to Binance Stream Future WebSocket ({len(self.subscriptions)} streams)")
+
+    def _stop_recovery(self):
+        """
+        Cancel the resubscribe and backfills of the previous connection, held aggTrades are fetched again
+        by the next backfill.
+        """
+        if self._recovery is not None:
+            self._recovery.cancel()
+            self._recovery = None
+        for task in list(self._fills):
+            task.cancel()
+        self._held.clear()
+
+    async def _fill_gaps(self):
+        """
+        Backfill every stream held since the reconnect and deliver its held live aggTrades.
+        """
+        for stream_name in list(self._held):
+            await self._fetch_missing(stream_name)
+            await self._release(stream_name)
+
+    async def _fill_stream(self, stream_name: str):
+        """
+        Backfill a gap in the live aggTrade sequence. If REST fails the gap is skipped so the stream is not held forever.
+        """
+        try:
+            await self._fetch_missing(stream_name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            held = self._held.get(stream_name)
+            log.error(f"{Fore.RED}⚠️ Backfill of {stream_name} failed, skipping the gap: {e}")
+            if held and stream_name in self.subscriptions:
+                self.last_agg_ids[stream_name] = held[0][0]["a"] - 1
+        await self._release(stream_name)
+
+    async def _fetch_missing(self, stream_name: str, limit: int = 1000):
+        """
+        Fetch aggTrades after the last delivered ID over REST (by aggregate trade ID) and deliver them.
+        """
+        symbol = stream_name.partition("@")[0].upper()
+        while stream_name in self.last_agg_ids:
+            last_id = self.last_agg_ids[stream_name]
+            trades = await Future.get_agg_trades(symbol, from_id=last_id + 1, limit=limit, url_http=self.url_http or Future.url_http)
+            for trade in trades:
+                if self._advance(stream_name, trade["a"]):
+                    await self.dispatcher.dispatch(stream_name, {"e": "aggTrade", "E": trade["T"], "s": symbol, **trade})
+                    self.gap_filled += 1
+            if len(trades) < limit:
+                return
+
+    async def _release(self, stream_name: str):
+        """
+        Deliver the live aggTrades held during a backfill in order, then resume normal delivery.
+        """
+        held = self._held.get(stream_name)
+        while held and stream_name in self.subscriptions:
+            data, raw, received = held.popleft()
+            if self._advance(stream_name, data["a"]):
+                await self.dispatcher.dispatch(stream_name, data, raw, received)
+        self._held.pop(stream_name, None)
+
+    def stats(self) -> List[dict]:
+        """
+        Queue depth, delivered and dropped message counts per (stream, callback).
+        """
+        return self.dispatcher.stats()
+
     async def subscribe_agg_trades(self, symbols: List[str], callback: Callable):
         """
         Subscribe to Aggregated Trade Streams for given symbols.
@@ -0,0 +1,317 @@
+import asyncio
+import inspect
+import itertools
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+import orjson
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.timeframe import Timeframe, timeframe_to_ms
+from .Future import Future
+from .klines import KlineFrame
+from .ws_pool import REQUEST_WEIGHTS, WeightLimiter, backoff_delay
+
+# Weight của REST `/aggTrades`, dùng để tìm trade ID tại end_time
+AGG_TRADES_WEIGHT = 20
+
+
+@dataclass
+class BackfillJob:
+    """
+    Một job backfill: nến của (symbol, timeframe) hoặc trades của symbol trong [start_time, end_time] (ms).
+    Dữ liệu được tải lùi từ end_time về start_time (mới nhất trước), `cursor` là mốc đã tải tới.
+
+    Thuộc tính:
+        - cursor: Với klines, mọi nến có open_time >= cursor đã được tải.
+                  Với trades, thời gian của trade sớm nhất đã tải.
+        - cursor_id: (trades) trade ID sớm nhất đã tải (trước lượt đầu: ID của trade đầu tiên sau end_time).
+        - items: Số nến / trades đã tải.
+        - elapsed: Tổng thời gian tải (giây), dùng để tính throughput.
+    """
+    symbol: str
+    kind: str  # "klines" | "trades"
+    timeframe: Optional[str]
+    start_time: int
+    end_time: int
+    cursor: int
+    cursor_id: Optional[int] = None
+    done: bool = False
+    items: int = 0
+    elapsed: float = 0.0
+    error: Optional[str] = field(default=None, compare=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.symbol}:{self.kind}:{self.timeframe or ''}"
+
+    @property
+    def throughput(self) -> float:
+        """
+        Số nến/giây (klines) hoặc trades/giây (trades).
+        """
+        return self.items / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def progress(self) -> float:
+        """
+        Tỉ lệ hoàn thành theo thời gian (0..1).
+        """
+        if self.done:
+            return 1.0
+        total = self.end_time - self.start_time
+        return min(max((self.end_time - self.cursor) / total, 0.0), 1.0) if total > 0 else 1.0
+
+
+KlinesSink = Callable[[BackfillJob, KlineFrame], Union[Awaitable[None], None]]
+TradesSink = Callable[[BackfillJob, List[dict]], Union[Awaitable[None], None]]
+
+
+class BackfillScheduler:
+    """
+    Backfill lịch sử cho nhiều symbol và nhiều timeframe:
+        - Lập kế hoạch job cho mỗi (symbol, timeframe) và (tùy chọn) trades của mỗi symbol.
+        - Ưu tiên dữ liệu mới nhất: các phần (chunk) có thời điểm kết thúc lớn hơn được tải trước, trên mọi job.
+        - Chạy đồng thời `concurrency` worker dưới một ngân sách request weight chung.
+        - Lưu checkpoint ra file sau mỗi chunk, chạy lại sẽ tiếp tục từ chỗ đã dừng.
+        - Báo cáo throughput (nến/s, trades/s) của từng job.
+
+    Ví dụ:
+    ```python
+    scheduler = BackfillScheduler(
+        ["BTCUSDT", "ETHUSDT"], [Timeframe.M1, Timeframe.H1],
+        start_time, end_time,
+        on_klines=save_klines,
+    )
+    report = await scheduler.run()
+    ```
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        timeframes: Sequence[Union[Timeframe, str]],
+        start_time: int,
+        end_time: int,
+        on_klines: Optional[KlinesSink] = None,
+        on_trades: Optional[TradesSink] = None,
+        client=Future,
+        trades_client: Optional[Future] = None,
+        checkpoint_path: Union[str, Path] = "data/binance/backfill_checkpoint.json",
+        concurrency: int = 4,
+        weight_per_minute: int = 1200,
+        klines_weight: int = 5,
+        report_interval: float = 30.0,
+        max_retries: int = 3,
+    ):
+        """
+        :param symbols: Danh sách symbol (VD: ["BTCUSDT"]).
+        :param timeframes: Danh sách Timeframe cần tải nến.
+        :param start_time: Thời gian bắt đầu (ms).
+        :param end_time: Thời gian kết thúc (ms).
+        :param on_klines: Callback (sync/async) nhận (job, KlineFrame) cho mỗi chunk nến.
+        :param on_trades: Callback (sync/async) nhận (job, trades) cho mỗi batch trades.
+        :param client: Class client REST (`Future` hoặc `Spot`) dùng `get_klines_frame` và `get_agg_trades`.
+        :param trades_client: Instance `Future`/`Spot` đã kết nối WebSocket API, cần để backfill trades.
+        :param checkpoint_path: File checkpoint.
+        :param concurrency: Số worker chạy đồng thời.
+        :param weight_per_minute: Ngân sách request weight chung mỗi phút.
+        :param klines_weight: Weight của một request klines (limit=1000).
+        :param report_interval: Chu kỳ log throughput (giây), 0 để tắt.
+        :param max_retries: Số lần thử lại liên tiếp của một job khi lỗi trước khi bỏ qua job đó.
+        """
+        self.symbols = list(symbols)
+        self.timeframes = [Timeframe(tf) for tf in timeframes]
+        self.start_time = start_time
+        self.end_time = end_time
+        self.on_klines = on_klines
+        self.on_trades = on_trades
+        self.client = client
+        self.trades_client = trades_client
+        self.checkpoint_path = Path(checkpoint_path)
+        self.concurrency = concurrency
+        self.limiter = WeightLimiter(weight_per_minute)
+        self.klines_weight = klines_weight
+        self.report_interval = report_interval
+        self.max_retries = max_retries
+        self.jobs: Dict[str, BackfillJob] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._failures: Dict[str, int] = {}
+
+    def plan(self) -> List[BackfillJob]:
+        """
+        Lập kế hoạch job, khôi phục tiến độ từ checkpoint nếu cùng khoảng thời gian.
+        """
+        checkpoint = self._load_checkpoint()
+        jobs = []
+        for symbol in self.symbols:
+            for timeframe in self.timeframes:
+                jobs.append(BackfillJob(symbol, "klines", timeframe.value, self.start_time, self.end_time, cursor=self.end_time))
+            if self.trades_client is not None:
+                jobs.append(BackfillJob(symbol, "trades", None, self.start_time, self.end_time, cursor=self.end_time))
+
+        for job in jobs:
+            saved = checkpoint.get(job.key)
+            if saved and saved["start_time"] == job.start_time and saved["end_time"] == job.end_time:
+                job.cursor = saved["cursor"]
+                job.cursor_id = saved.get("cursor_id")
+                job.done = saved["done"]
+                job.items = saved["items"]
+                job.elapsed = saved["elapsed"]
+            self.jobs[job.key] = job
+        return jobs
+
+    def _load_checkpoint(self) -> Dict[str, dict]:
+        try:
+            return orjson.loads(self.checkpoint_path.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            log.error(f"⚠️ Cannot read backfill checkpoint {self.checkpoint_path}: {e}")
+            return {}
+
+    def save_checkpoint(self):
+        """
+        Ghi checkpoint (file tạm + rename để không hỏng file khi crash).
+        """
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps({key: asdict(job) for key, job in self.jobs.items()}))
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def report(self) -> List[dict]:
+        """
+        Throughput và tiến độ của từng job.
+        """
+        return [
+            {
+                "job": job.key,
+                "items": job.items,
+                "elapsed": round(job.elapsed, 3),
+                "throughput": round(job.throughput, 1),
+                "unit": "candles/s" if job.kind == "klines" else "trades/s",
+                "progress": round(job.progress, 4),
+                "done": job.done,
+                "error": job.error,
+            }
+            for job in self.jobs.values()
+        ]
+
+    def _enqueue(self, job: BackfillJob):
+        # PriorityQueue lấy phần tử nhỏ nhất trước: -cursor để chunk mới nhất chạy trước
+        self._queue.put_nowait((-job.cursor, next(self._sequence), job))
+
+    async def _emit(self, sink, job: BackfillJob, data):
+        if sink is None:
+            return
+        result = sink(job, data)
+        if inspect.isawaitable(result):
+            await result
+
+    async def _klines_step(self, job: BackfillJob):
+        timeframe_ms = timeframe_to_ms(job.timeframe)
+        chunk_start = max(job.start_time, job.cursor - timeframe_ms * 1000)
+        await self.limiter.acquire(self.klines_weight)
+        frame = await self.client.get_klines_frame(job.symbol, chunk_start, job.cursor - 1, job.timeframe)
+        await self._emit(self.on_klines, job, frame)
+        job.items += len(frame)
+        job.cursor = chunk_start
+        job.done = job.cursor <= job.start_time
+
+    async def _seek_trade_id(self, job: BackfillJob) -> Optional[int]:
+        """
+        ID của trade đầu tiên sau `end_time` (mọi trade có ID nhỏ hơn đều không muộn hơn `end_time`),
+        None nếu chưa có trade nào sau `end_time` (tải từ trade mới nhất).
+        """
+        await self.limiter.acquire(AGG_TRADES_WEIGHT)
+        batch = await self.client.get_agg_trades(job.symbol, start_time=job.end_time + 1, limit=1)
+        return batch[0]["f"] if batch else None
+
+    async def _trades_step(self, job: BackfillJob):
+        limit = 1000
+        if job.cursor_id is None:
+            # bắt đầu từ end_time thay vì từ trade mới nhất
+            job.cursor_id = await self._seek_trade_id(job)
+        await self.limiter.acquire(REQUEST_WEIGHTS["trades.historical"])
+        from_id = None if job.cursor_id is None else max(job.cursor_id - limit, 0)
+        batch = await self.trades_client.get_historical_trades(job.symbol, from_id=from_id, limit=limit)
+        if job.cursor_id is not None:
+            batch = [t for t in batch if t["id"] < job.cursor_id]
+        if not batch:
+            job.done = True
+            return
+
+        in_range = [t for t in batch if job.start_time <= t["time"] <= job.end_time]
+        if in_range:
+            await self._emit(self.on_trades, job, in_range)
+        job.items += len(in_range)
+        job.cursor_id = batch[0]["id"]
+        job.cursor = batch[0]["time"]
+        job.done = job.cursor < job.start_time or job.cursor_id == 0
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                started = time.perf_counter()
+                if job.kind == "klines":
+                    await self._klines_step(job)
+                else:
+                    await self._trades_step(job)
+                job.elapsed += time.perf_counter() - started
+                job.error = None
+                self._failures.pop(job.key, None)
+                if not job.done:
+                    self._enqueue(job)
+                self.save_checkpoint()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.error = str(e)
+                log.error(f"⚠️ Backfill {job.key} failed at {job.cursor}: {e}")
+                self.save_checkpoint()
+                failures = self._failures[job.key] = self._failures.get(job.key, 0) + 1
+                if failures <= self.max_retries:
+                    await asyncio.sleep(backoff_delay(failures))
+                    self._enqueue(job)
+            finally:
+                self._queue.task_done()
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            for row in self.report():
+                if not row["done"]:
+                    log.info(f"{Fore.CYAN}[backfill] {row['job']} {row['progress'] * 100:.1f}% {row['items']} items {row['throughput']} {row['unit']}")
+
+    async def run(self) -> List[dict]:
+        """
+        Chạy backfill tới khi mọi job xong. Job lỗi quá `max_retries` lần sẽ dừng lại,
+        chạy lại scheduler để thử tiếp từ checkpoint.
+
+        :return: Báo cáo throughput của từng job (xem `report`).
+        """
+        if not self.jobs:
+            self.plan()
+        for job in self.jobs.values():
+            if not job.done:
+                self._enqueue(job)
+
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        reporter = asyncio.create_task(self._report_loop()) if self.report_interval else None
+        try:
+            await self._queue.join()
+        finally:
+            for task in workers + ([reporter] if reporter else []):
+                task.cancel()
+            self.save_checkpoint()
+
+        report = self.report()
+        for row in report:
+            log.info(f"{Fore.GREEN}[backfill] {row['job']} {row['items']} items in {row['elapsed']}s ({row['throughput']} {row['unit']})")
+        return report
@@ -0,0 +1,369 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Union
+
+from colorama import Fore
+
+from app.utils.calc_average import WeightAveragePriceVolume
+from app.utils.log import log
+from app.utils.timeframe import TIMEFRAME_TO_MS, Timeframe
+from .dispatch import DispatchMode
+from .events import AggTradeEvent
+
+DAY_MS = 24 * 60 * 60_000
+# 1970-01-05 (thứ Hai) - nến tuần của Binance bắt đầu từ 00:00 UTC thứ Hai
+WEEK_OFFSET_MS = 4 * DAY_MS
+
+
+def _month_open(time: int, months: int = 0) -> int:
+    dt = datetime.fromtimestamp(time / 1000, tz=timezone.utc)
+    month = dt.year * 12 + dt.month - 1 + months
+    return int(datetime(month // 12, month % 12 + 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def candle_open_time(time: int, timeframe: Timeframe) -> int:
+    """
+    Thời gian mở (ms) của nến `timeframe` chứa `time`, cùng cách chia của Binance
+    (tuần bắt đầu thứ Hai, tháng theo lịch dương).
+    """
+    if timeframe == Timeframe.Mo1:
+        return _month_open(time)
+    if timeframe == Timeframe.W1:
+        return time - (time - WEEK_OFFSET_MS) % TIMEFRAME_TO_MS[timeframe]
+    return time - time % TIMEFRAME_TO_MS[timeframe]
+
+
+def candle_close_time(open_time: int, timeframe: Timeframe) -> int:
+    """
+    Thời gian đóng (ms) của nến, theo quy ước của Binance: thời gian mở của nến kế tiếp - 1.
+    """
+    if timeframe == Timeframe.Mo1:
+        return _month_open(open_time, 1) - 1
+    return open_time + TIMEFRAME_TO_MS[timeframe] - 1
+
+
+class Candle:
+    """
+    Nến dựng từ aggTrade: OHLCV, taker buy volume, số trade và các bộ cộng dồn để tính
+    `WeightAveragePriceVolume` (khối lượng ròng theo từng mức giá, tổng giá theo lệnh mua/bán).
+    Các bộ cộng dồn đều cộng được nên nến lớn là phép gộp (`merge`) các nến 1m.
+    """
+    __slots__ = (
+        "symbol", "timeframe", "open_time", "close_time",
+        "open", "high", "low", "close",
+        "volume", "quote_volume", "taker_buy_volume", "taker_buy_quote_volume", "trades",
+        "count_buy", "count_sell", "sum_price_buy", "sum_price_sell", "signed_quote_volume", "net_volumes",
+        "first_id", "last_id", "closed",
+    )
+
+    def __init__(self, symbol: str, timeframe: Timeframe, open_time: int):
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.open_time = open_time
+        self.close_time = candle_close_time(open_time, timeframe)
+        self.open = self.high = self.low = self.close = 0.0
+        self.volume = 0.0
+        self.quote_volume = 0.0
+        self.taker_buy_volume = 0.0
+        self.taker_buy_quote_volume = 0.0
+        self.trades = 0  # số trade gốc (như `n` của kline)
+        self.count_buy = 0  # số aggTrade mua / bán chủ động
+        self.count_sell = 0
+        self.sum_price_buy = 0.0
+        self.sum_price_sell = 0.0
+        self.signed_quote_volume = 0.0
+        self.net_volumes: Dict[float, float] = {}  # {price: khối lượng ròng (mua - bán)}
+        self.first_id = -1
+        self.last_id = -1
+        self.closed = False
+
+    def add(self, price: float, qty: float, is_buyer_maker: bool, agg_id: int = -1, trades: int = 1):
+        """
+        Cộng một aggTrade vào nến.
+        """
+        quote = price * qty
+        if not self.count_buy and not self.count_sell:
+            self.open = self.high = self.low = price
+            self.first_id = agg_id
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.last_id = agg_id
+        self.volume += qty
+        self.quote_volume += quote
+        self.trades += trades
+        if is_buyer_maker:
+            self.count_sell += 1
+            self.sum_price_sell += price
+            self.signed_quote_volume -= quote
+            self.net_volumes[price] = self.net_volumes.get(price, 0.0) - qty
+        else:
+            self.count_buy += 1
+            self.sum_price_buy += price
+            self.taker_buy_volume += qty
+            self.taker_buy_quote_volume += quote
+            self.signed_quote_volume += quote
+            self.net_volumes[price] = self.net_volumes.get(price, 0.0) + qty
+
+    def merge(self, other: "Candle"):
+        """
+        Gộp một nến nhỏ hơn, liền sau (theo thời gian) vào nến này.
+        """
+        if other.is_empty():
+            return
+        if self.is_empty():
+            self.open, self.high, self.low = other.open, other.high, other.low
+            self.first_id = other.first_id
+        else:
+            self.high = max(self.high, other.high)
+            self.low = min(self.low, other.low)
+        self.close = other.close
+        self.last_id = other.last_id
+        self.volume += other.volume
+        self.quote_volume += other.quote_volume
+        self.taker_buy_volume += other.taker_buy_volume
+        self.taker_buy_quote_volume += other.taker_buy_quote_volume
+        self.trades += other.trades
+        self.count_buy += other.count_buy
+        self.count_sell += other.count_sell
+        self.sum_price_buy += other.sum_price_buy
+        self.sum_price_sell += other.sum_price_sell
+        self.signed_quote_volume += other.signed_quote_volume
+        net_volumes = self.net_volumes
+        for price, qty in other.net_volumes.items():
+            net_volumes[price] = net_volumes.get(price, 0.0) + qty
+
+    def copy(self) -> "Candle":
+        candle = Candle(self.symbol, self.timeframe, self.open_time)
+        candle.merge(self)
+        candle.closed = self.closed
+        return candle
+
+    def is_empty(self) -> bool:
+        return not self.count_buy and not self.count_sell
+
+    def average(self) -> Optional[WeightAveragePriceVolume]:
+        """
+        Các chỉ số của `calc_average_trades` cho các aggTrade của nến, tính từ bộ cộng dồn (không cần giữ trade).
+        """
+        count = self.count_buy + self.count_sell
+        if not count:
+            return None
+        value_buy = volume_buy = value_sell = volume_sell = 0.0
+        for price, qty in self.net_volumes.items():
+            if qty > 1e-12:
+                value_buy += price * qty
+                volume_buy += qty
+            elif qty < -1e-12:
+                value_sell -= price * qty
+                volume_sell -= qty
+        order_price_buy = self.sum_price_buy / self.count_buy if self.count_buy else 0.0
+        order_price_sell = self.sum_price_sell / self.count_sell if self.count_sell else 0.0
+        if volume_buy > 0 or volume_sell > 0:
+            price_buy = value_buy / volume_buy if volume_buy > 0 else 0.0
+            price_sell = value_sell / volume_sell if volume_sell > 0 else 0.0
+        else:
+            # Tất cả bù trừ nhau: như calc_average_trades, lấy giá trung bình theo số lệnh
+            price_buy, price_sell = order_price_buy, order_price_sell
+        return WeightAveragePriceVolume(
+            price_buy=price_buy,
+            volume_buy=volume_buy,
+            price_sell=price_sell,
+            volume_sell=volume_sell,
+            price=self.quote_volume / self.volume if self.volume > 0 else 0.0,
+            volume=volume_buy - volume_sell,
+            quote_volume=self.signed_quote_volume,
+            order_price_buy=order_price_buy,
+            order_count_buy=self.count_buy,
+            order_price_sell=order_price_sell,
+            order_count_sell=self.count_sell,
+            order_price=(self.sum_price_buy + self.sum_price_sell) / count,
+            order_count=self.count_buy - self.count_sell,
+            high_price=self.high,
+            low_price=self.low,
+        )
+
+    def to_kline(self) -> dict:
+        """
+        Nến theo định dạng trường `k` của stream kline Binance (số ở dạng float).
+        """
+        return {
+            "t": self.open_time, "T": self.close_time, "s": self.symbol, "i": self.timeframe.value,
+            "f": self.first_id, "L": self.last_id,
+            "o": self.open, "c": self.close, "h": self.high, "l": self.low,
+            "v": self.volume, "n": self.trades, "x": self.closed, "q": self.quote_volume,
+            "V": self.taker_buy_volume, "Q": self.taker_buy_quote_volume,
+        }
+
+    def __repr__(self):
+        return f"Candle({self.symbol} {self.timeframe.value} {self.open_time} o={self.open} h={self.high} l={self.low} c={self.close} v={self.volume})"
+
+
+class CandleBuilder:
+    """
+    Dựng nến của một symbol cho nhiều timeframe cùng lúc từ aggTrade, không cần subscribe kline hay gọi REST:
+        - Mỗi trade chỉ cập nhật một nến gốc 1m (O(1)).
+        - Khi nến 1m đóng, nó được gộp vào nến đang mở của các timeframe lớn hơn;
+          nến lớn đang mở = phần đã gộp + nến 1m hiện tại (`candle`).
+        - Sự kiện đóng nến được gọi ngay khi có trade đầu tiên của nến sau, hoặc khi gọi `advance(time)`
+          (VD: theo đồng hồ / `TimeframeTimer`) để đóng nến cả khi thị trường không có giao dịch.
+        - Phút không có trade không tạo nến.
+    """
+
+    def __init__(self, symbol: str, timeframes: Iterable[Timeframe] = tuple(Timeframe), history: int = 0):
+        """
+        :param symbol: Cặp tiền (VD: "BTCUSDT").
+        :param timeframes: Các timeframe cần dựng.
+        :param history: Số nến đã đóng giữ lại cho mỗi timeframe (0 = không giữ).
+        """
+        self.symbol = symbol.upper()
+        self.timeframes = [Timeframe(tf) for tf in timeframes]
+        self.larger = [tf for tf in self.timeframes if tf != Timeframe.M1]
+        self.current: Optional[Candle] = None
+        self.pending: Dict[Timeframe, Candle] = {}  # phần đã gộp của nến lớn đang mở
+        self.history: Dict[Timeframe, Deque[Candle]] = {tf: deque(maxlen=history) for tf in self.timeframes}
+        self.listeners: List[Callable] = []
+        self.late = 0
+
+    def on_close(self, callback: Callable):
+        """
+        Đăng ký hàm async `callback(candle)` được gọi khi một nến đóng.
+        """
+        self.listeners.append(callback)
+
+    async def add(self, time: int, price: float, qty: float, is_buyer_maker: bool, agg_id: int = -1, trades: int = 1):
+        """
+        Cộng một aggTrade, đóng các nến đã hết thời gian trước đó.
+        """
+        current = self.current
+        if current is None or time > current.close_time:
+            await self.advance(time)
+            current = self.current = Candle(self.symbol, Timeframe.M1, candle_open_time(time, Timeframe.M1))
+        elif time < current.open_time:
+            self.late += 1
+            return
+        current.add(price, qty, is_buyer_maker, agg_id, trades)
+
+    async def on_agg_trade(self, data: Union[dict, AggTradeEvent]):
+        """
+        Callback cho stream `<symbol>@aggTrade` (định dạng DICT hoặc TYPED).
+        """
+        if isinstance(data, AggTradeEvent):
+            await self.add(data.trade_time, data.price, data.qty, data.is_buyer_maker, data.agg_id, data.last_id - data.first_id + 1)
+        else:
+            await self.add(data["T"], float(data["p"]), float(data["q"]), data["m"], data["a"], data["l"] - data["f"] + 1)
+
+    async def advance(self, time: int):
+        """
+        Đóng mọi nến có thời gian đóng trước `time` (ms).
+        """
+        current = self.current
+        if current is not None and time > current.close_time:
+            self.current = None
+            await self._close_base(current)
+        for tf in self.larger:
+            candle = self.pending.get(tf)
+            if candle is not None and time > candle.close_time:
+                del self.pending[tf]
+                await self._emit(candle)
+
+    async def _close_base(self, base: Candle):
+        for tf in self.larger:
+            candle = self.pending.get(tf)
+            if candle is not None and base.open_time > candle.close_time:
+                del self.pending[tf]
+                await self._emit(candle)
+                candle = None
+            if candle is None:
+                candle = self.pending[tf] = Candle(self.symbol, tf, candle_open_time(base.open_time, tf))
+            candle.merge(base)
+        if Timeframe.M1 in self.history:
+            await self._emit(base)
+
+    async def _emit(self, candle: Candle):
+        candle.closed = True
+        self.history[candle.timeframe].append(candle)
+        for listener in self.listeners:
+            try:
+                await listener(candle)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"{Fore.RED}⚠️ Candle close callback error on {self.symbol} {candle.timeframe.value}: {e}")
+
+    def candle(self, timeframe: Timeframe = Timeframe.M1) -> Optional[Candle]:
+        """
+        Nến đang mở của `timeframe` (bản sao, gồm cả nến 1m hiện tại).
+        """
+        timeframe = Timeframe(timeframe)
+        current = self.current
+        if timeframe == Timeframe.M1:
+            return current.copy() if current is not None else None
+        pending = self.pending.get(timeframe)
+        if current is None:
+            return pending.copy() if pending is not None else None
+        open_time = candle_open_time(current.open_time, timeframe)
+        if pending is not None and pending.open_time == open_time:
+            candle = pending.copy()
+        else:
+            candle = Candle(self.symbol, timeframe, open_time)
+        candle.merge(current)
+        return candle
+
+
+class CandleEngine:
+    """
+    `CandleBuilder` cho nhiều symbol, dùng trực tiếp làm callback của stream aggTrade.
+
+    Ví dụ:
+    ```python
+    engine = CandleEngine(history=100)
+    engine.on_close(on_candle_close)  # async def on_candle_close(candle: Candle)
+    await engine.attach(stream, ["BTCUSDT", "ETHUSDT"])
+    engine["BTCUSDT"].candle(Timeframe.H1).average()
+    ```
+    """
+
+    def __init__(self, timeframes: Iterable[Timeframe] = tuple(Timeframe), history: int = 0):
+        self.timeframes = list(timeframes)
+        self.history = history
+        self.builders: Dict[str, CandleBuilder] = {}
+        self.listeners: List[Callable] = []
+
+    def __getitem__(self, symbol: str) -> CandleBuilder:
+        builder = self.builders.get(symbol)
+        if builder is None:
+            builder = self.builders[symbol] = CandleBuilder(symbol, self.timeframes, self.history)
+            builder.listeners = self.listeners
+        return builder
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.builders
+
+    def on_close(self, callback: Callable):
+        """
+        Đăng ký hàm async `callback(candle)` được gọi khi nến của bất kỳ symbol nào đóng.
+        """
+        self.listeners.append(callback)
+
+    async def on_agg_trade(self, data: Union[dict, AggTradeEvent]):
+        symbol = data.symbol if isinstance(data, AggTradeEvent) else data["s"]
+        await self[symbol].on_agg_trade(data)
+
+    async def advance(self, time: int):
+        """
+        Đóng các nến đã hết thời gian của mọi symbol (VD: gọi mỗi khi `TimeframeTimer` báo đóng nến).
+        """
+        for builder in self.builders.values():
+            await builder.advance(time)
+
+    async def attach(self, stream, symbols: Iterable[str]):
+        """
+        Subscribe aggTrade của các symbol (theo thứ tự) trên `StreamFuture`/`StreamSpot`/`StreamManager`.
+        """
+        for symbol in symbols:
+            self[symbol.upper()]
+            await stream.subscribe(f"{symbol.lower()}@aggTrade", self.on_agg_trade, mode=DispatchMode.ORDERED)
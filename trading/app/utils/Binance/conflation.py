@@ -0,0 +1,180 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import orjson
+from colorama import Fore
+
+from app.utils.log import log
+
+
+class _Channel:
+    """
+    Trạng thái mới nhất của một khóa (VD: order book của một symbol).
+    """
+    __slots__ = ("key", "version", "value", "source", "changed", "payload", "payload_version", "serializations")
+
+    def __init__(self, key: Hashable, source: Optional[Callable[[], Any]] = None):
+        self.key = key
+        self.version = 0
+        self.value = None
+        self.source = source
+        self.changed = asyncio.Event()
+        self.payload: Optional[bytes] = None
+        self.payload_version = -1
+        self.serializations = 0
+
+    def bump(self):
+        self.version += 1
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class ConflationSubscription:
+    __slots__ = ("key", "callback", "interval", "published", "skipped", "task")
+
+    def __init__(self, key: Hashable, callback: Callable, interval: float):
+        self.key = key
+        self.callback = callback
+        self.interval = interval
+        self.published = 0
+        self.skipped = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class Conflator:
+    """
+    Gộp (conflate) dữ liệu cập nhật liên tục (depth, order book, ticker, ...) cho consumer chậm:
+        - Mỗi subscriber tự đặt tần suất tối đa, luôn nhận trạng thái mới nhất, không bao giờ bị dồn backlog.
+        - Serialize sang định dạng client tối đa một lần cho mỗi phiên bản dữ liệu, dùng chung cho mọi subscriber.
+        - Nguồn dữ liệu có thể đẩy giá trị mới (`set`) hoặc chỉ báo thay đổi (`mark`) để giá trị được
+          tính lười (lazily) từ `source` khi cần publish (VD: chụp top N của `OrderBook`).
+
+    Ví dụ:
+    ```python
+    conflator = Conflator()
+    key = conflator.add_book(book, levels=20)  # "future:BTCUSDT"
+    conflator.subscribe(key, send_to_ui, max_rate=2)  # tối đa 2 lần/giây
+    ```
+    """
+
+    def __init__(self, serialize: Callable[[Any], bytes] = orjson.dumps):
+        """
+        :param serialize: Hàm chuyển dữ liệu sang định dạng client (mặc định orjson.dumps -> bytes).
+        """
+        self.serialize = serialize
+        self.channels: Dict[Hashable, _Channel] = {}
+        self.subscriptions: List[ConflationSubscription] = []
+
+    def _channel(self, key: Hashable) -> _Channel:
+        channel = self.channels.get(key)
+        if channel is None:
+            channel = self.channels[key] = _Channel(key)
+        return channel
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Cập nhật giá trị mới nhất của `key` (VD: message partial depth `depth20`).
+        """
+        channel = self._channel(key)
+        channel.value = value
+        channel.bump()
+
+    def mark(self, key: Hashable):
+        """
+        Báo `key` đã thay đổi, giá trị được lấy từ `source` khi publish.
+        """
+        self._channel(key).bump()
+
+    def add_source(self, key: Hashable, source: Callable[[], Any]):
+        """
+        Đăng ký hàm tạo giá trị cho `key`, chỉ được gọi khi có subscriber cần publish.
+        """
+        self._channel(key).source = source
+
+    def add_book(self, book, levels: int = 20, key: Optional[Hashable] = None) -> Hashable:
+        """
+        Conflate một `OrderBook`: mỗi lần book thay đổi chỉ đánh dấu, top `levels` mức được chụp khi publish.
+
+        :param key: Khóa của book, mặc định "<market>:<SYMBOL>" theo client REST của book
+            (VD: "future:BTCUSDT", "spot:BTCUSDT") để book Futures và Spot cùng symbol không trùng khóa.
+        :return: Khóa dùng để `subscribe`.
+        """
+        if key is None:
+            client = book.client
+            market = getattr(client, "__name__", type(client).__name__).lower()
+            key = f"{market}:{book.symbol}"
+        self.add_source(key, lambda: book.snapshot(levels))
+        book.listeners.append(lambda _: self.mark(key))
+        return key
+
+    def _payload(self, channel: _Channel) -> bytes:
+        if channel.payload_version != channel.version:
+            value = channel.source() if channel.source is not None else channel.value
+            channel.payload = self.serialize(value)
+            channel.payload_version = channel.version
+            channel.serializations += 1
+        return channel.payload
+
+    def subscribe(self, key: Hashable, callback: Callable, max_rate: float = 1.0) -> ConflationSubscription:
+        """
+        Nhận trạng thái mới nhất của `key` tối đa `max_rate` lần mỗi giây.
+
+        :param callback: Hàm async nhận payload đã serialize (bytes).
+        :return: Subscription, dùng để `unsubscribe`.
+        """
+        subscription = ConflationSubscription(key, callback, 1.0 / max_rate if max_rate > 0 else 0.0)
+        subscription.task = asyncio.create_task(self._publish_loop(subscription))
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ConflationSubscription):
+        if subscription.task:
+            subscription.task.cancel()
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+
+    def close(self):
+        for subscription in list(self.subscriptions):
+            self.unsubscribe(subscription)
+
+    async def _publish_loop(self, subscription: ConflationSubscription):
+        loop = asyncio.get_running_loop()
+        channel = self._channel(subscription.key)
+        seen = 0
+        last_publish = float("-inf")
+        while True:
+            if channel.version == seen:
+                await channel.changed.wait()
+            delay = last_publish + subscription.interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            version = channel.version
+            payload = self._payload(channel)
+            subscription.skipped += version - seen - 1
+            seen = version
+            last_publish = loop.time()
+            try:
+                await subscription.callback(payload)
+                subscription.published += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"{Fore.RED}⚠️ Conflation callback error on {subscription.key}: {e}")
+
+    def stats(self) -> List[dict]:
+        """
+        Số phiên bản, số lần serialize của mỗi khóa; số lần publish / số phiên bản bị gộp của mỗi subscriber.
+        """
+        return [
+            {
+                "key": channel.key,
+                "version": channel.version,
+                "serializations": channel.serializations,
+                "subscribers": [
+                    {"interval": s.interval, "published": s.published, "skipped": s.skipped}
+                    for s in self.subscriptions if s.key == channel.key
+                ],
+            }
+            for channel in self.channels.values()
+        ]
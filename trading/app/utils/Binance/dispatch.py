@@ -0,0 +1,351 @@
+import asyncio
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import orjson
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.metrics import Histogram, MetricsRegistry
+from .events import EventFormat, decode_event
+from .stream_metrics import STREAM_CALLBACK_LATENCY, stream_type
+
+
+# Loại stream (phần sau "@" trong tên stream) -> Event Type (`e`) của message
+STREAM_TYPE_TO_EVENT = {
+    "aggTrade": "aggTrade",
+    "trade": "trade",
+    "depth": "depthUpdate",
+    "markPrice": "markPriceUpdate",
+    "kline": "kline",
+    "ticker": "24hrTicker",
+    "miniTicker": "24hrMiniTicker",
+    "bookTicker": "bookTicker",
+}
+
+
+def stream_route_key(stream_name: str) -> Optional[tuple]:
+    """
+    Khóa định tuyến cho message của endpoint `/ws` (không có trường `stream`):
+    (Event Type, SYMBOL) hoặc ("kline", SYMBOL, interval). Tính một lần khi subscribe,
+    khi nhận message chỉ cần tra dict, không định dạng chuỗi.
+
+    VD: "btcusdt@depth@100ms" -> ("depthUpdate", "BTCUSDT"), "btcusdt@kline_1m" -> ("kline", "BTCUSDT", "1m").
+    Trả về None với stream không định tuyến được theo `e`/`s` (VD: "!ticker@arr", partial depth của Spot);
+    các stream này vẫn định tuyến đúng qua endpoint combined `/stream`.
+    """
+    symbol, _, rest = stream_name.partition("@")
+    if not rest or symbol.startswith("!"):
+        return None
+    stream_type = rest.split("@")[0]
+    if stream_type.startswith("kline_"):
+        return ("kline", symbol.upper(), stream_type[len("kline_"):])
+    if stream_type.startswith("depth"):
+        stream_type = "depth"
+    event = STREAM_TYPE_TO_EVENT.get(stream_type)
+    return (event, symbol.upper()) if event else None
+
+
+class OverflowPolicy(str, Enum):
+    """
+    Cách xử lý khi hàng đợi của một subscription đầy:
+        - BLOCK: chờ tới khi có chỗ (áp lực ngược lên vòng đọc WebSocket).
+        - DROP_OLDEST: bỏ message cũ nhất để nhận message mới.
+        - CONFLATE_LATEST: bỏ mọi message đang chờ, chỉ giữ message mới nhất (phù hợp markPrice, ticker).
+    """
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    CONFLATE_LATEST = "conflate_latest"
+
+
+class DispatchMode(str, Enum):
+    """
+    Thứ tự xử lý message của một subscription:
+        - CONCURRENT: nhiều consumer chạy callback song song, message có thể được xử lý không theo thứ tự.
+        - ORDERED: một consumer duy nhất, callback nhận message đúng thứ tự nhận từ stream
+          (cần cho các bộ cộng dồn và cập nhật order book). Các stream khác nhau vẫn chạy song song.
+    """
+    CONCURRENT = "concurrent"
+    ORDERED = "ordered"
+
+
+class Subscription:
+    """
+    Hàng đợi có giới hạn và các consumer cố định cho một cặp (stream, callback).
+    """
+
+    def __init__(
+        self,
+        stream: str,
+        callback: Callable,
+        maxsize: int = 1000,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        concurrency: int = 4,
+        mode: DispatchMode = DispatchMode.CONCURRENT,
+        event_format: EventFormat = EventFormat.DICT,
+    ):
+        """
+        :param stream: Tên stream (VD: "btcusdt@aggTrade").
+        :param callback: Hàm async nhận message.
+        :param maxsize: Số message tối đa trong hàng đợi.
+        :param policy: Cách xử lý khi hàng đợi đầy.
+        :param concurrency: Số consumer chạy callback đồng thời (luôn là 1 với `DispatchMode.ORDERED`).
+        :param mode: Thứ tự xử lý message.
+        :param event_format: Định dạng message callback nhận (dict, event có kiểu, JSON gốc).
+        """
+        self.stream = stream
+        self.callback = callback
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self.mode = DispatchMode(mode)
+        self.concurrency = 1 if self.mode is DispatchMode.ORDERED else concurrency
+        self.event_format = EventFormat(event_format)
+        self.queue: Deque[Any] = deque()
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._unfinished = 0  # message đã nhận nhưng callback chưa xử lý xong
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._workers: List[asyncio.Task] = []
+        self._stopped = False
+        # Độ trễ từ lúc nhận frame tới khi callback xử lý xong (None = không đo)
+        self.latency: Optional[Histogram] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.queue)
+
+    def start(self):
+        self._stopped = False
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._consume()) for _ in range(self.concurrency)]
+
+    def stop(self):
+        """
+        Dừng các consumer và bỏ các message còn trong hàng đợi.
+        Producer đang chờ do `OverflowPolicy.BLOCK` được đánh thức, message sau khi dừng bị bỏ qua.
+        """
+        self._stopped = True
+        for task in self._workers:
+            task.cancel()
+        self._workers = []
+        self.queue.clear()
+        self._unfinished = 0
+        self._finished.set()
+        self._not_full.set()
+
+    async def put(self, data: Any, received: float = 0.0):
+        """
+        Đưa message vào hàng đợi theo `policy`.
+        :param received: Thời điểm nhận frame (`time.time()`), 0 nếu không đo độ trễ.
+        """
+        if self._stopped:
+            return
+        queue = self.queue
+        if len(queue) >= self.maxsize:
+            if self.policy is OverflowPolicy.BLOCK:
+                while len(queue) >= self.maxsize:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+                    if self._stopped:
+                        return
+            elif self.policy is OverflowPolicy.DROP_OLDEST:
+                queue.popleft()
+                self.dropped += 1
+                self._unfinished -= 1
+            else:
+                self.dropped += len(queue)
+                self._unfinished -= len(queue)
+                queue.clear()
+        queue.append((received, data))
+        self._unfinished += 1
+        self._finished.clear()
+        if len(queue) > self.max_depth:
+            self.max_depth = len(queue)
+        self._not_empty.set()
+
+    async def _get(self) -> Any:
+        while not self.queue:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        data = self.queue.popleft()
+        self._not_full.set()
+        return data
+
+    async def _consume(self):
+        while True:
+            received, data = await self._get()
+            try:
+                await self.callback(data)
+                self.delivered += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                log.error(f"{Fore.RED}⚠️ Callback error on {self.stream}: {e}")
+            if received and self.latency is not None:
+                self.latency.record(int((time.time() - received) * 1_000_000))
+            self._unfinished -= 1
+            if not self._unfinished:
+                self._finished.set()
+
+    async def join(self):
+        """
+        Chờ tới khi mọi message đã nhận được callback xử lý xong.
+        """
+        await self._finished.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "stream": self.stream,
+            "callback": getattr(self.callback, "__qualname__", repr(self.callback)),
+            "policy": self.policy.value,
+            "mode": self.mode.value,
+            "format": self.event_format.value,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+class Dispatcher:
+    """
+    Phân phối message của stream tới các callback qua hàng đợi có giới hạn,
+    thay cho việc tạo một task mới cho mỗi callback của mỗi message.
+
+    Ví dụ:
+    ```python
+    dispatcher = Dispatcher(maxsize=1000, policy=OverflowPolicy.DROP_OLDEST)
+    dispatcher.add("btcusdt@markPrice", on_mark_price, policy=OverflowPolicy.CONFLATE_LATEST)
+    await dispatcher.dispatch("btcusdt@markPrice", data)
+    dispatcher.stats()
+    ```
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        concurrency: int = 4,
+        mode: DispatchMode = DispatchMode.CONCURRENT,
+        event_format: EventFormat = EventFormat.DICT,
+        metrics: Optional[MetricsRegistry] = None,
+        metric_labels: Optional[Dict[str, str]] = None,
+    ):
+        """
+        :param maxsize: Kích thước hàng đợi mặc định của mỗi subscription.
+        :param policy: Cách xử lý mặc định khi hàng đợi đầy.
+        :param concurrency: Số consumer mặc định của mỗi subscription.
+        :param mode: Thứ tự xử lý mặc định của mỗi subscription.
+        :param event_format: Định dạng message mặc định của mỗi subscription.
+        :param metrics: (Tùy chọn) Registry ghi histogram độ trễ nhận -> callback xong theo loại stream.
+        :param metric_labels: (Tùy chọn) Nhãn thêm vào histogram, VD: `{"market": "future"}`.
+        """
+        self.maxsize = maxsize
+        self.policy = OverflowPolicy(policy)
+        self.concurrency = concurrency
+        self.mode = DispatchMode(mode)
+        self.event_format = EventFormat(event_format)
+        self.metrics = metrics
+        self.metric_labels = metric_labels or {}
+        self.subscriptions: Dict[str, List[Subscription]] = {}
+
+    def add(
+        self,
+        stream: str,
+        callback: Callable,
+        maxsize: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+        concurrency: Optional[int] = None,
+        mode: Optional[DispatchMode] = None,
+        event_format: Optional[EventFormat] = None,
+    ) -> Subscription:
+        """
+        Thêm subscription (stream, callback) và chạy consumer của nó.
+        """
+        subscription = Subscription(
+            stream, callback,
+            maxsize or self.maxsize,
+            policy or self.policy,
+            concurrency or self.concurrency,
+            mode or self.mode,
+            event_format or self.event_format,
+        )
+        if self.metrics is not None:
+            subscription.latency = self.metrics.histogram(STREAM_CALLBACK_LATENCY, **self.metric_labels, type=stream_type(stream))
+        self.subscriptions.setdefault(stream, []).append(subscription)
+        subscription.start()
+        return subscription
+
+    def remove(self, stream: str, callback: Optional[Callable] = None):
+        """
+        Xóa subscription của `callback` trên `stream` (hoặc mọi subscription của stream nếu callback là None).
+        """
+        subscriptions = self.subscriptions.get(stream, [])
+        for subscription in [s for s in subscriptions if callback is None or s.callback == callback]:
+            subscription.stop()
+            subscriptions.remove(subscription)
+        if not subscriptions:
+            self.subscriptions.pop(stream, None)
+
+    async def dispatch(self, stream: str, data: Any = None, raw: Optional[str] = None, received: float = 0.0):
+        """
+        Đưa message vào hàng đợi của mọi subscription của `stream`, theo định dạng của từng subscription.
+        Chỉ cần một trong `data` (đã parse) hoặc `raw` (JSON gốc); phần còn thiếu được tính
+        nhiều nhất một lần cho mọi subscription và chỉ khi có subscription cần tới.
+        :param received: Thời điểm nhận frame (`time.time()`), dùng để đo độ trễ tới khi callback xong.
+        """
+        subscriptions = self.subscriptions.get(stream)
+        if not subscriptions:
+            return
+        typed = None
+        for subscription in subscriptions:
+            event_format = subscription.event_format
+            if event_format is EventFormat.DICT:
+                if data is None:
+                    data = orjson.loads(raw)
+                await subscription.put(data, received)
+            elif event_format is EventFormat.RAW:
+                if raw is None:
+                    raw = orjson.dumps(data).decode()
+                await subscription.put(raw, received)
+            else:
+                if typed is None:
+                    if data is None:
+                        data = orjson.loads(raw)
+                    typed = decode_event(data)
+                await subscription.put(typed, received)
+
+    async def join(self):
+        """
+        Chờ tới khi hàng đợi của mọi subscription trống và không còn callback đang chạy.
+        """
+        for subscriptions in list(self.subscriptions.values()):
+            for subscription in list(subscriptions):
+                await subscription.join()
+
+    def close(self):
+        for stream in list(self.subscriptions):
+            self.remove(stream)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Độ sâu hàng đợi, số message đã xử lý / bị bỏ của từng subscription.
+        """
+        return [s.stats() for subscriptions in self.subscriptions.values() for s in subscriptions]
+
+    def totals(self) -> Tuple[int, int]:
+        """
+        Tổng (độ sâu hàng đợi, số message bị bỏ) trên mọi subscription.
+        """
+        subscriptions = [s for subs in self.subscriptions.values() for s in subs]
+        return sum(s.depth for s in subscriptions), sum(s.dropped for s in subscriptions)
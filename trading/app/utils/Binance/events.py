@@ -0,0 +1,192 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import orjson
+
+
+class EventFormat(str, Enum):
+    """
+    Định dạng message mà callback nhận:
+        - DICT: dict parse bằng orjson (mặc định, giữ nguyên field của Binance, số ở dạng chuỗi).
+        - TYPED: object có kiểu (`AggTradeEvent`, ...), số đã chuyển sang float/int một lần khi decode.
+        - RAW: chuỗi JSON gốc của payload, không parse (để ghi file, chuyển tiếp, ...).
+    """
+    DICT = "dict"
+    TYPED = "typed"
+    RAW = "raw"
+
+
+def _levels(levels: List[List[str]]) -> List[Tuple[float, float]]:
+    return [(float(price), float(qty)) for price, qty in levels]
+
+
+@dataclass(slots=True)
+class AggTradeEvent:
+    symbol: str
+    event_time: int
+    agg_id: int
+    price: float
+    qty: float
+    first_id: int
+    last_id: int
+    trade_time: int
+    is_buyer_maker: bool
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "AggTradeEvent":
+        return cls(d["s"], d["E"], d["a"], float(d["p"]), float(d["q"]), d["f"], d["l"], d["T"], d["m"])
+
+
+@dataclass(slots=True)
+class TradeEvent:
+    symbol: str
+    event_time: int
+    trade_id: int
+    price: float
+    qty: float
+    trade_time: int
+    is_buyer_maker: bool
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TradeEvent":
+        return cls(d["s"], d["E"], d["t"], float(d["p"]), float(d["q"]), d["T"], d["m"])
+
+
+@dataclass(slots=True)
+class DepthUpdateEvent:
+    """
+    Diff depth. `prev_final_update_id` (`pu`) và `transaction_time` (`T`) chỉ có ở Futures.
+    """
+    symbol: str
+    event_time: int
+    first_update_id: int
+    final_update_id: int
+    prev_final_update_id: Optional[int]
+    transaction_time: Optional[int]
+    bids: List[Tuple[float, float]]
+    asks: List[Tuple[float, float]]
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "DepthUpdateEvent":
+        return cls(d["s"], d["E"], d["U"], d["u"], d.get("pu"), d.get("T"), _levels(d["b"]), _levels(d["a"]))
+
+
+@dataclass(slots=True)
+class MarkPriceEvent:
+    symbol: str
+    event_time: int
+    mark_price: float
+    index_price: float
+    estimated_settle_price: float
+    funding_rate: float
+    next_funding_time: int
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "MarkPriceEvent":
+        return cls(d["s"], d["E"], float(d["p"]), float(d.get("i") or 0), float(d.get("P") or 0), float(d.get("r") or 0), d.get("T", 0))
+
+
+@dataclass(slots=True)
+class KlineEvent:
+    symbol: str
+    event_time: int
+    interval: str
+    open_time: int
+    close_time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    quote_volume: float
+    trades: int
+    taker_buy_volume: float
+    taker_buy_quote_volume: float
+    closed: bool
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "KlineEvent":
+        k = d["k"]
+        return cls(
+            d["s"], d["E"], k["i"], k["t"], k["T"],
+            float(k["o"]), float(k["h"]), float(k["l"]), float(k["c"]), float(k["v"]), float(k["q"]),
+            k["n"], float(k["V"]), float(k["Q"]), k["x"],
+        )
+
+
+@dataclass(slots=True)
+class TickerEvent:
+    symbol: str
+    event_time: int
+    price_change: float
+    price_change_percent: float
+    weighted_avg_price: float
+    last_price: float
+    last_qty: float
+    open_price: float
+    high_price: float
+    low_price: float
+    volume: float
+    quote_volume: float
+    open_time: int
+    close_time: int
+    count: int
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TickerEvent":
+        return cls(
+            d["s"], d["E"], float(d["p"]), float(d["P"]), float(d["w"]), float(d["c"]), float(d["Q"]),
+            float(d["o"]), float(d["h"]), float(d["l"]), float(d["v"]), float(d["q"]), d["O"], d["C"], d["n"],
+        )
+
+
+# Event Type (`e`) -> hàm decode
+DECODERS: Dict[str, Callable[[dict], Any]] = {
+    "aggTrade": AggTradeEvent.from_dict,
+    "trade": TradeEvent.from_dict,
+    "depthUpdate": DepthUpdateEvent.from_dict,
+    "markPriceUpdate": MarkPriceEvent.from_dict,
+    "kline": KlineEvent.from_dict,
+    "24hrTicker": TickerEvent.from_dict,
+}
+
+
+def decode_event(data: Union[dict, list]) -> Any:
+    """
+    Chuyển payload (dict hoặc mảng event của stream `!...@arr`) sang event có kiểu.
+    Event Type chưa hỗ trợ được trả về nguyên dạng dict, event đã có kiểu (VD: từ `IngestClient`) được giữ nguyên.
+    """
+    if isinstance(data, list):
+        return [decode_event(item) for item in data]
+    if not isinstance(data, dict):
+        return data
+    decoder = DECODERS.get(data.get("e"))
+    return decoder(data) if decoder else data
+
+
+def loads_event(message: Union[str, bytes]) -> Any:
+    """
+    Parse message WebSocket (kể cả dạng combined `{"stream", "data"}`) và decode thành event có kiểu.
+    """
+    data = orjson.loads(message)
+    if isinstance(data, dict) and "stream" in data:
+        data = data["data"]
+    return decode_event(data)
+
+
+COMBINED_PREFIX = '{"stream":"'
+COMBINED_DATA = '","data":'
+
+
+def split_combined(message: str) -> Optional[Tuple[str, str]]:
+    """
+    Tách (stream, payload JSON gốc) của message combined mà không parse JSON.
+    Trả về None nếu message không đúng dạng `{"stream":"<name>","data":<payload>}`.
+    """
+    if not message.startswith(COMBINED_PREFIX):
+        return None
+    end = message.find(COMBINED_DATA, len(COMBINED_PREFIX))
+    if end < 0:
+        return None
+    return message[len(COMBINED_PREFIX):end], message[end + len(COMBINED_DATA):-1]
@@ -0,0 +1,331 @@
+import asyncio
+import math
+import os
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import httpx
+import orjson
+from colorama import Fore
+
+from app.utils.log import log
+from .Future import Future
+from .Spot import Spot
+from .single_flight import coalesce
+
+
+def _decimals(value: Union[str, float]) -> int:
+    """
+    Số chữ số thập phân có nghĩa của một giá trị (VD: "0.01000000" -> 2, "10" -> 0).
+    """
+    exponent = Decimal(str(value)).normalize().as_tuple().exponent
+    return max(-exponent, 0)
+
+
+def _is_multiple(ticks: float) -> bool:
+    return abs(ticks - round(ticks)) < 1e-6
+
+
+@dataclass
+class SymbolInfo:
+    """
+    Thông tin giao dịch của một symbol, lấy từ `exchangeInfo`.
+
+    Thuộc tính:
+        - tick_size / step_size: bước giá / bước khối lượng.
+        - min_qty / max_qty: khối lượng tối thiểu / tối đa.
+        - min_notional: giá trị lệnh tối thiểu (price * qty).
+        - status: trạng thái giao dịch (VD: "TRADING").
+        - contract_type: loại hợp đồng (VD: "PERPETUAL"), "SPOT" với thị trường spot.
+        - price_scale / tick_ticks: giá * price_scale là số nguyên; tick_size * price_scale = tick_ticks.
+        - qty_scale / step_ticks: tương tự cho khối lượng.
+    """
+    symbol: str
+    status: str
+    contract_type: str
+    base_asset: str
+    quote_asset: str
+
+    tick_size: float
+    step_size: float
+    min_qty: float
+    max_qty: float
+    min_notional: float
+
+    price_precision: int
+    qty_precision: int
+    price_scale: int
+    tick_ticks: int
+    qty_scale: int
+    step_ticks: int
+
+    @classmethod
+    def from_exchange_info(cls, item: dict) -> "SymbolInfo":
+        """
+        Tạo SymbolInfo từ một phần tử trong `exchangeInfo["symbols"]`.
+        """
+        filters = {f["filterType"]: f for f in item.get("filters", [])}
+        price_filter = filters.get("PRICE_FILTER", {})
+        lot_size = filters.get("LOT_SIZE", {})
+        # Future: MIN_NOTIONAL.notional, Spot: NOTIONAL.minNotional hoặc MIN_NOTIONAL.minNotional
+        notional = filters.get("MIN_NOTIONAL") or filters.get("NOTIONAL") or {}
+        min_notional = notional.get("notional", notional.get("minNotional", "0"))
+
+        tick_size = price_filter.get("tickSize", "0")
+        step_size = lot_size.get("stepSize", "0")
+        price_precision = _decimals(tick_size)
+        qty_precision = _decimals(step_size)
+        price_scale = 10 ** price_precision
+        qty_scale = 10 ** qty_precision
+
+        return cls(
+            symbol=item["symbol"],
+            status=item.get("status", ""),
+            contract_type=item.get("contractType", "SPOT"),
+            base_asset=item.get("baseAsset", ""),
+            quote_asset=item.get("quoteAsset", ""),
+            tick_size=float(tick_size),
+            step_size=float(step_size),
+            min_qty=float(lot_size.get("minQty", "0")),
+            max_qty=float(lot_size.get("maxQty", "0")),
+            min_notional=float(min_notional),
+            price_precision=price_precision,
+            qty_precision=qty_precision,
+            price_scale=price_scale,
+            tick_ticks=int(Decimal(tick_size) * price_scale) or 1,
+            qty_scale=qty_scale,
+            step_ticks=int(Decimal(step_size) * qty_scale) or 1,
+        )
+
+    def price_to_ticks(self, price: float) -> int:
+        """
+        Đổi giá sang số nguyên đơn vị tick (làm tròn xuống theo tick_size).
+        """
+        return math.floor(price * self.price_scale / self.tick_ticks + 1e-9)
+
+    def ticks_to_price(self, ticks: int) -> float:
+        """
+        Đổi số tick về giá.
+        """
+        return ticks * self.tick_ticks / self.price_scale
+
+    def round_price(self, price: float) -> float:
+        """
+        Làm tròn giá xuống bội số gần nhất của tick_size.
+        """
+        return self.ticks_to_price(self.price_to_ticks(price))
+
+    def round_qty(self, qty: float) -> float:
+        """
+        Làm tròn khối lượng xuống bội số gần nhất của step_size.
+        """
+        return math.floor(qty * self.qty_scale / self.step_ticks + 1e-9) * self.step_ticks / self.qty_scale
+
+    def validate_order(self, price: float, qty: float) -> List[str]:
+        """
+        Kiểm tra lệnh theo các filter của symbol.
+
+        :return: Danh sách lỗi (rỗng nếu hợp lệ).
+        """
+        errors = []
+        if self.status != "TRADING":
+            errors.append(f"{self.symbol} is not trading (status={self.status})")
+        if not _is_multiple(price * self.price_scale / self.tick_ticks):
+            errors.append(f"price {price} is not a multiple of tick_size {self.tick_size}")
+        if not _is_multiple(qty * self.qty_scale / self.step_ticks):
+            errors.append(f"qty {qty} is not a multiple of step_size {self.step_size}")
+        if qty < self.min_qty:
+            errors.append(f"qty {qty} < min_qty {self.min_qty}")
+        if self.max_qty and qty > self.max_qty:
+            errors.append(f"qty {qty} > max_qty {self.max_qty}")
+        if price * qty < self.min_notional:
+            errors.append(f"notional {price * qty} < min_notional {self.min_notional}")
+        return errors
+
+
+@coalesce("exchangeInfo.conditional")
+async def fetch_exchange_info(url_http: str, etag: Optional[str] = None, last_modified: Optional[str] = None, timeout: float = 10.0) -> httpx.Response:
+    """
+    GET `/exchangeInfo` có điều kiện (If-None-Match / If-Modified-Since), trả về response (200 hoặc 304).
+    Các lời gọi đồng thời cùng tham số dùng chung một request (`coalesce`).
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        return await client.get(url_http + "/exchangeInfo", headers=headers)
+
+
+class ExchangeInfoService:
+    """
+    Cache và index cho `exchangeInfo`:
+        - Tải một lần, tra cứu O(1) theo symbol (`get`, `[]`).
+        - Tự làm mới nền theo TTL bằng request có điều kiện (If-None-Match / If-Modified-Since).
+        - Lưu snapshot ra file để khởi động lại không cần tải lại ngay.
+
+    Ví dụ:
+    ```python
+    await future_exchange_info.start()
+    info = future_exchange_info["BTCUSDT"]
+    info.tick_size, info.min_notional, info.price_to_ticks(65000.1)
+    ```
+    """
+
+    def __init__(self, client=Future, ttl: float = 3600, snapshot_path: Optional[Union[str, Path]] = None, timeout: float = 10.0):
+        """
+        :param client: Client Binance: class (`Future`/`Spot`) hoặc instance (VD: `Future(url_http=...)`), dùng `client.url_http`.
+        :param ttl: Thời gian sống của dữ liệu (giây) trước khi làm mới.
+        :param snapshot_path: File snapshot, mặc định `data/binance/exchangeInfo_<client>.json`.
+        :param timeout: Timeout (giây) của request `/exchangeInfo`.
+        """
+        self.client = client
+        self.name = getattr(client, "__name__", type(client).__name__)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.snapshot_path = Path(snapshot_path or f"data/binance/exchangeInfo_{self.name.lower()}.json")
+        self.symbols: Dict[str, SymbolInfo] = {}
+        self.raw: dict = {}
+        self.fetched_at = 0.0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __getitem__(self, symbol: str) -> SymbolInfo:
+        return self.symbols[symbol]
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbols
+
+    def get(self, symbol: str) -> Optional[SymbolInfo]:
+        """
+        Tra cứu thông tin của symbol (O(1)), None nếu không có.
+        """
+        return self.symbols.get(symbol)
+
+    def find(self, status: Optional[str] = "TRADING", contract_type: Optional[str] = None, quote_asset: Optional[str] = None) -> List[SymbolInfo]:
+        """
+        Lọc các symbol theo trạng thái, loại hợp đồng, quote asset.
+        """
+        return [
+            info for info in self.symbols.values()
+            if (status is None or info.status == status)
+            and (contract_type is None or info.contract_type == contract_type)
+            and (quote_asset is None or info.quote_asset == quote_asset)
+        ]
+
+    def is_stale(self) -> bool:
+        return time.time() - self.fetched_at >= self.ttl
+
+    def _index(self, raw: dict):
+        self.raw = raw
+        self.symbols = {item["symbol"]: SymbolInfo.from_exchange_info(item) for item in raw.get("symbols", [])}
+
+    def load_snapshot(self) -> bool:
+        """
+        Nạp snapshot từ file (nếu có). File hỏng hoặc sai định dạng trả về False, dữ liệu hiện tại được giữ nguyên.
+        """
+        try:
+            snapshot = orjson.loads(self.snapshot_path.read_bytes())
+            raw = snapshot["data"]
+            symbols = {item["symbol"]: SymbolInfo.from_exchange_info(item) for item in raw.get("symbols", [])}
+            fetched_at = float(snapshot.get("fetched_at", 0.0))
+            etag, last_modified = snapshot.get("etag"), snapshot.get("last_modified")
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            log.error(f"⚠️ Cannot read exchangeInfo snapshot {self.snapshot_path}: {e!r}")
+            return False
+        self.raw, self.symbols = raw, symbols
+        self.fetched_at = fetched_at
+        self.etag = etag
+        self.last_modified = last_modified
+        return True
+
+    def save_snapshot(self):
+        """
+        Ghi snapshot ra file (ghi vào file tạm rồi rename để không hỏng file khi crash).
+        """
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps({
+            "fetched_at": self.fetched_at,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "data": self.raw,
+        }))
+        os.replace(tmp_path, self.snapshot_path)
+
+    async def refresh(self, force: bool = False) -> bool:
+        """
+        Làm mới dữ liệu từ Binance bằng request có điều kiện.
+
+        :param force: Bỏ qua header điều kiện, luôn tải lại toàn bộ.
+        :return: True nếu dữ liệu thay đổi, False nếu server trả về 304 (không đổi).
+        """
+        async with self._lock:
+            conditional = not force and self.raw
+            response = await fetch_exchange_info(
+                self.client.url_http,
+                self.etag if conditional else None,
+                self.last_modified if conditional else None,
+                self.timeout,
+            )
+
+            if response.status_code == 304:
+                self.fetched_at = time.time()
+                self.save_snapshot()
+                return False
+            if response.status_code != 200:
+                raise RuntimeError(f"Failed to fetch data: {response.text}")
+
+            self._index(orjson.loads(response.content))
+            self.fetched_at = time.time()
+            self.etag = response.headers.get("ETag")
+            self.last_modified = response.headers.get("Last-Modified")
+            self.save_snapshot()
+            log.info(f"{Fore.GREEN}Loaded exchangeInfo {self.name}: {len(self.symbols)} symbols")
+            return True
+
+    async def load(self):
+        """
+        Đảm bảo dữ liệu đã được nạp: ưu tiên snapshot, tải từ Binance nếu chưa có dữ liệu.
+        """
+        if not self.symbols:
+            self.load_snapshot()
+        if not self.symbols:
+            await self.refresh(force=True)
+
+    async def start(self):
+        """
+        Nạp dữ liệu và chạy task làm mới nền theo TTL.
+        """
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(max(self.ttl - (time.time() - self.fetched_at), 1))
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"⚠️ Error refreshing exchangeInfo {self.name}: {e}")
+                await asyncio.sleep(min(self.ttl, 60))
+
+
+# Global exchangeInfo services
+future_exchange_info = ExchangeInfoService(Future)
+spot_exchange_info = ExchangeInfoService(Spot)
@@ -0,0 +1,540 @@
+import asyncio
+import multiprocessing
+import struct
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import orjson
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.metrics import MetricsRegistry, metrics as metrics_registry
+from .dispatch import Dispatcher, DispatchMode, OverflowPolicy
+from .events import AggTradeEvent, DepthUpdateEvent, EventFormat, KlineEvent, MarkPriceEvent, TickerEvent, TradeEvent
+from .stream_metrics import StreamMetrics, raw_event_time
+
+# Header của ring: capacity, write_pos, read_pos, waiting, dropped, written (int64)
+RING_HEADER = struct.Struct("<qqqqqq")
+CAPACITY, WRITE_POS, READ_POS, WAITING, DROPPED, WRITTEN = (i * 8 for i in range(6))
+RECORD_LENGTH = struct.Struct("<I")
+WRAP = 0xFFFFFFFF  # phần cuối ring không đủ chỗ, bản ghi tiếp theo ở đầu ring
+_INT64 = struct.Struct("<q")
+
+
+class SharedRing:
+    """
+    Ring buffer byte một producer - một consumer trên `multiprocessing.shared_memory`, dùng giữa hai process
+    không cần khóa: producer chỉ ghi `write_pos`, consumer chỉ ghi `read_pos` (cả hai tăng dần theo số byte).
+    Bản ghi: độ dài (uint32) + dữ liệu, căn 8 byte. Khi ring đầy, bản ghi mới bị bỏ và đếm vào `dropped`
+    (producer không bao giờ ghi đè dữ liệu chưa đọc).
+    """
+
+    def __init__(self, name: Optional[str] = None, size: int = 64 * 1024 * 1024, create: bool = True):
+        """
+        :param name: Tên vùng shared memory (None = tự sinh khi tạo mới).
+        :param size: Dung lượng ring (byte, làm tròn xuống bội số của 8) khi tạo mới.
+        :param create: True ở process tạo ring, False ở process gắn vào ring đã có.
+        """
+        if create:
+            size &= ~7
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=RING_HEADER.size + size)
+            RING_HEADER.pack_into(self.shm.buf, 0, size, 0, 0, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.capacity = self._get(CAPACITY)
+        self.data = self.buf[RING_HEADER.size:RING_HEADER.size + self.capacity]
+        self.owner = create
+        self._read_pos = self._get(READ_POS)
+
+    def _get(self, offset: int) -> int:
+        return _INT64.unpack_from(self.buf, offset)[0]
+
+    def _set(self, offset: int, value: int):
+        _INT64.pack_into(self.buf, offset, value)
+
+    @property
+    def dropped(self) -> int:
+        return self._get(DROPPED)
+
+    @property
+    def written(self) -> int:
+        return self._get(WRITTEN)
+
+    def backlog(self) -> int:
+        """
+        Số byte đã ghi nhưng chưa đọc.
+        """
+        return self._get(WRITE_POS) - self._get(READ_POS)
+
+    # ---------- producer ----------
+
+    def write(self, record: bytes) -> bool:
+        """
+        Ghi một bản ghi. Trả về False (và đếm `dropped`) nếu ring không đủ chỗ.
+        """
+        capacity = self.capacity
+        need = (RECORD_LENGTH.size + len(record) + 7) & ~7
+        write_pos = self._get(WRITE_POS)
+        offset = write_pos % capacity
+        padding = capacity - offset if offset + need > capacity else 0
+        if write_pos + padding + need - self._get(READ_POS) > capacity:
+            self._set(DROPPED, self._get(DROPPED) + 1)
+            return False
+        if padding:
+            RECORD_LENGTH.pack_into(self.data, offset, WRAP)
+            offset = 0
+        RECORD_LENGTH.pack_into(self.data, offset, len(record))
+        start = offset + RECORD_LENGTH.size
+        self.data[start:start + len(record)] = record
+        self._set(WRITTEN, self._get(WRITTEN) + 1)
+        self._set(WRITE_POS, write_pos + padding + need)  # công bố bản ghi sau khi đã ghi xong dữ liệu
+        return True
+
+    def take_waiting(self) -> bool:
+        """
+        Consumer đang chờ dữ liệu mới? (và xóa cờ để chỉ đánh thức một lần)
+        """
+        if self._get(WAITING):
+            self._set(WAITING, 0)
+            return True
+        return False
+
+    # ---------- consumer ----------
+
+    def read(self, max_records: int = 10_000) -> List[bytes]:
+        """
+        Đọc (copy) tối đa `max_records` bản ghi đang có.
+        """
+        capacity = self.capacity
+        data = self.data
+        read_pos = self._read_pos
+        write_pos = self._get(WRITE_POS)
+        records = []
+        while read_pos < write_pos and len(records) < max_records:
+            offset = read_pos % capacity
+            length = RECORD_LENGTH.unpack_from(data, offset)[0]
+            if length == WRAP:
+                read_pos += capacity - offset
+                continue
+            start = offset + RECORD_LENGTH.size
+            records.append(bytes(data[start:start + length]))
+            read_pos += (RECORD_LENGTH.size + length + 7) & ~7
+        self._read_pos = read_pos
+        self._set(READ_POS, read_pos)
+        return records
+
+    def available(self) -> bool:
+        return self._get(WRITE_POS) != self._read_pos
+
+    def set_waiting(self, waiting: bool):
+        self._set(WAITING, int(waiting))
+
+    def close(self):
+        """
+        Đóng ring; process tạo ring giải phóng luôn vùng shared memory.
+        """
+        self.data.release()
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# ---------- mã hóa event có kiểu thành bản ghi nhị phân ----------
+
+KIND_JSON, KIND_AGG_TRADE, KIND_MARK_PRICE, KIND_DEPTH, KIND_RAW = range(5)
+RECORD_PREFIX = struct.Struct("<BB")  # kind, độ dài tên stream
+AGG_TRADE = struct.Struct("<qqddqqq?")
+MARK_PRICE = struct.Struct("<qddddq")
+DEPTH = struct.Struct("<qqqqqII")  # E, U, u, pu (-1 = không có), T (-1), số bid, số ask; sau đó là các mức giá (double)
+NONE = -1
+# Event có kiểu khác trong bản ghi JSON: {"@event": tên class, "values": [giá trị các trường]}, dựng lại khi decode
+EVENT_TAG = "@event"
+JSON_EVENTS = {cls.__name__: cls for cls in (TradeEvent, KlineEvent, TickerEvent, AggTradeEvent, MarkPriceEvent, DepthUpdateEvent)}
+
+
+def _pack_symbol(symbol: str) -> bytes:
+    symbol = symbol.encode()
+    return bytes((len(symbol),)) + symbol
+
+
+def _tag_event(event: Any) -> dict:
+    return {EVENT_TAG: event.__class__.__name__, "values": [getattr(event, field) for field in event.__slots__]}
+
+
+def _untag_event(value: Any) -> Any:
+    if value.__class__ is list:
+        return [_untag_event(item) for item in value]
+    if value.__class__ is dict and EVENT_TAG in value:
+        return JSON_EVENTS[value[EVENT_TAG]](*value["values"])
+    return value
+
+
+def encode_event(stream_name: str, event: Any) -> bytes:
+    """
+    Bản ghi nhị phân của một event: aggTrade, markPrice, depth dùng struct cố định (decode chỉ là `unpack`),
+    event có kiểu khác (kline, ticker, ... kể cả mảng event) dùng JSON có đánh dấu class để dựng lại khi decode,
+    dict dùng JSON, chuỗi (payload gốc của `EventFormat.RAW`) được ghi nguyên.
+    """
+    name = stream_name.encode()
+    cls = event.__class__
+    if cls is AggTradeEvent:
+        kind = KIND_AGG_TRADE
+        body = _pack_symbol(event.symbol) + AGG_TRADE.pack(
+            event.event_time, event.agg_id, event.price, event.qty, event.first_id, event.last_id, event.trade_time, event.is_buyer_maker,
+        )
+    elif cls is MarkPriceEvent:
+        kind = KIND_MARK_PRICE
+        body = _pack_symbol(event.symbol) + MARK_PRICE.pack(
+            event.event_time, event.mark_price, event.index_price, event.estimated_settle_price, event.funding_rate, event.next_funding_time,
+        )
+    elif cls is DepthUpdateEvent:
+        kind = KIND_DEPTH
+        levels = [value for level in event.bids for value in level] + [value for level in event.asks for value in level]
+        body = _pack_symbol(event.symbol) + DEPTH.pack(
+            event.event_time, event.first_update_id, event.final_update_id,
+            NONE if event.prev_final_update_id is None else event.prev_final_update_id,
+            NONE if event.transaction_time is None else event.transaction_time,
+            len(event.bids), len(event.asks),
+        ) + struct.pack(f"<{len(levels)}d", *levels)
+    elif cls is str:
+        kind = KIND_RAW
+        body = event.encode()
+    else:
+        kind = KIND_JSON
+        body = orjson.dumps(event, default=_tag_event, option=orjson.OPT_PASSTHROUGH_DATACLASS)
+    return RECORD_PREFIX.pack(kind, len(name)) + name + body
+
+
+def decode_record(record: bytes) -> Tuple[str, Any]:
+    """
+    Ngược lại của `encode_event`: (tên stream, event).
+    """
+    kind, name_length = RECORD_PREFIX.unpack_from(record)
+    offset = RECORD_PREFIX.size + name_length
+    stream_name = record[RECORD_PREFIX.size:offset].decode()
+    if kind == KIND_JSON:
+        return stream_name, _untag_event(orjson.loads(record[offset:]))
+    if kind == KIND_RAW:
+        return stream_name, record[offset:].decode()
+
+    symbol_length = record[offset]
+    symbol = record[offset + 1:offset + 1 + symbol_length].decode()
+    offset += 1 + symbol_length
+    if kind == KIND_AGG_TRADE:
+        return stream_name, AggTradeEvent(symbol, *AGG_TRADE.unpack_from(record, offset))
+    if kind == KIND_MARK_PRICE:
+        return stream_name, MarkPriceEvent(symbol, *MARK_PRICE.unpack_from(record, offset))
+    event_time, first, final, previous, transaction, bid_count, ask_count = DEPTH.unpack_from(record, offset)
+    levels = struct.unpack_from(f"<{2 * (bid_count + ask_count)}d", record, offset + DEPTH.size)
+    pairs = list(zip(levels[0::2], levels[1::2]))
+    return stream_name, DepthUpdateEvent(
+        symbol, event_time, first, final,
+        None if previous == NONE else previous, None if transaction == NONE else transaction,
+        pairs[:bid_count], pairs[bid_count:],
+    )
+
+
+# ---------- process ingest ----------
+
+def run_ingest(ring_name: str, wake: Connection, commands, market: str, stream_kwargs: dict):
+    """
+    Điểm vào của process ingest: giữ kết nối WebSocket, decode message và ghi event vào ring.
+    """
+    asyncio.run(_ingest(ring_name, wake, commands, market, stream_kwargs))
+
+
+async def _ingest(ring_name: str, wake: Connection, commands, market: str, stream_kwargs: dict):
+    from .StreamFuture import StreamFuture
+    from .StreamSpot import StreamSpot
+
+    ring = SharedRing(ring_name, create=False)
+    # metric của process này không hiện trên /metrics của API: process API tự ghi khi đọc ring
+    stream = (StreamSpot if market == "spot" else StreamFuture)(combined=True, mode=DispatchMode.ORDERED, metrics=None, **stream_kwargs)
+    await stream.connect()
+    publishers: Dict[str, Callable] = {}
+    formats: Dict[str, EventFormat] = {}
+
+    def publisher(stream_name: str) -> Callable:
+        async def publish(event):
+            ring.write(encode_event(stream_name, event))
+            if ring.take_waiting():
+                wake.send_bytes(b"\0")
+        return publish
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            command, stream_names = await loop.run_in_executor(None, commands.get)
+            if command == "STOP":
+                break
+            if command == "SUBSCRIBE":
+                new_streams = []
+                for name, event_format in stream_names:
+                    event_format = EventFormat(event_format)
+                    if name not in publishers:
+                        publishers[name] = publisher(name)
+                        new_streams.append(name)
+                    else:
+                        # đổi định dạng tại chỗ: message đã xếp hàng vẫn được ghi, không mất hay lặp event
+                        for subscription in stream.dispatcher.subscriptions.get(name, []):
+                            if subscription.callback is publishers[name]:
+                                subscription.event_format = event_format
+                    formats[name] = event_format
+                # các SUBSCRIBE đồng thời được gom thành ít message nhất có thể
+                results = await asyncio.gather(
+                    *(stream.subscribe(name, publishers[name], event_format=formats[name]) for name in new_streams),
+                    return_exceptions=True,
+                )
+                for name, result in zip(new_streams, results):
+                    if isinstance(result, Exception):
+                        log.error(f"{Fore.RED}❌ Ingest could not subscribe {name}: {result}")
+            elif command == "UNSUBSCRIBE":
+                for name in stream_names:
+                    publishers.pop(name, None)
+                    formats.pop(name, None)
+                await stream.unsubscribe_multiple(stream_names)
+    finally:
+        await stream.disconnect()
+        stream.dispatcher.close()
+        ring.close()
+
+
+class IngestClient:
+    """
+    Chạy kết nối WebSocket và decode JSON trong một process riêng, process API chỉ đọc event đã decode
+    từ ring trên shared memory, nên vòng event phục vụ GraphQL không bị nghẽn khi thị trường sôi động
+    và hai nửa chạy trên hai core:
+        - Process ingest dùng `StreamFuture`/`StreamSpot` (kết nối lại, gap fill, subscribe theo lô) và ghi
+          aggTrade / markPrice / depth dưới dạng struct nhị phân, các loại khác dạng JSON.
+        - Process API nhận event có kiểu (`AggTradeEvent`, `KlineEvent`, ...; dict với các loại chưa hỗ trợ)
+          qua cùng API subscribe, phân phối bằng `Dispatcher`.
+        - Stream có callback cần `EventFormat.DICT`/`RAW` được chuyển sang ghi payload JSON gốc vào ring,
+          process API parse/decode theo định dạng của từng callback.
+        - Consumer chờ dữ liệu bằng pipe đánh thức (không quay vòng), tối đa `poll_interval` giây nếu lỡ tín hiệu.
+        - Metric theo stream (message/s, byte/s, độ trễ) được ghi trong process API, tính từ lúc đọc event khỏi ring.
+
+    Ví dụ:
+    ```python
+    client = IngestClient(market="future")
+    await client.connect()
+    await buffers.attach(client, symbols)  # TradeBuffers / CandleEngine nhận AggTradeEvent
+    ...
+    await client.disconnect()
+    ```
+    """
+
+    def __init__(
+        self,
+        market: str = "future",
+        ring_size: int = 64 * 1024 * 1024,
+        queue_size: int = 1000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        concurrency: int = 4,
+        mode: DispatchMode = DispatchMode.CONCURRENT,
+        event_format: EventFormat = EventFormat.TYPED,
+        poll_interval: float = 0.05,
+        metrics: Optional[MetricsRegistry] = metrics_registry,
+        **stream_kwargs,
+    ):
+        """
+        :param market: "future" hoặc "spot".
+        :param ring_size: Dung lượng ring shared memory (byte).
+        :param event_format: Định dạng message mặc định của callback (mặc định: event có kiểu).
+        :param poll_interval: Thời gian chờ tối đa giữa hai lần kiểm tra ring khi không nhận được tín hiệu đánh thức.
+        :param metrics: Registry ghi message/s, byte/s và độ trễ theo stream (None để tắt).
+        :param stream_kwargs: Tham số cho stream trong process ingest (url, reconnect, gap_fill, ...).
+        """
+        self.market = market
+        self.ring_size = ring_size
+        self.poll_interval = poll_interval
+        self.stream_kwargs = stream_kwargs
+        self.dispatcher = Dispatcher(
+            queue_size, overflow_policy, concurrency, mode, event_format, metrics=metrics, metric_labels={"market": market}
+        )
+        self.metrics = metrics
+        self._stream_metrics: Dict[str, StreamMetrics] = {}
+        self.subscriptions: Dict[str, List[Callable]] = {}
+        self.formats: Dict[str, EventFormat] = {}  # Định dạng process ingest ghi vào ring {stream_name: TYPED | RAW}
+        self.received = 0
+        self.ring: Optional[SharedRing] = None
+        self.process = None
+        self._commands = None
+        self._wake: Optional[Connection] = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        """
+        Tạo ring, chạy process ingest và task đọc ring.
+        """
+        context = multiprocessing.get_context("spawn")
+        self.ring = SharedRing(size=self.ring_size)
+        self._wake, wake_sender = context.Pipe(duplex=False)
+        self._commands = context.Queue()
+        self.process = context.Process(
+            target=run_ingest,
+            args=(self.ring.name, wake_sender, self._commands, self.market, self.stream_kwargs),
+            daemon=True,
+        )
+        self.process.start()
+        self._reader = asyncio.create_task(self._read_loop())
+        log.info(f"{Fore.GREEN}Started ingest process {self.process.pid} ({self.market}, ring {self.ring_size // 1024 // 1024}MB)")
+
+    async def disconnect(self):
+        """
+        Dừng process ingest và giải phóng ring.
+        """
+        if self.process is None:
+            return
+        self._commands.put(("STOP", []))
+        await asyncio.get_running_loop().run_in_executor(None, self.process.join, 10)
+        if self.process.is_alive():
+            self.process.terminate()
+        if self._reader:
+            self._reader.cancel()
+        self.dispatcher.close()
+        self.ring.close()
+        self.process = None
+        self._commands = None
+        log.info(f"{Fore.YELLOW}Stopped ingest process")
+
+    def is_connected(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    async def subscribe(
+        self,
+        stream_name: str,
+        callback: Callable,
+        policy: Optional[OverflowPolicy] = None,
+        mode: Optional[DispatchMode] = None,
+        event_format: Optional[EventFormat] = None,
+    ):
+        """
+        Subscribe một stream, callback nhận event đã decode trong process ingest
+        (hoặc dict / JSON gốc theo `event_format`, mặc định là định dạng của client).
+        """
+        self._check_connected()
+        event_format = EventFormat(event_format or self.dispatcher.event_format)
+        self._add_subscription(stream_name, callback)
+        self.dispatcher.add(stream_name, callback, policy=policy, mode=mode, event_format=event_format)
+        self._request_format([stream_name], event_format)
+
+    async def subscribe_multiple(self, stream_names: List[str], callback: Callable):
+        self._check_connected()
+        stream_names = list(dict.fromkeys(stream_names))
+        for stream_name in stream_names:
+            self._add_subscription(stream_name, callback)
+            self.dispatcher.add(stream_name, callback)
+        self._request_format(stream_names, self.dispatcher.event_format)
+
+    def _check_connected(self):
+        if self._commands is None:
+            raise RuntimeError("IngestClient is not connected, call connect() before subscribing")
+
+    def _add_subscription(self, stream_name: str, callback: Callable):
+        if stream_name not in self.subscriptions:
+            self.subscriptions[stream_name] = []
+            if self.metrics is not None:
+                self._stream_metrics[stream_name] = StreamMetrics(self.metrics, stream_name, self.market)
+        self.subscriptions[stream_name].append(callback)
+
+    def _request_format(self, stream_names: List[str], event_format: EventFormat):
+        """
+        Subscribe stream mới trong process ingest, hoặc chuyển stream đang ghi event có kiểu sang ghi JSON gốc
+        khi có callback cần `DICT`/`RAW` (không chuyển ngược lại).
+        """
+        wire = EventFormat.TYPED if event_format is EventFormat.TYPED else EventFormat.RAW
+        changed = [name for name in stream_names if self.formats.get(name) not in (wire, EventFormat.RAW)]
+        for name in changed:
+            self.formats[name] = wire
+        if changed:
+            self._commands.put(("SUBSCRIBE", [(name, wire.value) for name in changed]))
+
+    async def unsubscribe(self, stream_name: str, callback: Callable = None):
+        callbacks = self.subscriptions.get(stream_name)
+        if callbacks is None:
+            return
+        self.dispatcher.remove(stream_name, callback)
+        if callback:
+            callbacks.remove(callback)
+            if callbacks:
+                return
+        del self.subscriptions[stream_name]
+        self.formats.pop(stream_name, None)
+        if self._stream_metrics.pop(stream_name, None) is not None:
+            StreamMetrics.remove(self.metrics, stream_name, self.market)
+        if self._commands is not None:
+            self._commands.put(("UNSUBSCRIBE", [stream_name]))
+
+    async def _read_loop(self):
+        ring = self.ring
+        dispatcher = self.dispatcher
+        formats = self.formats
+        stream_metrics = self._stream_metrics
+        while True:
+            records = ring.read()
+            if not records:
+                await self._wait()
+                continue
+            self.received += len(records)
+            received = time.time()
+            for record in records:
+                stream_name, event = decode_record(record)
+                is_raw = event.__class__ is str
+                stats = stream_metrics.get(stream_name)
+                if stats is not None:
+                    if is_raw:
+                        event_time = raw_event_time(event)
+                    elif event.__class__ is dict:
+                        event_time = event.get("E") or event.get("T")
+                    else:
+                        event_time = getattr(event, "event_time", 0)
+                    stats.observe(len(record), event_time, received)
+                if is_raw:
+                    await dispatcher.dispatch(stream_name, raw=event, received=received)
+                elif formats.get(stream_name) is EventFormat.RAW:
+                    # Process ingest chưa chuyển sang JSON gốc: callback DICT/RAW bắt đầu từ message JSON gốc đầu tiên
+                    for subscription in dispatcher.subscriptions.get(stream_name, ()):
+                        if subscription.event_format is EventFormat.TYPED:
+                            await subscription.put(event, received)
+                else:
+                    await dispatcher.dispatch(stream_name, event, received=received)
+
+    async def _wait(self):
+        """
+        Chờ producer đánh thức (hoặc tối đa `poll_interval` giây, phòng khi lỡ tín hiệu).
+        """
+        ring = self.ring
+        ring.set_waiting(True)
+        if ring.available():
+            ring.set_waiting(False)
+            return
+        loop = asyncio.get_running_loop()
+        woken = loop.create_future()
+        fd = self._wake.fileno()
+        loop.add_reader(fd, lambda: woken.done() or woken.set_result(None))
+        try:
+            await asyncio.wait_for(woken, self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+        while self._wake.poll():
+            self._wake.recv_bytes()
+
+    def stats(self) -> dict:
+        """
+        Số event đã nhận, số event bị bỏ do ring đầy, số byte đang chờ đọc.
+        """
+        ring = self.ring
+        return {
+            "received": self.received,
+            "written": ring.written if ring else 0,
+            "dropped": ring.dropped if ring else 0,
+            "backlog_bytes": ring.backlog() if ring else 0,
+            "dispatch": self.dispatcher.stats(),
+        }
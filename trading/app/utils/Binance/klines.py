@@ -0,0 +1,205 @@
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import orjson
+
+from .types import KlineMap
+
+
+RawPayload = Union[bytes, bytearray, memoryview, str]
+
+# Tên cột của KlineFrame và dtype tương ứng (theo thứ tự của KlineMap)
+KLINE_COLUMNS = (
+    ("open_time", np.int64, KlineMap.openTime),
+    ("open", np.float64, KlineMap.open),
+    ("high", np.float64, KlineMap.high),
+    ("low", np.float64, KlineMap.low),
+    ("close", np.float64, KlineMap.close),
+    ("volume", np.float64, KlineMap.volume),
+    ("close_time", np.int64, KlineMap.closeTime),
+    ("quote_volume", np.float64, KlineMap.quoteAssetVolume),
+    ("trades", np.int32, KlineMap.numberOfTrades),
+    ("taker_buy_volume", np.float64, KlineMap.takerBuyBaseAssetVolume),
+    ("taker_buy_quote_volume", np.float64, KlineMap.takerBuyQuoteAssetVolume),
+)
+
+# Khóa của kline trong WebSocket stream (`{"e": "kline", "k": {...}}`) theo thứ tự KLINE_COLUMNS
+WS_KLINE_KEYS = ("t", "o", "h", "l", "c", "v", "T", "q", "n", "V", "Q")
+
+
+class KlineFrame:
+    """
+    Bảng nến dạng cột (columnar): mỗi trường là một mảng NumPy có kiểu cố định.
+        - open_time, close_time: int64 (ms)
+        - open, high, low, close, volume, quote_volume, taker_buy_volume, taker_buy_quote_volume: float64
+        - trades: int32
+
+    Một nến chiếm 84 bytes, so với hàng KB khi giữ dưới dạng list các chuỗi.
+    """
+    __slots__ = tuple(name for name, _, _ in KLINE_COLUMNS)
+
+    def __init__(self, **columns: np.ndarray):
+        for name, dtype, _ in KLINE_COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def empty(cls, capacity: int = 0) -> "KlineFrame":
+        """
+        Tạo frame với các mảng cấp phát sẵn `capacity` phần tử (chưa khởi tạo giá trị).
+        """
+        return cls(**{name: np.empty(capacity, dtype=dtype) for name, dtype, _ in KLINE_COLUMNS})
+
+    @classmethod
+    def concat(cls, frames: Iterable["KlineFrame"]) -> "KlineFrame":
+        """
+        Nối nhiều frame thành một.
+        """
+        frames = list(frames)
+        if not frames:
+            return cls.empty()
+        return cls(**{name: np.concatenate([getattr(f, name) for f in frames]) for name, _, _ in KLINE_COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.open_time)
+
+    def __getitem__(self, index) -> "KlineFrame":
+        """
+        Lấy một phần frame theo slice hoặc mask (slice trả về view, không copy).
+        """
+        if isinstance(index, int):
+            index = slice(index, index + 1 or None)
+        return KlineFrame(**{name: getattr(self, name)[index] for name, _, _ in KLINE_COLUMNS})
+
+    def __repr__(self) -> str:
+        return f"KlineFrame(rows={len(self)}, nbytes={self.nbytes})"
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Tổng số bytes của các mảng.
+        """
+        return sum(getattr(self, name).nbytes for name, _, _ in KLINE_COLUMNS)
+
+    def columns(self) -> dict:
+        """
+        Các cột dưới dạng dict {tên: mảng}.
+        """
+        return {name: getattr(self, name) for name, _, _ in KLINE_COLUMNS}
+
+    def to_pandas(self):
+        """
+        Chuyển sang pandas DataFrame (các cột dùng lại bộ nhớ của mảng khi có thể).
+        """
+        import pandas as pd
+        return pd.DataFrame(self.columns(), copy=False)
+
+
+def _fill(frame: KlineFrame, offset: int, rows: list):
+    """
+    Ghi các hàng kline REST (list các list) vào frame tại vị trí `offset`, từng cột một.
+    """
+    n = len(rows)
+    end = offset + n
+    for name, dtype, index in KLINE_COLUMNS:
+        getattr(frame, name)[offset:end] = np.fromiter((row[index] for row in rows), dtype=dtype, count=n)
+
+
+def _loads(payload: Union[RawPayload, list, dict]):
+    if isinstance(payload, (bytes, bytearray, memoryview, str)):
+        payload = orjson.loads(payload)
+    # phản hồi WebSocket API: {"id": ..., "status": 200, "result": [[...], ...]}
+    if isinstance(payload, dict):
+        if "error" in payload:
+            raise RuntimeError(f"Error from Binance: {payload['error']}")
+        payload = payload.get("result", [])
+    return payload
+
+
+def decode_klines(payload: Union[RawPayload, list, dict]) -> KlineFrame:
+    """
+    Giải mã phản hồi klines (REST `/klines` hoặc WebSocket API `klines`) thành KlineFrame.
+    Dữ liệu được parse bằng orjson và ghi thẳng vào các mảng cấp phát sẵn theo từng cột.
+
+    :param payload: bytes/str JSON (VD: `response.content`), hoặc dữ liệu đã parse.
+    :return: KlineFrame.
+    """
+    rows = _loads(payload)
+    frame = KlineFrame.empty(len(rows))
+    _fill(frame, 0, rows)
+    return frame
+
+
+def decode_kline_events(messages: Iterable[Union[RawPayload, dict]], closed_only: bool = False) -> KlineFrame:
+    """
+    Giải mã các message kline từ WebSocket stream (`<symbol>@kline_<interval>`) thành KlineFrame.
+    Hỗ trợ cả message thường và message của combined stream (`{"stream": ..., "data": {...}}`).
+
+    :param messages: Danh sách message (bytes/str JSON hoặc dict đã parse).
+    :param closed_only: Chỉ lấy các nến đã đóng (`k.x == true`).
+    :return: KlineFrame.
+    """
+    klines = []
+    for message in messages:
+        if not isinstance(message, dict):
+            message = orjson.loads(message)
+        message = message.get("data", message)
+        kline = message.get("k")
+        if kline is None or (closed_only and not kline.get("x")):
+            continue
+        klines.append(kline)
+
+    n = len(klines)
+    frame = KlineFrame.empty(n)
+    for (name, dtype, _), key in zip(KLINE_COLUMNS, WS_KLINE_KEYS):
+        getattr(frame, name)[:] = np.fromiter((k[key] for k in klines), dtype=dtype, count=n)
+    return frame
+
+
+class KlineFrameBuilder:
+    """
+    Ghép nhiều trang klines (VD: khi backfill) vào một bộ mảng cấp phát sẵn, tránh concat nhiều lần.
+    Dung lượng tự tăng gấp đôi nếu ước lượng ban đầu không đủ.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        self._frame = KlineFrame.empty(max(capacity, 1))
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, n: int):
+        capacity = len(self._frame)
+        if self._size + n <= capacity:
+            return
+        new_capacity = max(capacity * 2, self._size + n)
+        grown = KlineFrame.empty(new_capacity)
+        for name, _, _ in KLINE_COLUMNS:
+            getattr(grown, name)[:self._size] = getattr(self._frame, name)[:self._size]
+        self._frame = grown
+
+    def append(self, payload: Union[RawPayload, list, dict]) -> int:
+        """
+        Thêm một trang klines (bytes/str JSON hoặc dữ liệu đã parse).
+
+        :return: Số nến vừa thêm.
+        """
+        rows = _loads(payload)
+        n = len(rows)
+        self._reserve(n)
+        _fill(self._frame, self._size, rows)
+        self._size += n
+        return n
+
+    def last_open_time(self) -> Optional[int]:
+        """
+        open_time của nến cuối cùng đã thêm.
+        """
+        return int(self._frame.open_time[self._size - 1]) if self._size else None
+
+    def build(self) -> KlineFrame:
+        """
+        Trả về KlineFrame gồm các nến đã thêm (view trên bộ mảng nội bộ).
+        """
+        return self._frame[:self._size]
+
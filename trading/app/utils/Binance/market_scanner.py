@@ -0,0 +1,236 @@
+import asyncio
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from colorama import Fore
+
+from app.utils.log import log
+from .Future import Future, EXCLUDED_SYMBOL_PATTERN
+
+
+# Cột số của bảng ticker: (tên cột, khóa REST `/ticker/24hr`, khóa stream `24hrTicker`, dtype)
+TICKER_COLUMNS = (
+    ("last_price", "lastPrice", "c", np.float64),
+    ("last_qty", "lastQty", "Q", np.float64),
+    ("open_price", "openPrice", "o", np.float64),
+    ("high_price", "highPrice", "h", np.float64),
+    ("low_price", "lowPrice", "l", np.float64),
+    ("price_change", "priceChange", "p", np.float64),
+    ("price_change_percent", "priceChangePercent", "P", np.float64),
+    ("weighted_avg_price", "weightedAvgPrice", "w", np.float64),
+    ("volume", "volume", "v", np.float64),
+    ("quote_volume", "quoteVolume", "q", np.float64),
+    ("count", "count", "n", np.int64),
+    ("close_time", "closeTime", "C", np.int64),
+)
+
+# Các tiêu chí sắp xếp cho `top`
+SORT_KEYS = ("quote_volume", "volume", "change", "abs_change", "volatility", "count")
+
+
+class MarketScanner:
+    """
+    Bảng ticker 24hr dạng cột (NumPy) được cache, để lọc / sắp xếp / lấy top-N mà không gọi lại API.
+    Dữ liệu được làm mới định kỳ qua REST (`start`) hoặc cập nhật liên tục từ stream `!ticker@arr` (`attach`).
+
+    Ví dụ:
+    ```python
+    scanner = MarketScanner(Future, interval=60)
+    await scanner.start()
+    top = scanner.top(10, by="volatility", stable_coins=["USDT"])
+    ```
+    """
+
+    def __init__(self, client=Future, interval: float = 60):
+        """
+        :param client: Class client Binance (`Future` hoặc `Spot`), dùng `client.ticker_24hr_all`.
+        :param interval: Chu kỳ làm mới qua REST (giây).
+        """
+        self.client = client
+        self.interval = interval
+        self.updated_at = 0.0
+        self.symbols = np.empty(0, dtype=object)
+        self.index: Dict[str, int] = {}
+        self.columns: Dict[str, np.ndarray] = {name: np.empty(0, dtype=dtype) for name, _, _, dtype in TICKER_COLUMNS}
+        # symbol bị loại bởi EXCLUDED_SYMBOL_PATTERN, tính một lần khi danh sách symbol thay đổi
+        self.excluded = np.empty(0, dtype=bool)
+        self._suffix_masks: Dict[tuple, np.ndarray] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def _rebuild(self, symbols: List[str]):
+        """
+        Cấp phát lại bảng khi danh sách symbol thay đổi, giữ giá trị cũ của các symbol còn lại.
+        """
+        old_index, old_columns = self.index, self.columns
+        self.symbols = np.array(symbols, dtype=object)
+        self.index = {symbol: i for i, symbol in enumerate(symbols)}
+        self.excluded = np.fromiter((EXCLUDED_SYMBOL_PATTERN.search(s) is not None for s in symbols), dtype=bool, count=len(symbols))
+        self.columns = {name: np.zeros(len(symbols), dtype=dtype) for name, _, _, dtype in TICKER_COLUMNS}
+        self._suffix_masks = {}
+
+        keep = [(i, old_index[s]) for i, s in enumerate(symbols) if s in old_index]
+        if keep:
+            new_rows, old_rows = np.array(keep).T
+            for name in self.columns:
+                self.columns[name][new_rows] = old_columns[name][old_rows]
+
+    def _apply(self, tickers: Sequence[dict], key_index: int):
+        """
+        Ghi các ticker vào bảng. `key_index` = 1 với dữ liệu REST, 2 với dữ liệu stream.
+        """
+        symbol_key = "symbol" if key_index == 1 else "s"
+        symbols = [t[symbol_key] for t in tickers]
+        if any(s not in self.index for s in symbols):
+            self._rebuild(list(self.index) + [s for s in dict.fromkeys(symbols) if s not in self.index])
+
+        rows = np.fromiter((self.index[s] for s in symbols), dtype=np.int64, count=len(symbols))
+        for column in TICKER_COLUMNS:
+            name, key, dtype = column[0], column[key_index], column[3]
+            self.columns[name][rows] = np.fromiter((t[key] for t in tickers), dtype=dtype, count=len(tickers))
+        self.updated_at = time.time()
+
+    def update(self, tickers: Sequence[dict]):
+        """
+        Thay toàn bộ bảng bằng dữ liệu REST `/ticker/24hr`.
+        """
+        self._rebuild([t["symbol"] for t in tickers])
+        self._apply(tickers, 1)
+
+    def update_stream(self, tickers: Sequence[dict]):
+        """
+        Cập nhật bảng bằng dữ liệu stream `!ticker@arr` (chỉ gồm các symbol thay đổi).
+        """
+        self._apply(tickers, 2)
+
+    async def refresh(self):
+        """
+        Tải lại toàn bộ ticker qua REST.
+        """
+        self.update(await self.client.ticker_24hr_all())
+
+    async def start(self):
+        """
+        Tải dữ liệu lần đầu và chạy task làm mới định kỳ.
+        """
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"⚠️ Error refreshing ticker 24hr: {e}")
+
+    async def on_ticker_arr(self, data: list):
+        """
+        Callback cho stream `!ticker@arr`.
+        """
+        self.update_stream(data)
+
+    async def attach(self, stream):
+        """
+        Cập nhật bảng từ stream `!ticker@arr` của `StreamFuture`/`StreamSpot` (đã kết nối).
+        Có thể dùng cùng với `start` (REST làm mới toàn bộ, stream cập nhật liên tục).
+        """
+        if not len(self):
+            await self.refresh()
+        await stream.subscribe("!ticker@arr", self.on_ticker_arr)
+        log.info(f"{Fore.GREEN}MarketScanner attached to !ticker@arr")
+
+    def filter(
+        self,
+        stable_coins: Optional[Iterable[str]] = None,
+        exclude_special: bool = True,
+        min_quote_volume: float = 0.0,
+        max_age_ms: Optional[int] = 24 * 60 * 60 * 1000,
+    ) -> np.ndarray:
+        """
+        Mask các symbol thỏa điều kiện (cùng điều kiện với `ticker_24hr`), không gọi API.
+
+        :param stable_coins: Chỉ lấy các cặp kết thúc bằng các coin này (VD: ["USDT"]).
+        :param exclude_special: Loại các cặp khớp EXCLUDED_SYMBOL_PATTERN (1000, BEAR, BULL, UP, DOWN, _).
+        :param min_quote_volume: Quote volume tối thiểu.
+        :param max_age_ms: Bỏ các ticker có closeTime cũ hơn khoảng này.
+        :return: Mảng bool.
+        """
+        columns = self.columns
+        mask = (columns["last_qty"] != 0.0) & (columns["volume"] != 0.0)
+        if exclude_special:
+            mask &= ~self.excluded
+        if min_quote_volume:
+            mask &= columns["quote_volume"] >= min_quote_volume
+        if max_age_ms is not None:
+            mask &= columns["close_time"] > int(time.time() * 1000) - max_age_ms
+        if stable_coins:
+            suffixes = tuple(stable_coins)
+            if suffixes not in self._suffix_masks:
+                self._suffix_masks[suffixes] = np.fromiter((s.endswith(suffixes) for s in self.symbols), dtype=bool, count=len(self.symbols))
+            mask &= self._suffix_masks[suffixes]
+        return mask
+
+    def sort_values(self, by: str) -> np.ndarray:
+        """
+        Giá trị dùng để sắp xếp theo tiêu chí `by` (xem SORT_KEYS).
+        """
+        columns = self.columns
+        if by == "change":
+            return columns["price_change_percent"]
+        if by == "abs_change":
+            return np.abs(columns["price_change_percent"])
+        if by == "volatility":
+            low = columns["low_price"]
+            return np.divide(columns["high_price"] - low, low, out=np.zeros_like(low), where=low > 0)
+        if by in ("quote_volume", "volume", "count"):
+            return columns[by]
+        raise ValueError(f"by phải là một trong {SORT_KEYS}")
+
+    def top(self, n: int = 10, by: str = "quote_volume", ascending: bool = False, mask: Optional[np.ndarray] = None, **filters) -> List[dict]:
+        """
+        Lấy top-N symbol theo tiêu chí `by` (dùng argpartition, không sắp xếp toàn bộ bảng).
+
+        :param n: Số symbol cần lấy.
+        :param by: Tiêu chí: quote_volume, volume, change, abs_change, volatility, count.
+        :param ascending: True để lấy nhỏ nhất.
+        :param mask: Mask lọc sẵn, mặc định dùng `filter(**filters)`.
+        :return: Danh sách ticker (dict).
+        """
+        if mask is None:
+            mask = self.filter(**filters)
+        rows = np.flatnonzero(mask)
+        if not len(rows) or n <= 0:
+            return []
+
+        values = self.sort_values(by)[rows]
+        if not ascending:
+            values = -values
+        if n < len(rows):
+            part = np.argpartition(values, n - 1)[:n]
+            rows, values = rows[part], values[part]
+        return self.records(rows[np.argsort(values, kind="stable")])
+
+    def records(self, rows: Optional[np.ndarray] = None) -> List[dict]:
+        """
+        Chuyển các dòng của bảng thành danh sách dict.
+        """
+        if rows is None:
+            rows = np.arange(len(self))
+        columns = {name: column[rows].tolist() for name, column in self.columns.items()}
+        symbols = self.symbols[rows].tolist()
+        return [
+            {"symbol": symbol, **{name: values[i] for name, values in columns.items()}}
+            for i, symbol in enumerate(symbols)
+        ]
@@ -0,0 +1,643 @@
+import argparse
+import asyncio
+import bisect
+import hashlib
+import math
+import time
+import zlib
+from collections import defaultdict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+
+import orjson
+from aiohttp import WSMsgType, web
+
+from app.utils.log import log
+from app.utils.timeframe import timeframe_to_ms
+from .ws_pool import REQUEST_WEIGHTS, WeightLimiter
+
+
+# Weight của các endpoint REST (xấp xỉ theo Binance Futures)
+REST_WEIGHTS = {
+    "klines": 5,
+    "ticker/24hr": 40,
+    "exchangeInfo": 1,
+    "depth": 20,
+    "aggTrades": 20,
+}
+
+# Số message điều khiển (SUBSCRIBE/UNSUBSCRIBE/...) tối đa mỗi giây trên một kết nối stream
+MAX_CONTROL_MESSAGES_PER_SECOND = 10
+
+
+def _unit(*parts) -> float:
+    """
+    Số giả ngẫu nhiên trong [0, 1) xác định từ các tham số (không phụ thuộc PYTHONHASHSEED).
+    """
+    return zlib.crc32(":".join(map(str, parts)).encode()) / 2 ** 32
+
+
+def _fmt(value: float, digits: int = 2) -> str:
+    return f"{value:.{digits}f}"
+
+
+class SyntheticMarket:
+    """
+    Dữ liệu thị trường giả lập, xác định (deterministic) theo seed:
+        - Nến và trade lịch sử được tính từ thời gian / trade ID nên truy vấn lặp lại trả cùng kết quả.
+        - Trade ID lịch sử: trade thứ i có thời gian `epoch + i * 1000 / trades_per_second`.
+        - Order book và trade ID live tăng dần theo số event đã phát.
+    """
+
+    def __init__(self, symbols: List[str] = None, seed: int = 0, trades_per_second: float = 20.0, epoch_ms: int = 1_600_000_000_000):
+        self.symbols = [s.upper() for s in (symbols or ["BTCUSDT", "ETHUSDT", "BNBUSDT"])]
+        self.seed = seed
+        self.trades_per_second = trades_per_second
+        self.epoch_ms = epoch_ms
+        self.base_prices = {s: 10 ** (1 + 4 * _unit(seed, s)) for s in self.symbols}
+        self.live_trade_id: Dict[str, int] = {}
+        self.trade_times: Dict[str, Deque[Tuple[int, int]]] = defaultdict(lambda: deque(maxlen=200_000))
+        self.books: Dict[str, Tuple[Dict[float, float], Dict[float, float]]] = {}
+        self.update_ids: Dict[str, int] = defaultdict(lambda: 1_000_000)
+
+    def price(self, symbol: str, t: int) -> float:
+        """
+        Giá tham chiếu tại thời điểm t (ms): dao động điều hòa quanh giá cơ sở.
+        """
+        base = self.base_prices.get(symbol, 100.0)
+        phase = _unit(self.seed, symbol, "phase") * 2 * math.pi
+        return base * (1 + 0.05 * math.sin(t / 3_600_000 + phase) + 0.01 * math.sin(t / 97_000 + phase))
+
+    # ---------- nến ----------
+
+    def kline(self, symbol: str, interval: str, open_time: int) -> list:
+        """
+        Một nến theo định dạng REST `/klines`.
+        """
+        ms = timeframe_to_ms(interval)
+        open_ = self.price(symbol, open_time)
+        close = self.price(symbol, open_time + ms)
+        high = max(open_, close) * (1 + 0.002 * _unit(self.seed, symbol, open_time, "h"))
+        low = min(open_, close) * (1 - 0.002 * _unit(self.seed, symbol, open_time, "l"))
+        volume = 10 + 100 * _unit(self.seed, symbol, open_time, "v") * ms / 60_000
+        taker = volume * _unit(self.seed, symbol, open_time, "t")
+        trades = int(volume * 3) + 1
+        vwap = (open_ + close) / 2
+        return [open_time, _fmt(open_), _fmt(high), _fmt(low), _fmt(close), _fmt(volume, 3), open_time + ms - 1,
+                _fmt(volume * vwap, 4), trades, _fmt(taker, 3), _fmt(taker * vwap, 4), "0"]
+
+    def klines(self, symbol: str, interval: str, start_time: Optional[int], end_time: Optional[int], limit: int = 500) -> List[list]:
+        ms = timeframe_to_ms(interval)
+        now = int(time.time() * 1000)
+        end_time = min(end_time or now, now)
+        if start_time is None:
+            start_time = end_time - ms * limit
+        open_time = -(-start_time // ms) * ms
+        result = []
+        while open_time <= end_time and len(result) < limit:
+            result.append(self.kline(symbol, interval, open_time))
+            open_time += ms
+        return result
+
+    # ---------- trades ----------
+
+    def historical_trade_id(self, t: int) -> int:
+        return max(int((t - self.epoch_ms) * self.trades_per_second / 1000), 0)
+
+    def trade_time(self, symbol: str, trade_id: int) -> int:
+        times = self.trade_times.get(symbol)
+        if times and trade_id >= times[0][0]:
+            i = bisect.bisect_left(times, (trade_id, 0))
+            if i < len(times) and times[i][0] == trade_id:
+                return times[i][1]
+        return self.epoch_ms + int(trade_id * 1000 / self.trades_per_second)
+
+    def trade(self, symbol: str, trade_id: int) -> dict:
+        """
+        Một trade theo định dạng WebSocket API `trades.historical`.
+        """
+        t = self.trade_time(symbol, trade_id)
+        price = self.price(symbol, t) * (1 + 0.0005 * (_unit(self.seed, symbol, trade_id, "p") - 0.5))
+        qty = 0.001 + 2 * _unit(self.seed, symbol, trade_id, "q") ** 3
+        return {
+            "id": trade_id,
+            "price": _fmt(price),
+            "qty": _fmt(qty, 3),
+            "quoteQty": _fmt(price * qty, 4),
+            "time": t,
+            "isBuyerMaker": _unit(self.seed, symbol, trade_id, "m") < 0.5,
+            "isBestMatch": True,
+        }
+
+    def historical_trades(self, symbol: str, from_id: Optional[int], limit: int) -> List[dict]:
+        last_id = self.live_trade_id.get(symbol, self.historical_trade_id(int(time.time() * 1000)))
+        if from_id is None:
+            from_id = max(last_id - limit + 1, 0)
+        return [self.trade(symbol, i) for i in range(from_id, min(from_id + limit, last_id + 1))]
+
+    def first_trade_id(self, symbol: str, t: int) -> int:
+        """
+        ID của trade đầu tiên có thời gian >= `t`.
+        """
+        trade_id = self.historical_trade_id(t)
+        while self.trade_time(symbol, trade_id) < t:
+            trade_id += 1
+        return trade_id
+
+    def agg_trade(self, symbol: str, trade_id: int) -> dict:
+        """
+        Một aggTrade theo định dạng REST `/aggTrades` (mỗi aggTrade gồm đúng 1 trade).
+        """
+        trade = self.trade(symbol, trade_id)
+        return {"a": trade_id, "p": trade["price"], "q": trade["qty"], "f": trade_id, "l": trade_id,
+                "T": trade["time"], "m": trade["isBuyerMaker"]}
+
+    def next_trade(self, symbol: str) -> dict:
+        """
+        Sinh trade live tiếp theo (ID tăng dần, thời gian là thời điểm hiện tại).
+        """
+        now = int(time.time() * 1000)
+        trade_id = self.live_trade_id.get(symbol, self.historical_trade_id(now)) + 1
+        self.live_trade_id[symbol] = trade_id
+        self.trade_times[symbol].append((trade_id, now))
+        return self.trade(symbol, trade_id)
+
+    # ---------- order book ----------
+
+    def book(self, symbol: str):
+        if symbol not in self.books:
+            mid = self.price(symbol, int(time.time() * 1000))
+            tick = mid / 10_000
+            bids = {round(mid - tick * (i + 1), 2): round(1 + 5 * _unit(self.seed, symbol, i, "b"), 3) for i in range(100)}
+            asks = {round(mid + tick * (i + 1), 2): round(1 + 5 * _unit(self.seed, symbol, i, "a"), 3) for i in range(100)}
+            self.books[symbol] = (bids, asks)
+        return self.books[symbol]
+
+    def depth_snapshot(self, symbol: str, limit: int = 1000) -> dict:
+        bids, asks = self.book(symbol)
+        now = int(time.time() * 1000)
+        return {
+            "lastUpdateId": self.update_ids[symbol],
+            "E": now,
+            "T": now,
+            "bids": [[_fmt(p), _fmt(q, 3)] for p, q in sorted(bids.items(), reverse=True)[:limit]],
+            "asks": [[_fmt(p), _fmt(q, 3)] for p, q in sorted(asks.items())[:limit]],
+        }
+
+    def depth_update(self, symbol: str) -> dict:
+        """
+        Sinh một diff depth (định dạng Futures: có `pu`), cập nhật order book nội bộ.
+        """
+        bids, asks = self.book(symbol)
+        previous = self.update_ids[symbol]
+        changes = 1 + int(5 * _unit(self.seed, symbol, previous, "n"))
+        first = previous + 1
+        last = previous + changes
+        self.update_ids[symbol] = last
+        b, a = [], []
+        for k in range(changes):
+            side, levels, out = (bids, b, "b") if k % 2 == 0 else (asks, a, "a")
+            price = sorted(side)[int(len(side) * _unit(self.seed, symbol, last, k)) % len(side)] if side else 0.0
+            qty = 0.0 if _unit(self.seed, symbol, last, k, "z") < 0.2 else round(1 + 5 * _unit(self.seed, symbol, last, k, "q"), 3)
+            if qty:
+                side[price] = qty
+            else:
+                side.pop(price, None)
+            levels.append([_fmt(price), _fmt(qty, 3)])
+        now = int(time.time() * 1000)
+        return {"e": "depthUpdate", "E": now, "T": now, "s": symbol, "U": first, "u": last, "pu": previous, "b": b, "a": a}
+
+    # ---------- ticker / exchangeInfo ----------
+
+    def ticker(self, symbol: str) -> dict:
+        now = int(time.time() * 1000)
+        last = self.price(symbol, now)
+        open_ = self.price(symbol, now - 86_400_000)
+        high, low = max(last, open_) * 1.01, min(last, open_) * 0.99
+        volume = 1000 + 10_000 * _unit(self.seed, symbol, "vol")
+        return {
+            "symbol": symbol, "priceChange": _fmt(last - open_), "priceChangePercent": _fmt((last / open_ - 1) * 100, 3),
+            "weightedAvgPrice": _fmt((last + open_) / 2), "lastPrice": _fmt(last), "lastQty": "0.010",
+            "openPrice": _fmt(open_), "highPrice": _fmt(high), "lowPrice": _fmt(low), "volume": _fmt(volume, 3),
+            "quoteVolume": _fmt(volume * last, 2), "openTime": now - 86_400_000, "closeTime": now,
+            "firstId": 1, "lastId": 1000, "count": 1000,
+        }
+
+    def exchange_info(self) -> dict:
+        symbols = []
+        for symbol in self.symbols:
+            quote = "USDT" if symbol.endswith("USDT") else symbol[-3:]
+            symbols.append({
+                "symbol": symbol, "status": "TRADING", "contractType": "PERPETUAL",
+                "baseAsset": symbol[:-len(quote)], "quoteAsset": quote,
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "tickSize": "0.01", "minPrice": "0.01", "maxPrice": "1000000"},
+                    {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"},
+                    {"filterType": "MIN_NOTIONAL", "notional": "5"},
+                ],
+            })
+        return {"timezone": "UTC", "serverTime": int(time.time() * 1000), "rateLimits": [], "symbols": symbols}
+
+    # ---------- stream events ----------
+
+    def stream_event(self, stream: str) -> Union[dict, list, None]:
+        """
+        Sinh event tiếp theo cho một stream (VD: "btcusdt@aggTrade", "btcusdt@kline_1m", "!ticker@arr").
+        """
+        if stream == "!ticker@arr":
+            now = int(time.time() * 1000)
+            return [{"e": "24hrTicker", "E": now, "s": t["symbol"], "p": t["priceChange"], "P": t["priceChangePercent"],
+                     "w": t["weightedAvgPrice"], "c": t["lastPrice"], "Q": t["lastQty"], "o": t["openPrice"],
+                     "h": t["highPrice"], "l": t["lowPrice"], "v": t["volume"], "q": t["quoteVolume"],
+                     "O": t["openTime"], "C": t["closeTime"], "F": t["firstId"], "L": t["lastId"], "n": t["count"]}
+                    for t in map(self.ticker, self.symbols)]
+
+        symbol, _, kind = stream.partition("@")
+        symbol = symbol.upper()
+        kind = kind.split("@")[0]
+        now = int(time.time() * 1000)
+        if kind in ("aggTrade", "trade"):
+            trade = self.next_trade(symbol)
+            if kind == "trade":
+                return {"e": "trade", "E": now, "T": trade["time"], "s": symbol, "t": trade["id"], "p": trade["price"],
+                        "q": trade["qty"], "X": "MARKET", "m": trade["isBuyerMaker"]}
+            agg = self.agg_trade(symbol, trade["id"])
+            return {"e": "aggTrade", "E": now, "s": symbol, **agg}
+        if kind == "depth":
+            return self.depth_update(symbol)
+        if kind == "markPrice":
+            price = self.price(symbol, now)
+            return {"e": "markPriceUpdate", "E": now, "s": symbol, "p": _fmt(price), "i": _fmt(price * 0.9999),
+                    "P": _fmt(price * 1.0001), "r": "0.00010000", "T": now - now % 28_800_000 + 28_800_000}
+        if kind.startswith("kline_"):
+            interval = kind[len("kline_"):]
+            ms = timeframe_to_ms(interval)
+            row = self.kline(symbol, interval, now - now % ms)
+            return {"e": "kline", "E": now, "s": symbol, "k": {
+                "t": row[0], "T": row[6], "s": symbol, "i": interval, "f": 0, "L": 0, "o": row[1], "c": row[4],
+                "h": row[2], "l": row[3], "v": row[5], "n": row[8], "x": False, "q": row[7], "V": row[9], "Q": row[10], "B": "0"}}
+        return None
+
+
+class MockBinanceServer:
+    """
+    Server Binance giả lập chạy local (aiohttp) để test tải / benchmark offline:
+        - REST: `/fapi/v1/*` và `/api/v3/*`: klines, ticker/24hr, exchangeInfo, depth, aggTrades.
+        - WebSocket API: `/ws-api/v3` (klines, trades.historical, ping).
+        - Market streams: `/ws` (SUBSCRIBE/UNSUBSCRIBE) và `/stream?streams=...` (combined).
+        - Phát event với tốc độ cấu hình được (có thể cao hơn nhiều so với thực tế), từ dữ liệu giả lập
+          hoặc dữ liệu đã ghi (file JSONL các message combined `{"stream": ..., "data": ...}`).
+        - Header `X-MBX-USED-WEIGHT-1M`, trả 429 khi vượt weight, đóng WebSocket với mã 1008 khi vượt quá nhiều
+          hoặc gửi quá 10 message điều khiển mỗi giây.
+
+    Ví dụ:
+    ```python
+    server = await MockBinanceServer(rate=1000).start()
+    client = Future(url=server.ws_api_url, url_http=server.future_http_url)  # REST lẫn WebSocket API đều qua server
+    depth = await client.get_depth("BTCUSDT")
+    book = OrderBook("BTCUSDT", client=client)
+    stream = StreamFuture(url=server.stream_url, url_http=server.future_http_url)
+    ```
+    Hoặc chạy độc lập: `python -m app.utils.Binance.mock_server --port 9000 --rate 500`
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        market: Optional[SyntheticMarket] = None,
+        rate: float = 10.0,
+        weight_limit: int = 2400,
+        ban_factor: float = 1.2,
+        recorded: Optional[Union[str, Path]] = None,
+    ):
+        """
+        :param host: Địa chỉ lắng nghe.
+        :param port: Cổng (0 = tự chọn cổng trống).
+        :param market: Nguồn dữ liệu giả lập.
+        :param rate: Số event mỗi giây cho mỗi stream.
+        :param weight_limit: Giới hạn request weight mỗi phút cho mỗi IP.
+        :param ban_factor: Khi weight dùng vượt `weight_limit * ban_factor`, kết nối WebSocket bị đóng với mã 1008.
+        :param recorded: File JSONL các message combined để phát lại thay cho dữ liệu giả lập.
+        """
+        self.host = host
+        self.port = port
+        self.market = market or SyntheticMarket()
+        self.rate = rate
+        self.weight_limit = weight_limit
+        self.ban_factor = ban_factor
+        self.recorded = self._load_recorded(recorded) if recorded else {}
+        self.limiters: Dict[str, WeightLimiter] = defaultdict(lambda: WeightLimiter(weight_limit))
+        self.stream_clients: Dict[str, Set[Tuple[web.WebSocketResponse, bool]]] = defaultdict(set)
+        self.publishers: Dict[str, asyncio.Task] = {}
+        self.connections: Set[web.WebSocketResponse] = set()
+        self.messages_sent = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    @staticmethod
+    def _load_recorded(path: Union[str, Path]) -> Dict[str, List[dict]]:
+        recorded: Dict[str, List[dict]] = defaultdict(list)
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    message = orjson.loads(line)
+                    recorded[message["stream"]].append(message["data"])
+        return recorded
+
+    # ---------- vòng đời ----------
+
+    async def start(self) -> "MockBinanceServer":
+        app = web.Application()
+        for prefix in ("/fapi/v1", "/api/v3"):
+            app.router.add_get(f"{prefix}/klines", self.handle_klines)
+            app.router.add_get(f"{prefix}/ticker/24hr", self.handle_ticker)
+            app.router.add_get(f"{prefix}/exchangeInfo", self.handle_exchange_info)
+            app.router.add_get(f"{prefix}/depth", self.handle_depth)
+            app.router.add_get(f"{prefix}/aggTrades", self.handle_agg_trades)
+        app.router.add_get("/ws-api/v3", self.handle_ws_api)
+        app.router.add_get("/ws", self.handle_stream)
+        app.router.add_get("/ws/{streams:.*}", self.handle_stream)
+        app.router.add_get("/stream", self.handle_stream)
+
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        log.info(f"Mock Binance server listening on http://{self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        for task in self.publishers.values():
+            task.cancel()
+        self.publishers.clear()
+        await self.close_connections()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def close_connections(self, code: int = 1001, message: bytes = b"Server shutdown"):
+        """
+        Đóng mọi kết nối WebSocket (dùng để test reconnect).
+        """
+        for ws in list(self.connections):
+            await ws.close(code=code, message=message)
+
+    @property
+    def base_http_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def future_http_url(self) -> str:
+        return f"{self.base_http_url}/fapi/v1"
+
+    @property
+    def spot_http_url(self) -> str:
+        return f"{self.base_http_url}/api/v3"
+
+    @property
+    def ws_api_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws-api/v3"
+
+    @property
+    def stream_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    @property
+    def combined_stream_url(self) -> str:
+        return f"ws://{self.host}:{self.port}/stream"
+
+    # ---------- weight ----------
+
+    def _use_weight(self, key: str, weight: int) -> Tuple[int, bool]:
+        """
+        Ghi nhận weight cho `key` (IP). Trả về (weight đã dùng, có vượt giới hạn không).
+        """
+        limiter = self.limiters[key]
+        limiter.add(weight)
+        used = limiter.used()
+        return used, used > self.weight_limit
+
+    def _rest_response(self, request: web.Request, endpoint: str, body) -> web.Response:
+        used, exceeded = self._use_weight(request.remote or "", REST_WEIGHTS.get(endpoint, 1))
+        headers = {"X-MBX-USED-WEIGHT-1M": str(used)}
+        if exceeded:
+            return web.Response(status=429, headers=headers, content_type="application/json",
+                                body=orjson.dumps({"code": -1003, "msg": "Too many requests; current limit is exceeded."}))
+        return web.Response(headers=headers, content_type="application/json", body=orjson.dumps(body))
+
+    # ---------- REST ----------
+
+    async def handle_klines(self, request: web.Request) -> web.Response:
+        q = request.query
+        klines = self.market.klines(
+            q["symbol"].upper(), q.get("interval", "1m"),
+            int(q["startTime"]) if "startTime" in q else None,
+            int(q["endTime"]) if "endTime" in q else None,
+            min(int(q.get("limit", 500)), 1500),
+        )
+        return self._rest_response(request, "klines", klines)
+
+    async def handle_ticker(self, request: web.Request) -> web.Response:
+        symbol = request.query.get("symbol")
+        body = self.market.ticker(symbol.upper()) if symbol else [self.market.ticker(s) for s in self.market.symbols]
+        return self._rest_response(request, "ticker/24hr", body)
+
+    async def handle_exchange_info(self, request: web.Request) -> web.Response:
+        body = self.market.exchange_info()
+        etag = '"' + hashlib.md5(orjson.dumps(body["symbols"])).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        response = self._rest_response(request, "exchangeInfo", body)
+        response.headers["ETag"] = etag
+        return response
+
+    async def handle_depth(self, request: web.Request) -> web.Response:
+        snapshot = self.market.depth_snapshot(request.query["symbol"].upper(), int(request.query.get("limit", 1000)))
+        return self._rest_response(request, "depth", snapshot)
+
+    async def handle_agg_trades(self, request: web.Request) -> web.Response:
+        q = request.query
+        symbol = q["symbol"].upper()
+        limit = min(int(q.get("limit", 500)), 1000)
+        last_id = self.market.live_trade_id.get(symbol, self.market.historical_trade_id(int(time.time() * 1000)))
+        if "fromId" in q:
+            from_id = int(q["fromId"])
+        elif "startTime" in q:
+            from_id = self.market.first_trade_id(symbol, int(q["startTime"]))
+        else:
+            from_id = max(last_id - limit + 1, 0)
+        body = [self.market.agg_trade(symbol, i) for i in range(from_id, min(from_id + limit, last_id + 1))]
+        if "endTime" in q:
+            body = [trade for trade in body if trade["T"] <= int(q["endTime"])]
+        return self._rest_response(request, "aggTrades", body)
+
+    # ---------- WebSocket API ----------
+
+    async def handle_ws_api(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        self.connections.add(ws)
+        key = request.remote or ""
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                payload = orjson.loads(msg.data)
+                method, params = payload.get("method"), payload.get("params", {})
+                used, exceeded = self._use_weight(key, REQUEST_WEIGHTS.get(method, 1))
+                rate_limits = [{"rateLimitType": "REQUEST_WEIGHT", "interval": "MINUTE", "intervalNum": 1,
+                                "limit": self.weight_limit, "count": used}]
+                if used > self.weight_limit * self.ban_factor:
+                    await ws.close(code=1008, message=b"Policy violation")
+                    break
+                if exceeded:
+                    response = {"id": payload.get("id"), "status": 429, "rateLimits": rate_limits,
+                                "error": {"code": -1003, "msg": "Too many requests.",
+                                          "data": {"retryAfter": int(time.time() * 1000) + 1000}}}
+                else:
+                    response = {"id": payload.get("id"), "status": 200, "rateLimits": rate_limits,
+                                "result": self._ws_api_result(method, params)}
+                await ws.send_str(orjson.dumps(response).decode())
+        finally:
+            self.connections.discard(ws)
+        return ws
+
+    def _ws_api_result(self, method: str, params: dict):
+        if method == "klines":
+            return self.market.klines(params["symbol"].upper(), params.get("interval", "1m"), params.get("startTime"),
+                                      params.get("endTime"), min(params.get("limit", 500), 1000))
+        if method == "trades.historical":
+            return self.market.historical_trades(params["symbol"].upper(), params.get("fromId"), min(params.get("limit", 500), 1000))
+        if method in ("ping", "time"):
+            return {"serverTime": int(time.time() * 1000)} if method == "time" else {}
+        return None
+
+    # ---------- market streams ----------
+
+    async def handle_stream(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        self.connections.add(ws)
+        combined = request.path.startswith("/stream")
+        initial = request.query.get("streams") or request.match_info.get("streams") or ""
+        subscribed: Set[str] = set()
+        for stream in filter(None, initial.split("/")):
+            self._subscribe(ws, combined, stream, subscribed)
+
+        control_times: Deque[float] = deque()
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                now = time.monotonic()
+                control_times.append(now)
+                while control_times and now - control_times[0] > 1.0:
+                    control_times.popleft()
+                if len(control_times) > MAX_CONTROL_MESSAGES_PER_SECOND:
+                    await ws.close(code=1008, message=b"Too many requests")
+                    break
+
+                payload = orjson.loads(msg.data)
+                method, params = payload.get("method"), payload.get("params", [])
+                result = None
+                if method == "SUBSCRIBE":
+                    for stream in params:
+                        self._subscribe(ws, combined, stream, subscribed)
+                elif method == "UNSUBSCRIBE":
+                    for stream in params:
+                        self._unsubscribe(ws, combined, stream, subscribed)
+                elif method == "LIST_SUBSCRIPTIONS":
+                    result = sorted(subscribed)
+                await ws.send_str(orjson.dumps({"result": result, "id": payload.get("id")}).decode())
+        finally:
+            for stream in list(subscribed):
+                self._unsubscribe(ws, combined, stream, subscribed)
+            self.connections.discard(ws)
+        return ws
+
+    def _subscribe(self, ws: web.WebSocketResponse, combined: bool, stream: str, subscribed: Set[str]):
+        subscribed.add(stream)
+        self.stream_clients[stream].add((ws, combined))
+        if stream not in self.publishers:
+            self.publishers[stream] = asyncio.create_task(self._publish(stream))
+
+    def _unsubscribe(self, ws: web.WebSocketResponse, combined: bool, stream: str, subscribed: Set[str]):
+        subscribed.discard(stream)
+        clients = self.stream_clients.get(stream)
+        if clients is not None:
+            clients.discard((ws, combined))
+            if not clients:
+                del self.stream_clients[stream]
+                task = self.publishers.pop(stream, None)
+                if task:
+                    task.cancel()
+
+    async def _publish(self, stream: str):
+        """
+        Phát event của `stream` tới mọi kết nối đã subscribe với tốc độ `rate` event/giây.
+        Tốc độ cao được gom thành nhiều event mỗi nhịp (nhịp tối thiểu 1ms).
+        """
+        interval = max(1.0 / self.rate, 0.001)
+        per_tick = max(1, round(self.rate * interval))
+        recorded = self.recorded.get(stream)
+        position = 0
+        next_tick = time.monotonic()
+        while True:
+            clients = self.stream_clients.get(stream)
+            if not clients:
+                self.stream_clients.pop(stream, None)
+                if self.publishers.get(stream) is asyncio.current_task():
+                    del self.publishers[stream]
+                return
+            for _ in range(per_tick):
+                if recorded:
+                    data = recorded[position % len(recorded)]
+                    position += 1
+                else:
+                    data = self.market.stream_event(stream)
+                if data is None:
+                    return
+                raw = orjson.dumps(data).decode()
+                wrapped = None
+                for client in list(clients):
+                    ws, combined = client
+                    if ws.closed:
+                        continue
+                    if combined:
+                        wrapped = wrapped or orjson.dumps({"stream": stream, "data": data}).decode()
+                    try:
+                        await ws.send_str(wrapped if combined else raw)
+                    except Exception as e:
+                        # client mất kết nối giữa chừng: bỏ client đó, các client khác vẫn nhận event
+                        log.warning(f"Mock stream {stream}: dropping client ({type(e).__name__}: {e})")
+                        clients.discard(client)
+                        continue
+                    self.messages_sent += 1
+            next_tick += interval
+            await asyncio.sleep(max(next_tick - time.monotonic(), 0))
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Local Binance stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--rate", type=float, default=10.0, help="events per second per stream")
+    parser.add_argument("--symbols", default="BTCUSDT,ETHUSDT,BNBUSDT")
+    parser.add_argument("--weight-limit", type=int, default=2400)
+    parser.add_argument("--recorded", default=None, help="JSONL file of combined stream messages to replay")
+    args = parser.parse_args()
+
+    server = MockBinanceServer(
+        args.host, args.port, SyntheticMarket(args.symbols.split(",")),
+        rate=args.rate, weight_limit=args.weight_limit, recorded=args.recorded,
+    )
+    await server.start()
+    print(f"REST:  {server.future_http_url}  {server.spot_http_url}")
+    print(f"WSAPI: {server.ws_api_url}")
+    print(f"Stream: {server.stream_url}  {server.combined_stream_url}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
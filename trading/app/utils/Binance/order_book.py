@@ -0,0 +1,274 @@
+import asyncio
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from colorama import Fore
+
+from app.utils.log import log
+from .dispatch import DispatchMode
+from .Future import Future
+
+
+class BookSide:
+    """
+    Một phía của order book: các mức giá được giữ sắp xếp trong hai list song song (giá, khối lượng).
+    Tìm mức giá bằng bisect O(log n); cập nhật khối lượng của mức đã có là O(log n),
+    thêm / xóa mức là một lần dịch mảng (memmove) nên vẫn rất nhanh với vài nghìn mức.
+
+    Phía bid lưu khóa là giá âm để cả hai phía đều sắp xếp tăng dần theo "độ tốt" của giá.
+    """
+    __slots__ = ("descending", "keys", "qtys")
+
+    def __init__(self, descending: bool):
+        self.descending = descending
+        self.keys: List[float] = []
+        self.qtys: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _key(self, price: float) -> float:
+        return -price if self.descending else price
+
+    def clear(self):
+        self.keys.clear()
+        self.qtys.clear()
+
+    def load(self, levels: Iterable[Sequence]):
+        """
+        Nạp toàn bộ các mức giá (VD: từ snapshot REST).
+        """
+        pairs = sorted((self._key(float(price)), float(qty)) for price, qty in levels if float(qty))
+        self.keys = [k for k, _ in pairs]
+        self.qtys = [q for _, q in pairs]
+
+    def update(self, price: float, qty: float):
+        """
+        Đặt khối lượng của một mức giá, qty = 0 để xóa mức.
+        """
+        keys = self.keys
+        key = -price if self.descending else price
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if qty:
+                self.qtys[i] = qty
+            else:
+                del keys[i]
+                del self.qtys[i]
+        elif qty:
+            keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.keys:
+            return None
+        return self._key(self.keys[0]), self.qtys[0]
+
+    def top(self, n: int) -> List[Tuple[float, float]]:
+        return [(self._key(k), q) for k, q in zip(self.keys[:n], self.qtys[:n])]
+
+    def volume_within(self, price_limit: float) -> float:
+        """
+        Tổng khối lượng của các mức tốt hơn hoặc bằng `price_limit`.
+        """
+        return sum(self.qtys[:bisect_right(self.keys, self._key(price_limit))])
+
+
+class OrderBook:
+    """
+    Order book local của một symbol, dựng từ snapshot REST và diff depth stream:
+        - Diff đến trước khi có snapshot được đệm lại, áp dụng sau snapshot theo đúng quy tắc của Binance.
+        - Kiểm tra tính liên tục của update ID (Futures: `pu` == `u` trước đó; Spot: `U` == `u` trước đó + 1),
+          tự đồng bộ lại từ snapshot khi phát hiện mất diff.
+        - Đọc nhanh: best bid/ask, top N mức, khối lượng trong dải % quanh giá giữa, microprice.
+
+    Ví dụ:
+    ```python
+    book = OrderBook("BTCUSDT", Future)
+    await book.attach(stream)  # StreamFuture đã kết nối
+    book.best_bid(), book.top(10), book.depth_within(0.5), book.microprice()
+    ```
+    """
+
+    def __init__(self, symbol: str, client=Future, depth_limit: int = 1000):
+        """
+        :param symbol: Cặp tiền (VD: "BTCUSDT").
+        :param client: Class client REST (`Future` hoặc `Spot`), dùng `client.get_depth`.
+        :param depth_limit: Số mức giá của snapshot REST.
+        """
+        self.symbol = symbol.upper()
+        self.client = client
+        self.depth_limit = depth_limit
+        self.bids = BookSide(descending=True)
+        self.asks = BookSide(descending=False)
+        self.last_update_id = 0
+        self.event_time = 0
+        self.synced = False
+        self.resyncs = 0
+        self._buffer: List[dict] = []
+        self._sync_task: Optional[asyncio.Task] = None
+        # Gọi (đồng bộ) sau mỗi lần book thay đổi, VD: `Conflator.add_book`
+        self.listeners: List[Callable[["OrderBook"], None]] = []
+
+    # ---------- đồng bộ ----------
+
+    def load_snapshot(self, snapshot: dict):
+        """
+        Nạp snapshot REST `/depth` rồi áp dụng các diff đang đệm.
+        """
+        self.bids.load(snapshot["bids"])
+        self.asks.load(snapshot["asks"])
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.event_time = snapshot.get("E", 0)
+        self.synced = True
+
+        buffer, self._buffer = self._buffer, []
+        first = True
+        for i, event in enumerate(buffer):
+            if event["u"] < self.last_update_id:
+                continue
+            if first:
+                # Diff đầu tiên phải chứa lastUpdateId của snapshot
+                if event["U"] > self.last_update_id + 1:
+                    log.error(f"{Fore.RED}⚠️ Order book {self.symbol}: snapshot {self.last_update_id} is older than buffered diffs, resyncing")
+                    self._buffer = buffer
+                    self.synced = False
+                    return
+                self._apply(event)
+                first = False
+            elif not self.apply(event):
+                self._buffer.extend(buffer[i + 1:])
+                return
+        self._notify()
+
+    async def sync(self):
+        """
+        Lấy snapshot REST và đồng bộ order book, thử lại tới khi thành công.
+        """
+        try:
+            while True:
+                try:
+                    self.load_snapshot(await self.client.get_depth(self.symbol, self.depth_limit))
+                    if self.synced:
+                        log.info(f"{Fore.GREEN}Order book {self.symbol} synced at {self.last_update_id}")
+                        return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.error(f"{Fore.RED}⚠️ Order book {self.symbol}: snapshot failed: {e}")
+                await asyncio.sleep(1)
+        finally:
+            self._sync_task = None
+
+    def resync(self):
+        """
+        Bỏ trạng thái hiện tại và đồng bộ lại từ snapshot (các diff mới tiếp tục được đệm).
+        """
+        self.synced = False
+        self.resyncs += 1
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self.sync())
+
+    def _apply(self, event: dict):
+        for price, qty in event["b"]:
+            self.bids.update(float(price), float(qty))
+        for price, qty in event["a"]:
+            self.asks.update(float(price), float(qty))
+        self.last_update_id = event["u"]
+        self.event_time = event["E"]
+        self._notify()
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener(self)
+
+    def apply(self, event: dict) -> bool:
+        """
+        Áp dụng một diff depth đã đồng bộ. Trả về False (và tự đồng bộ lại) nếu phát hiện mất diff.
+        """
+        if event["u"] <= self.last_update_id:
+            return True
+        previous = event.get("pu")
+        continuous = previous == self.last_update_id if previous is not None else event["U"] == self.last_update_id + 1
+        if not continuous:
+            log.error(f"{Fore.RED}⚠️ Order book {self.symbol}: gap {self.last_update_id} -> {event['U']}, resyncing")
+            self._buffer = [event]
+            self.resync()
+            return False
+        self._apply(event)
+        return True
+
+    async def on_depth(self, event: dict):
+        """
+        Callback cho stream diff depth (`<symbol>@depth` / `<symbol>@depth@100ms`).
+        """
+        if self.synced:
+            self.apply(event)
+            return
+        self._buffer.append(event)
+        if self._sync_task is None:
+            self._sync_task = asyncio.create_task(self.sync())
+
+    async def attach(self, stream, speed: str = "@100ms"):
+        """
+        Subscribe diff depth trên `StreamFuture`/`StreamSpot`/`StreamManager` (theo thứ tự) và đồng bộ.
+        """
+        await stream.subscribe(f"{self.symbol.lower()}@depth{speed}", self.on_depth, mode=DispatchMode.ORDERED)
+
+    # ---------- đọc ----------
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.best()
+
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def top(self, n: int = 10) -> Dict[str, List[Tuple[float, float]]]:
+        """
+        N mức giá tốt nhất mỗi phía.
+        """
+        return {"bids": self.bids.top(n), "asks": self.asks.top(n)}
+
+    def depth_within(self, percent: float) -> Tuple[float, float]:
+        """
+        Tổng khối lượng (bid, ask) trong dải `percent`% quanh giá giữa.
+        """
+        mid = self.mid_price()
+        if mid is None:
+            return 0.0, 0.0
+        band = mid * percent / 100
+        return self.bids.volume_within(mid - band), self.asks.volume_within(mid + band)
+
+    def snapshot(self, levels: int = 20) -> dict:
+        """
+        Top `levels` mức mỗi phía theo định dạng gửi cho client.
+        """
+        return {
+            "symbol": self.symbol,
+            "lastUpdateId": self.last_update_id,
+            "E": self.event_time,
+            "bids": self.bids.top(levels),
+            "asks": self.asks.top(levels),
+        }
+
+    def microprice(self) -> Optional[float]:
+        """
+        Giá giữa có trọng số theo khối lượng ở mức tốt nhất: (bid * ask_qty + ask * bid_qty) / (bid_qty + ask_qty).
+        """
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        (bid_price, bid_qty), (ask_price, ask_qty) = bid, ask
+        return (bid_price * ask_qty + ask_price * bid_qty) / (bid_qty + ask_qty)
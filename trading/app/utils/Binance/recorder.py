@@ -0,0 +1,326 @@
+import asyncio
+import gzip
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import orjson
+from colorama import Fore
+from websockets import State
+
+from app.utils.log import log
+from .dispatch import DispatchMode
+from .StreamFuture import StreamFuture
+
+# Mỗi bản ghi: header (thời điểm nhận - ns, độ dài frame) + frame gốc (UTF-8)
+RECORD_HEADER = struct.Struct("<qI")
+SEGMENT_SUFFIX = ".rec.gz"
+# Phản hồi của message điều khiển (SUBSCRIBE/...) không phải dữ liệu thị trường, không ghi lại
+REPLY_PREFIXES = ('{"result"', '{"error"', '{"id"')
+
+Record = Tuple[int, str]
+
+
+class StreamRecorder:
+    """
+    Ghi mọi frame mà `StreamFuture`/`StreamSpot` nhận được (aggTrade, depth, markPrice, ...) kèm thời điểm nhận
+    vào các file segment nén gzip, chỉ ghi nối (append-only):
+        - Frame được gom vào bộ đệm và nén theo khối (`flush_bytes`), chi phí mỗi message chỉ là một lần copy.
+        - Segment mới được mở khi segment hiện tại vượt `segment_bytes` (chưa nén) hoặc `segment_seconds`.
+        - Dữ liệu được `flush` định kỳ (`flush_interval`), segment bị ngắt giữa chừng (crash) vẫn đọc được tới khối cuối.
+          Khi chạy trong event loop, một task nền flush cả khi stream im lặng (không có `record` mới).
+
+    Ví dụ:
+    ```python
+    recorder = StreamRecorder("recordings/futures")
+    stream = StreamFuture(recorder=recorder)  # hoặc recorder.attach(stream)
+    ...
+    recorder.close()
+    ```
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        prefix: str = "stream",
+        segment_bytes: int = 256 * 1024 * 1024,
+        segment_seconds: float = 60 * 60,
+        flush_bytes: int = 64 * 1024,
+        flush_interval: float = 5.0,
+        compresslevel: int = 1,
+    ):
+        """
+        :param directory: Thư mục chứa các segment.
+        :param prefix: Tiền tố tên file segment (`<prefix>-<thời điểm mở ns>.rec.gz`).
+        :param segment_bytes: Kích thước (chưa nén) tối đa của một segment.
+        :param segment_seconds: Thời gian tối đa của một segment.
+        :param flush_bytes: Kích thước bộ đệm trước khi nén và ghi xuống file.
+        :param flush_interval: Số giây tối đa dữ liệu nằm trong bộ đệm.
+        :param compresslevel: Mức nén gzip (1 = nhanh nhất).
+        """
+        self.directory = Path(directory)
+        self.prefix = prefix
+        self.segment_bytes = segment_bytes
+        self.segment_ns = int(segment_seconds * 1e9)
+        self.flush_bytes = flush_bytes
+        self.flush_ns = int(flush_interval * 1e9)
+        self.compresslevel = compresslevel
+        self.records = 0
+        self.bytes = 0
+        self.segments: List[Path] = []
+        self._file: Optional[gzip.GzipFile] = None
+        self._buffer = bytearray()
+        self._segment_size = 0
+        self._segment_started = 0
+        self._flushed_at = 0
+        self._flushed_records = 0
+        self._flusher: Optional[asyncio.Task] = None
+
+    def attach(self, stream):
+        """
+        Ghi các frame của `stream` (`StreamFuture`/`StreamSpot`).
+        """
+        stream.recorder = self
+
+    def record(self, message: Union[str, bytes], received_ns: Optional[int] = None):
+        """
+        Ghi một frame. `received_ns` mặc định là thời điểm hiện tại (`time.time_ns()`).
+        """
+        if message.__class__ is str:
+            if message.startswith(REPLY_PREFIXES):
+                return
+            message = message.encode()
+        if received_ns is None:
+            received_ns = time.time_ns()
+        if self._file is None or self._segment_size >= self.segment_bytes or received_ns - self._segment_started >= self.segment_ns:
+            self._rotate(received_ns)
+        buffer = self._buffer
+        buffer += RECORD_HEADER.pack(received_ns, len(message))
+        buffer += message
+        size = RECORD_HEADER.size + len(message)
+        self._segment_size += size
+        self.bytes += size
+        self.records += 1
+        if len(buffer) >= self.flush_bytes:
+            self._write()
+        if received_ns - self._flushed_at >= self.flush_ns:
+            self.flush(received_ns)
+
+    def _write(self):
+        if self._buffer:
+            self._file.write(self._buffer)
+            self._buffer.clear()
+
+    def flush(self, now_ns: Optional[int] = None):
+        """
+        Nén phần còn trong bộ đệm và đẩy xuống file (các bản ghi đã flush đọc được cả khi chương trình bị dừng đột ngột).
+        """
+        if self._file is None:
+            return
+        self._write()
+        self._file.flush()  # Z_SYNC_FLUSH, rồi flush file bên dưới
+        self._flushed_at = now_ns or time.time_ns()
+        self._flushed_records = self.records
+
+    def _start_flusher(self):
+        if self._flusher is not None and not self._flusher.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Ghi đồng bộ (ngoài event loop): chỉ flush trong `record`
+        self._flusher = loop.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        """
+        Flush các bản ghi nằm trong bộ đệm quá `flush_interval` khi không có frame mới gọi tới `record`.
+        """
+        interval = self.flush_ns / 1e9
+        while True:
+            await asyncio.sleep(interval)
+            if self._file is not None and self.records != self._flushed_records and time.time_ns() - self._flushed_at >= self.flush_ns:
+                self.flush()
+
+    def _rotate(self, now_ns: int):
+        self._close_segment()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{self.prefix}-{now_ns:020d}{SEGMENT_SUFFIX}"
+        self._file = gzip.GzipFile(path, "ab", compresslevel=self.compresslevel)
+        self._segment_size = 0
+        self._segment_started = now_ns
+        self._flushed_at = now_ns
+        self.segments.append(path)
+        self._start_flusher()
+        log.info(f"{Fore.CYAN}Recording stream to {path}")
+
+    def close(self):
+        """
+        Ghi nốt bộ đệm, dừng task flush và đóng segment hiện tại.
+        """
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        self._close_segment()
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._write()
+            self._file.close()
+            self._file = None
+
+    def stats(self) -> dict:
+        return {"records": self.records, "bytes": self.bytes, "segments": len(self.segments)}
+
+
+def segment_paths(source: Union[str, Path, Iterable[Union[str, Path]]], prefix: str = "stream") -> List[Path]:
+    """
+    Các file segment theo thứ tự thời gian: `source` là thư mục, một file hoặc danh sách file.
+    """
+    if isinstance(source, (str, Path)):
+        path = Path(source)
+        if path.is_dir():
+            return sorted(path.glob(f"{prefix}-*{SEGMENT_SUFFIX}"))
+        return [path]
+    return [Path(path) for path in source]
+
+
+def read_segment(path: Union[str, Path]) -> Iterator[Record]:
+    """
+    Đọc các bản ghi (thời điểm nhận ns, frame) của một segment. Bản ghi cuối bị cắt dở (crash) được bỏ qua.
+    """
+    header_size = RECORD_HEADER.size
+    with gzip.open(path, "rb") as file:
+        try:
+            while True:
+                header = file.read(header_size)
+                if len(header) < header_size:
+                    return
+                received_ns, length = RECORD_HEADER.unpack(header)
+                message = file.read(length)
+                if len(message) < length:
+                    return
+                yield received_ns, message.decode()
+        except (EOFError, zlib.error, gzip.BadGzipFile):
+            log.error(f"{Fore.YELLOW}⚠️ Segment {path} is truncated, stopping at the last complete record")
+
+
+def read_records(source: Union[str, Path, Iterable[Union[str, Path]]], prefix: str = "stream") -> Iterator[Record]:
+    """
+    Đọc nối tiếp các bản ghi của mọi segment.
+    """
+    for path in segment_paths(source, prefix):
+        yield from read_segment(path)
+
+
+class ReplayConnection:
+    """
+    Thay cho kết nối WebSocket khi phát lại: trả các frame đã ghi theo nhịp thời gian nhận (chia cho `speed`)
+    và tự xác nhận các message điều khiển (SUBSCRIBE/UNSUBSCRIBE/LIST_SUBSCRIPTIONS).
+    """
+
+    def __init__(self, stream: StreamFuture, records: Iterable[Record], speed: Optional[float] = 1.0):
+        self.stream = stream
+        self.records = records
+        self.speed = speed
+        self.replayed = 0
+        self.started = asyncio.Event()
+        self.state = State.OPEN
+
+    async def send(self, message: str):
+        request = orjson.loads(message)
+        result = list(self.stream.subscriptions) if request.get("method") == "LIST_SUBSCRIPTIONS" else None
+        asyncio.get_running_loop().call_soon(self.stream._on_reply, {"result": result, "id": request.get("id")})
+
+    async def close(self):
+        self.state = State.CLOSED
+
+    def __aiter__(self):
+        return self._frames()
+
+    async def _frames(self):
+        await self.started.wait()
+        loop = asyncio.get_running_loop()
+        speed = self.speed
+        first_ns = None
+        started_at = loop.time()
+        for received_ns, message in self.records:
+            if self.state is not State.OPEN:
+                break
+            if speed:
+                if first_ns is None:
+                    first_ns = received_ns
+                delay = started_at + (received_ns - first_ns) / 1e9 / speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif not self.replayed % 100:
+                await asyncio.sleep(0)  # nhường vòng event cho các callback khi phát lại tốc độ tối đa
+            self.replayed += 1
+            yield message
+        self.state = State.CLOSED
+
+
+class StreamReplayer(StreamFuture):
+    """
+    Phát lại các segment của `StreamRecorder` qua đúng API subscribe của `StreamFuture`
+    (dùng được cho cả bản ghi Spot vì việc định tuyến message giống nhau), để debug hoặc kiểm thử chiến lược:
+        - `speed`: 1 = thời gian thực, N = nhanh gấp N lần, None = nhanh nhất có thể.
+        - Mặc định `DispatchMode.ORDERED`: mỗi callback nhận message đúng thứ tự đã ghi, kết quả lặp lại được
+          giữa các lần chạy (dùng cho regression test).
+        - Không kết nối lại, không bù aggTrade qua REST.
+
+    Ví dụ:
+    ```python
+    replayer = StreamReplayer("recordings/futures", speed=None)
+    await replayer.connect()
+    await book.attach(replayer)
+    await buffers.attach(replayer, ["BTCUSDT"])
+    await replayer.run()  # trả về khi đã phát hết và các callback đã xử lý xong
+    ```
+    """
+
+    def __init__(
+        self,
+        source: Union[str, Path, Iterable[Union[str, Path]], Iterable[Record]],
+        speed: Optional[float] = 1.0,
+        prefix: str = "stream",
+        mode: DispatchMode = DispatchMode.ORDERED,
+        **kwargs,
+    ):
+        """
+        :param source: Thư mục / file / danh sách file segment, hoặc iterable các bản ghi (thời điểm nhận ns, frame).
+        :param speed: Tốc độ phát lại (None = tối đa).
+        :param prefix: Tiền tố tên file segment khi `source` là thư mục.
+        :param kwargs: Tham số khác của `StreamFuture` (queue_size, overflow_policy, ...).
+        """
+        kwargs.setdefault("metrics", None)  # độ trễ so với event time của bản ghi cũ không có ý nghĩa
+        super().__init__(mode=mode, reconnect=False, gap_fill=False, max_connection_age=0, **kwargs)
+        if isinstance(source, (str, Path)) or isinstance(source, (list, tuple)) and source and isinstance(source[0], (str, Path)):
+            source = read_records(source, prefix)
+        self.source = source
+        self.speed = speed
+
+    async def connect(self):
+        """
+        Chuẩn bị phát lại; frame chỉ bắt đầu được phát khi gọi `run`, sau khi đã subscribe.
+        """
+        self.connection = ReplayConnection(self, self.source, self.speed)
+        self._closing = False
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def run(self):
+        """
+        Phát lại toàn bộ bản ghi, trả về khi mọi callback đã xử lý xong.
+        """
+        if self.connection is None:
+            await self.connect()
+        started = time.perf_counter()
+        self.connection.started.set()
+        await self._supervisor
+        await self.dispatcher.join()
+        log.info(f"{Fore.GREEN}Replayed {self.connection.replayed} frames in {time.perf_counter() - started:.2f}s")
+
+    @property
+    def replayed(self) -> int:
+        return self.connection.replayed if self.connection is not None else 0
@@ -0,0 +1,30 @@
+import functools
+from typing import Awaitable, Callable, TypeVar
+
+
+T = TypeVar("T")
+
+
+class rest_method:
+    """
+    Decorator cho các hàm REST của `Future`/`Spot`, thay cho `@staticmethod`:
+        - Gọi qua class (`Future.get_depth(...)`): dùng `Future.url_http`.
+        - Gọi qua instance (`Future(url_http=...).get_depth(...)`): dùng `url_http` của instance,
+          nên có thể truyền instance làm `client` cho `OrderBook`, `MarketScanner`, `BackfillScheduler`...
+    Hàm được bọc nhận URL qua tham số keyword `url_http`.
+
+    Ví dụ:
+    ```python
+    @rest_method
+    @coalesce("future.depth")
+    async def get_depth(symbol: str, limit: int = 1000, *, url_http: str) -> dict: ...
+    ```
+    """
+
+    def __init__(self, fn: Callable[..., Awaitable[T]]):
+        self.fn = fn
+        functools.update_wrapper(self, fn)
+
+    def __get__(self, instance, owner=None) -> Callable[..., Awaitable[T]]:
+        source = owner if instance is None else instance
+        return functools.partial(self.fn, url_http=source.url_http)
@@ -0,0 +1,163 @@
+import asyncio
+import functools
+import inspect
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from app.utils.metrics import MetricsRegistry, metrics as metrics_registry
+
+
+T = TypeVar("T")
+
+# Tên metric của single-flight, nhãn `request` là tiền tố của khóa (VD: "future.klines")
+SINGLE_FLIGHT_CALLS = "single_flight_calls"
+SINGLE_FLIGHT_UPSTREAM = "single_flight_upstream"
+SINGLE_FLIGHT_DEDUPLICATED = "single_flight_deduplicated"
+SINGLE_FLIGHT_ERRORS = "single_flight_errors"
+SINGLE_FLIGHT_INFLIGHT = "single_flight_inflight"
+
+
+def normalize_key_value(name: str, value: Any) -> Hashable:
+    """
+    Chuẩn hóa một tham số để các request giống nhau có cùng khóa
+    (VD: "btcusdt" và "BTCUSDT", Timeframe.M1 và "1m", list và tuple).
+    """
+    if isinstance(value, Enum):
+        value = value.value
+    if name == "symbol" and isinstance(value, str):
+        return value.upper()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_key_value("", v) for v in value)
+    if isinstance(value, set):
+        return tuple(sorted(normalize_key_value("", v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize_key_value(k, v)) for k, v in value.items()))
+    return value
+
+
+class SingleFlightMetrics:
+    """
+    Counter của một loại request: số lời gọi, số request gửi đi, số lời gọi được gộp, số lỗi, số request đang chạy.
+    """
+    __slots__ = ("calls", "upstream", "deduplicated", "errors", "inflight")
+
+    def __init__(self, registry: MetricsRegistry, request: str):
+        self.calls = registry.counter(SINGLE_FLIGHT_CALLS, request=request)
+        self.upstream = registry.counter(SINGLE_FLIGHT_UPSTREAM, request=request)
+        self.deduplicated = registry.counter(SINGLE_FLIGHT_DEDUPLICATED, request=request)
+        self.errors = registry.counter(SINGLE_FLIGHT_ERRORS, request=request)
+        self.inflight = registry.counter(SINGLE_FLIGHT_INFLIGHT, request=request)
+
+
+class SingleFlight:
+    """
+    Gộp các request giống nhau đang chạy đồng thời (single-flight):
+    các lời gọi cùng khóa trong lúc request đầu tiên chưa xong sẽ chờ và dùng chung kết quả của nó.
+
+    Lưu ý: kết quả được dùng chung giữa các caller, không được sửa trực tiếp.
+    """
+
+    def __init__(self, metrics: Optional[MetricsRegistry] = metrics_registry):
+        """
+        :param metrics: Registry ghi các counter theo tiền tố của khóa, hiện trên /metrics (None để tắt).
+        """
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.upstream = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.metrics = metrics
+        self._request_metrics: Dict[str, SingleFlightMetrics] = {}
+
+    def _metrics_for(self, key: Hashable) -> Optional[SingleFlightMetrics]:
+        """
+        Counter theo tiền tố của khóa, VD: ("future.klines", ("symbol", "BTCUSDT"), ...) -> "future.klines".
+        """
+        if self.metrics is None:
+            return None
+        request = str(key[0] if isinstance(key, tuple) and key else key)
+        stats = self._request_metrics.get(request)
+        if stats is None:
+            stats = self._request_metrics[request] = SingleFlightMetrics(self.metrics, request)
+        return stats
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Số lời gọi, số request thực sự gửi đi, số lời gọi được gộp, số request đang chạy.
+        """
+        return {
+            "calls": self.calls,
+            "upstream": self.upstream,
+            "deduplicated": self.deduplicated,
+            "errors": self.errors,
+            "inflight": len(self._inflight),
+        }
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        stats = self._metrics_for(key)
+        if stats is not None:
+            stats.inflight.add(-1)
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+            if stats is not None:
+                stats.errors.add()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Chạy `fn` nếu chưa có request nào cùng `key` đang chạy, ngược lại chờ kết quả của request đó.
+        Request chạy trong task riêng nên caller đầu tiên bị hủy cũng không làm hỏng các caller khác.
+        """
+        self.calls += 1
+        stats = self._metrics_for(key)
+        if stats is not None:
+            stats.calls.add()
+        task = self._inflight.get(key)
+        if task is None:
+            self.upstream += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+            if stats is not None:
+                stats.upstream.add()
+                stats.inflight.add()
+        else:
+            self.deduplicated += 1
+            if stats is not None:
+                stats.deduplicated.add()
+        return await asyncio.shield(task)
+
+
+# Global single-flight cho các request REST tới Binance
+binance_single_flight = SingleFlight()
+
+
+def coalesce(name: str, single_flight: Optional[SingleFlight] = None):
+    """
+    Decorator gộp các lời gọi đồng thời có cùng tham số (sau khi chuẩn hóa) của một hàm async.
+
+    :param name: Tên request, là một phần của khóa (VD: "future.klines").
+    :param single_flight: SingleFlight dùng chung, mặc định `binance_single_flight`.
+
+    Ví dụ:
+    ```python
+    @staticmethod
+    @coalesce("future.exchangeInfo")
+    async def exchangeInfo(): ...
+    ```
+    """
+    def decorator(fn: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs) -> T:
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name,) + tuple((k, normalize_key_value(k, v)) for k, v in bound.arguments.items())
+            flight = single_flight or binance_single_flight
+            return await flight.do(key, lambda: fn(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
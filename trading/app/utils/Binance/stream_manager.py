@@ -0,0 +1,238 @@
+import asyncio
+import math
+from typing import Callable, Dict, List, Optional
+
+from colorama import Fore
+
+from app.utils.log import log
+from .dispatch import DispatchMode, OverflowPolicy
+from .events import EventFormat
+from .StreamFuture import StreamFuture
+
+
+class StreamManager:
+    """
+    Chia các stream ra nhiều kết nối WebSocket (shard) để không vượt giới hạn số stream mỗi kết nối
+    và giới hạn 10 message gửi lên mỗi giây của Binance, đồng thời đọc song song nhiều socket.
+        - Stream mới được gán cho shard còn chỗ có ít stream nhất, tạo shard mới khi mọi shard đều đầy.
+        - Các lệnh SUBSCRIBE được gom theo shard; mỗi shard tự gom lô và giới hạn tốc độ gửi trên kết nối của nó
+          (`control_batch_size`, `control_rate` trong `stream_kwargs`), các shard gửi song song.
+        - Khi bỏ subscribe làm số shard cần thiết giảm, stream được dồn lại và shard thừa bị đóng.
+        - Giữ nguyên API `subscribe` / `unsubscribe` của `StreamFuture`.
+
+    Ví dụ:
+    ```python
+    manager = StreamManager(StreamFuture, max_streams_per_connection=200, control_rate=5)
+    await manager.connect()
+    await manager.subscribe_agg_trades(symbols, on_agg_trade)
+    await manager.subscribe_depths(symbols, on_depth)
+    ```
+    """
+
+    def __init__(
+        self,
+        stream_class=StreamFuture,
+        max_streams_per_connection: int = 200,
+        **stream_kwargs,
+    ):
+        """
+        :param stream_class: Class stream (`StreamFuture` hoặc `StreamSpot`) dùng cho mỗi shard.
+        :param max_streams_per_connection: Số stream tối đa trên một kết nối.
+        :param stream_kwargs: Tham số truyền cho `stream_class` (url, queue_size, overflow_policy, mode, combined,
+            control_batch_size, control_rate, ...).
+        """
+        self.stream_class = stream_class
+        self.max_streams_per_connection = max_streams_per_connection
+        self.stream_kwargs = stream_kwargs
+        self.shards: List = []
+        self.owner: Dict[str, object] = {}  # {stream_name: shard}
+        self._lock = asyncio.Lock()
+        self._connected = False
+
+    @property
+    def subscriptions(self) -> Dict[str, List[Callable]]:
+        """
+        Mọi subscription trên các shard {stream_name: [callbacks]}.
+        """
+        return {name: callbacks for shard in self.shards for name, callbacks in shard.subscriptions.items()}
+
+    async def connect(self):
+        """
+        Kết nối shard đầu tiên, các shard khác được tạo khi cần.
+        """
+        self._connected = True
+        if not self.shards:
+            await self._new_shard()
+
+    async def disconnect(self):
+        """
+        Ngắt mọi kết nối.
+        """
+        self._connected = False
+        for shard in self.shards:
+            await shard.disconnect()
+            shard.dispatcher.close()
+        self.shards = []
+        self.owner = {}
+
+    def is_connected(self) -> bool:
+        return bool(self.shards) and all(shard.is_connected() for shard in self.shards)
+
+    async def _new_shard(self):
+        shard = self.stream_class(**self.stream_kwargs)
+        await shard.connect()
+        self.shards.append(shard)
+        log.info(f"{Fore.GREEN}StreamManager opened connection #{len(self.shards)}")
+        return shard
+
+    async def _close_shard(self, shard):
+        self.shards.remove(shard)
+        await shard.disconnect()
+        shard.dispatcher.close()
+        log.info(f"{Fore.YELLOW}StreamManager closed a connection, {len(self.shards)} remaining")
+
+    async def _pick_shard(self):
+        """
+        Shard còn chỗ có ít stream nhất, tạo shard mới nếu mọi shard đều đầy.
+        """
+        available = [s for s in self.shards if len(s.subscriptions) < self.max_streams_per_connection]
+        if available:
+            return min(available, key=lambda s: len(s.subscriptions))
+        return await self._new_shard()
+
+    async def subscribe(
+        self,
+        stream_name: str,
+        callback: Callable,
+        policy: Optional[OverflowPolicy] = None,
+        mode: Optional[DispatchMode] = None,
+        event_format: Optional[EventFormat] = None,
+    ):
+        """
+        Subscribe một stream, tự chọn shard.
+        """
+        async with self._lock:
+            shard = self.owner.get(stream_name)
+            if shard is None:
+                shard = self.owner[stream_name] = await self._pick_shard()
+            await shard.subscribe(stream_name, callback, policy=policy, mode=mode, event_format=event_format)
+
+    async def subscribe_multiple(self, stream_names: List[str], callback: Callable):
+        """
+        Subscribe nhiều stream, các stream mới được chia vào các shard, mỗi shard tự gửi theo lô.
+        """
+        async with self._lock:
+            pending: Dict[int, List[str]] = {}
+            shards = {}
+            for stream_name in dict.fromkeys(stream_names):
+                shard = self.owner.get(stream_name)
+                if shard is not None:
+                    await shard.subscribe(stream_name, callback)
+                    continue
+                shard = await self._pick_shard_for_batch(pending)
+                self.owner[stream_name] = shard
+                shards[id(shard)] = shard
+                pending.setdefault(id(shard), []).append(stream_name)
+
+            await asyncio.gather(*(shards[key].subscribe_multiple(names, callback) for key, names in pending.items()))
+
+    async def _pick_shard_for_batch(self, pending: Dict[int, List[str]]):
+        """
+        Như `_pick_shard` nhưng tính cả các stream đang chờ gửi trong lô hiện tại.
+        """
+        load = lambda s: len(s.subscriptions) + len(pending.get(id(s), ()))
+        available = [s for s in self.shards if load(s) < self.max_streams_per_connection]
+        if available:
+            return min(available, key=load)
+        return await self._new_shard()
+
+    async def unsubscribe(self, stream_name: str, callback: Callable = None):
+        """
+        Bỏ subscribe một stream (hoặc một callback), dồn shard nếu có thể.
+        """
+        async with self._lock:
+            await self._unsubscribe(stream_name, callback)
+            await self._consolidate()
+
+    async def unsubscribe_multiple(self, stream_names: List[str]):
+        async with self._lock:
+            for stream_name in stream_names:
+                await self._unsubscribe(stream_name)
+            await self._consolidate()
+
+    async def unsubscribe_multiple_callback(self, stream_names: List[str], callback: Callable):
+        async with self._lock:
+            for stream_name in stream_names:
+                await self._unsubscribe(stream_name, callback)
+            await self._consolidate()
+
+    async def _unsubscribe(self, stream_name: str, callback: Callable = None):
+        shard = self.owner.get(stream_name)
+        if shard is None:
+            return
+        await shard.unsubscribe(stream_name, callback)
+        if stream_name not in shard.subscriptions:
+            del self.owner[stream_name]
+
+    async def _consolidate(self):
+        """
+        Đóng các shard thừa: khi tổng số stream vừa với ít shard hơn, chuyển stream của shard ít nhất
+        sang các shard khác (subscribe bên mới trước rồi mới bỏ bên cũ, có thể nhận trùng vài message).
+        """
+        total = sum(len(s.subscriptions) for s in self.shards)
+        needed = max(math.ceil(total / self.max_streams_per_connection), 1)
+        while len(self.shards) > needed:
+            source = min(self.shards, key=lambda s: len(s.subscriptions))
+            for stream_name, subscriptions in list(source.dispatcher.subscriptions.items()):
+                targets = [s for s in self.shards if s is not source and len(s.subscriptions) < self.max_streams_per_connection]
+                target = min(targets, key=lambda s: len(s.subscriptions))
+                for subscription in list(subscriptions):
+                    await target.subscribe(stream_name, subscription.callback, policy=subscription.policy, mode=subscription.mode, event_format=subscription.event_format)
+                self.owner[stream_name] = target
+            await self._close_shard(source)
+
+    async def rebalance(self):
+        """
+        Dồn stream vào ít shard nhất có thể rồi chia lại cho đều giữa các shard.
+        """
+        async with self._lock:
+            await self._consolidate()
+            if len(self.shards) < 2:
+                return
+            target_load = math.ceil(sum(len(s.subscriptions) for s in self.shards) / len(self.shards))
+            for source in self.shards:
+                while len(source.subscriptions) > target_load:
+                    target = min(self.shards, key=lambda s: len(s.subscriptions))
+                    if len(target.subscriptions) >= target_load:
+                        break
+                    stream_name = next(iter(source.dispatcher.subscriptions))
+                    for subscription in list(source.dispatcher.subscriptions[stream_name]):
+                        await target.subscribe(stream_name, subscription.callback, policy=subscription.policy, mode=subscription.mode, event_format=subscription.event_format)
+                    self.owner[stream_name] = target
+                    await source.unsubscribe(stream_name)
+
+    def stats(self) -> List[dict]:
+        """
+        Số stream, trạng thái kết nối và thống kê hàng đợi của từng shard.
+        """
+        return [
+            {
+                "connection": i,
+                "streams": len(shard.subscriptions),
+                "connected": shard.is_connected(),
+                "dispatch": shard.stats(),
+            }
+            for i, shard in enumerate(self.shards)
+        ]
+
+    async def subscribe_agg_trades(self, symbols: List[str], callback: Callable):
+        await self.subscribe_multiple([f"{symbol.lower()}@aggTrade" for symbol in symbols], callback)
+
+    async def subscribe_mark_prices(self, symbols: List[str], callback: Callable):
+        await self.subscribe_multiple([f"{symbol.lower()}@markPrice" for symbol in symbols], callback)
+
+    async def subscribe_depths(self, symbols: List[str], callback: Callable):
+        await self.subscribe_multiple([f"{symbol.lower()}@depth" for symbol in symbols], callback)
+
+    async def subscribe_trades(self, symbols: List[str], callback: Callable):
+        await self.subscribe_multiple([f"{symbol.lower()}@trade" for symbol in symbols], callback)
@@ -0,0 +1,70 @@
+from typing import Optional
+
+from app.utils.metrics import MetricsRegistry
+
+# Tên metric của đường đi message stream
+STREAM_MESSAGES = "stream_messages"
+STREAM_BYTES = "stream_bytes"
+# Event time của sàn (`E`, hoặc `T`) -> lúc nhận frame, micro giây
+STREAM_EXCHANGE_LATENCY = "stream_exchange_latency_us"
+# Lúc nhận frame -> callback xử lý xong, micro giây
+STREAM_CALLBACK_LATENCY = "stream_callback_latency_us"
+
+
+def stream_type(stream_name: str) -> str:
+    """
+    Loại stream dùng làm nhãn của histogram (giới hạn số histogram khi có hàng nghìn stream):
+    "btcusdt@aggTrade" -> "aggTrade", "btcusdt@depth@100ms" -> "depth@100ms", "!ticker@arr" giữ nguyên.
+    """
+    if stream_name.startswith("!"):
+        return stream_name
+    return stream_name.partition("@")[2] or stream_name
+
+
+def raw_event_time(raw: str) -> int:
+    """
+    Đọc `E` (hoặc `T`) từ JSON gốc mà không parse toàn bộ message. Trả về 0 nếu không có.
+    """
+    start = raw.find('"E":')
+    if start < 0:
+        start = raw.find('"T":')
+        if start < 0:
+            return 0
+    start += 4
+    end = start
+    length = len(raw)
+    while end < length and raw[end].isdigit():
+        end += 1
+    return int(raw[start:end]) if end > start else 0
+
+
+class StreamMetrics:
+    """
+    Metric của một stream: số message/s, số byte/s (theo stream) và histogram độ trễ từ event time của sàn
+    tới lúc nhận (theo loại stream). Mọi metric có nhãn `market` ("future"/"spot") vì hai sàn dùng chung stream name.
+    """
+    __slots__ = ("messages", "bytes", "exchange_latency")
+
+    def __init__(self, registry: MetricsRegistry, stream_name: str, market: str):
+        self.messages = registry.meter(STREAM_MESSAGES, market=market, stream=stream_name)
+        self.bytes = registry.meter(STREAM_BYTES, market=market, stream=stream_name)
+        self.exchange_latency = registry.histogram(STREAM_EXCHANGE_LATENCY, market=market, type=stream_type(stream_name))
+
+    def observe(self, size: int, event_time: Optional[int], received: float):
+        """
+        :param size: Kích thước frame (ký tự).
+        :param event_time: Event time của sàn (ms), 0/None nếu không có.
+        :param received: Thời điểm nhận frame (`time.time()`, giây).
+        """
+        self.messages.mark(1, received)
+        self.bytes.mark(size, received)
+        if event_time:
+            self.exchange_latency.record(int(received * 1_000_000) - event_time * 1000)
+
+    @staticmethod
+    def remove(registry: MetricsRegistry, stream_name: str, market: str):
+        """
+        Xóa metric theo stream khi bỏ subscribe (histogram theo loại stream được giữ lại).
+        """
+        registry.remove(STREAM_MESSAGES, market=market, stream=stream_name)
+        registry.remove(STREAM_BYTES, market=market, stream=stream_name)
@@ -0,0 +1,279 @@
+import asyncio
+import json
+import shutil
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.types import MarketType
+from .trade_buffer import TRADE_COLUMNS
+from .vision import DataType
+from .vision_downloader import DownloadResult, VisionDownloader
+from .vision_parser import KLINE_COLUMNS, Chunk, KlineChunk, TradeChunk, parse_vision_zip
+
+META_FILE = "meta.json"
+
+# Cột -> (file .npy, chỉ số cột trong file 2 chiều hoặc None)
+TRADE_LAYOUT: Dict[str, Tuple[str, Optional[int]]] = {
+    "times": ("times", None),
+    "ids": ("ids", None),
+    **{column: ("trades", i) for i, column in enumerate(TRADE_COLUMNS)},
+}
+KLINE_LAYOUT: Dict[str, Tuple[str, Optional[int]]] = {
+    "times": ("times", None),
+    "close_times": ("close_times", None),
+    **{column: ("klines", i) for i, column in enumerate(KLINE_COLUMNS)},
+}
+
+# Header .npy có độ dài cố định để ghi dữ liệu trước, ghi shape sau khi biết số dòng
+NPY_HEADER_SIZE = 128
+
+
+def _layout(data_type: DataType) -> Dict[str, Tuple[str, Optional[int]]]:
+    return KLINE_LAYOUT if data_type == "klines" else TRADE_LAYOUT
+
+
+class _NpyWriter:
+    """
+    Ghi nối các khối vào file .npy mà không cần biết trước số dòng (header được ghi lại khi đóng).
+    """
+
+    def __init__(self, path: Path, dtype: np.dtype, width: Optional[int]):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.width = width
+        self.rows = 0
+        self.file = open(path, "wb")
+        self.file.write(b"\0" * NPY_HEADER_SIZE)
+
+    def write(self, array: np.ndarray):
+        self.file.write(np.ascontiguousarray(array, dtype=self.dtype).tobytes())
+        self.rows += len(array)
+
+    def close(self):
+        shape = (self.rows,) if self.width is None else (self.rows, self.width)
+        header = f"{{'descr': '{self.dtype.str}', 'fortran_order': False, 'shape': {shape}, }}"
+        prefix = b"\x93NUMPY\x01\x00"
+        padding = NPY_HEADER_SIZE - len(prefix) - 2 - len(header) - 1
+        self.file.seek(0)
+        self.file.write(prefix + struct.pack("<H", NPY_HEADER_SIZE - len(prefix) - 2) + (header + " " * padding + "\n").encode("latin1"))
+        self.file.close()
+
+
+class TickStore:
+    """
+    Kho dữ liệu dạng cột từ Binance Vision, chia partition theo `<market>/<symbol>/<data_type>/<YYYY-MM-DD>/`
+    (kline theo `<market>/<symbol>/klines/<interval>/<YYYY-MM-DD>/`, như cấu trúc của Binance Vision),
+    để phân tích lại mà không phải giải nén và parse CSV mỗi lần:
+        - Mỗi partition: `times.npy`, `ids.npy`, `trades.npy` (n, 4) [price, quantity, quote_quantity, direction]
+          (klines: `times.npy`, `close_times.npy`, `klines.npy` theo `KLINE_COLUMNS`) và `meta.json`
+          (số dòng, min/max của từng cột).
+        - Đọc bằng memory map (`np.load(mmap_mode="r")`): mở một tuần dữ liệu chỉ mất vài mili giây, chỉ những
+          trang được dùng mới được đọc từ đĩa.
+        - Lọc theo thời gian: bỏ qua partition theo min/max trong `meta.json`, rồi cắt bằng binary search trên `times`.
+        - Chọn cột (`columns`): chỉ mở các file cần, cột của `trades`/`klines` là view không sao chép.
+
+    Dùng Parquet/Arrow nếu có pyarrow sẽ tương đương, nhưng .npy + mmap không cần thêm thư viện và
+    `trades` đọc ra dùng thẳng với `calc_average_trades`.
+
+    Ví dụ:
+    ```python
+    store = TickStore("data/ticks")
+    store.import_zip("future_BTCUSDT-aggTrades-2024-01-01.zip", "future", "BTCUSDT", "aggTrades", datetime(2024, 1, 1))
+    chunk = store.read_trades("future", "BTCUSDT", "aggTrades", start=start_ms, end=end_ms)
+    calc_average_trades(chunk.trades)
+    store.import_zip("future_BTCUSDT-1m-2024-01-01.zip", "future", "BTCUSDT", "klines", datetime(2024, 1, 1), interval="1m")
+    klines = store.read_klines("future", "BTCUSDT", "1m", start=start_ms, end=end_ms)
+    ```
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def _folder(self, market_type: MarketType, symbol: str, data_type: DataType, interval: Optional[str] = None) -> Path:
+        """
+        Thư mục chứa các partition theo ngày. Kline của mỗi interval nằm riêng (`interval` bắt buộc với "klines").
+        """
+        folder = self.root / market_type / symbol.upper() / data_type
+        if data_type == "klines":
+            if not interval:
+                raise ValueError("interval is required for klines (e.g. '1m')")
+            folder /= interval
+        return folder
+
+    def partition_path(self, market_type: MarketType, symbol: str, data_type: DataType, date: datetime, interval: Optional[str] = None) -> Path:
+        return self._folder(market_type, symbol, data_type, interval) / date.strftime("%Y-%m-%d")
+
+    # ---------- ghi ----------
+
+    def write(
+        self, market_type: MarketType, symbol: str, data_type: DataType, date: datetime, chunks: Iterable[Chunk],
+        interval: Optional[str] = None,
+    ) -> dict:
+        """
+        Ghi các khối (của `parse_vision_zip`) thành một partition. Partition được ghi vào thư mục tạm
+        rồi đổi tên, partition đang có bị thay thế. Trả về nội dung `meta.json`.
+        """
+        path = self.partition_path(market_type, symbol, data_type, date, interval)
+        temp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(temp_path, ignore_errors=True)
+        temp_path.mkdir(parents=True)
+
+        layout = _layout(data_type)
+        writers: Dict[str, _NpyWriter] = {}
+        stats: Dict[str, List[float]] = {}
+        try:
+            for chunk in chunks:
+                if not len(chunk):
+                    continue
+                for name, array in vars(chunk).items():
+                    if name not in writers:
+                        writers[name] = _NpyWriter(temp_path / f"{name}.npy", array.dtype, array.shape[1] if array.ndim == 2 else None)
+                    writers[name].write(array)
+                for column, (name, index) in layout.items():
+                    values = getattr(chunk, name) if index is None else getattr(chunk, name)[:, index]
+                    low, high = values.min().item(), values.max().item()
+                    if column in stats:
+                        stats[column] = [min(stats[column][0], low), max(stats[column][1], high)]
+                    else:
+                        stats[column] = [low, high]
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        meta = {"rows": next(iter(writers.values())).rows if writers else 0, "data_type": data_type, "stats": stats}
+        if interval:
+            meta["interval"] = interval
+        (temp_path / META_FILE).write_text(json.dumps(meta))
+        if path.exists():
+            shutil.rmtree(path)
+        temp_path.rename(path)
+        return meta
+
+    def import_zip(
+        self, zip_path: Union[str, Path], market_type: MarketType, symbol: str, data_type: DataType, date: datetime,
+        chunk_size: int = 1_000_000, interval: Optional[str] = None,
+    ) -> dict:
+        """
+        Chuyển một file zip của Binance Vision thành partition (đọc theo khối, bộ nhớ giới hạn bởi `chunk_size`).
+        """
+        meta = self.write(market_type, symbol, data_type, date, parse_vision_zip(zip_path, data_type, chunk_size), interval)
+        log.info(f"{Fore.CYAN}Stored {meta['rows']} {data_type}{f' {interval}' if interval else ''} rows of {symbol} {date:%Y-%m-%d}")
+        return meta
+
+    async def import_range(
+        self,
+        downloader: VisionDownloader,
+        symbol: str,
+        market_type: MarketType,
+        data_type: DataType,
+        start_date: datetime,
+        end_date: datetime,
+        overwrite: bool = False,
+        interval: Optional[str] = None,
+    ) -> List[DownloadResult]:
+        """
+        Tải (song song) và chuyển từng ngày trong [start_date, end_date] thành partition, việc chuyển chạy trong thread.
+        Ngày đã có partition được bỏ qua trừ khi `overwrite`. `interval` (VD: "1m") bắt buộc với "klines".
+        """
+        self._folder(market_type, symbol, data_type, interval)  # báo lỗi thiếu interval trước khi tải
+
+        async def convert(path: Path, date: datetime):
+            if overwrite or not (self.partition_path(market_type, symbol, data_type, date, interval) / META_FILE).exists():
+                await asyncio.to_thread(self.import_zip, path, market_type, symbol, data_type, date, interval=interval)
+
+        return await downloader.download_range(symbol, market_type, data_type, start_date, end_date, on_downloaded=convert, interval=interval)
+
+    # ---------- đọc ----------
+
+    def partitions(
+        self, market_type: MarketType, symbol: str, data_type: DataType, start: Optional[int] = None, end: Optional[int] = None,
+        interval: Optional[str] = None,
+    ) -> List[Tuple[Path, dict]]:
+        """
+        Các partition (đường dẫn, meta) theo thứ tự ngày có dữ liệu giao với [start, end] (ms, theo min/max của `times`).
+        """
+        folder = self._folder(market_type, symbol, data_type, interval)
+        result = []
+        for path in sorted(folder.glob("????-??-??")):
+            meta_path = path / META_FILE
+            if not meta_path.exists():
+                continue
+            meta = json.loads(meta_path.read_text())
+            if not meta["rows"]:
+                continue
+            low, high = meta["stats"]["times"]
+            if (start is not None and high < start) or (end is not None and low > end):
+                continue
+            result.append((path, meta))
+        return result
+
+    def scan(
+        self,
+        market_type: MarketType,
+        symbol: str,
+        data_type: DataType,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        interval: Optional[str] = None,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Đọc từng partition có dữ liệu trong [start, end] (ms), trả về {cột: mảng} là view của file memory map.
+        :param columns: Các cột cần đọc (mặc định: tất cả), VD ("times", "price", "quantity") hoặc cả khối ("trades").
+        :param interval: Interval của kline (bắt buộc với "klines").
+        """
+        layout = _layout(data_type)
+        groups = {name for name, _ in layout.values()}
+        columns = list(columns or groups)
+        for column in columns:
+            if column not in layout and column not in groups:
+                raise ValueError(f"Cột không tồn tại: {column} ({', '.join([*layout, *sorted(groups)])})")
+
+        for path, _ in self.partitions(market_type, symbol, data_type, start, end, interval):
+            times = np.load(path / "times.npy", mmap_mode="r")
+            first = int(np.searchsorted(times, start, "left")) if start is not None else 0
+            last = int(np.searchsorted(times, end, "right")) if end is not None else len(times)
+            if first >= last:
+                continue
+            files = {"times": times}
+            result = {}
+            for column in columns:
+                name, index = layout.get(column, (column, None))
+                if name not in files:
+                    files[name] = np.load(path / f"{name}.npy", mmap_mode="r")
+                array = files[name][first:last]
+                result[column] = array if index is None else array[:, index]
+            yield result
+
+    def read_trades(
+        self, market_type: MarketType, symbol: str, data_type: DataType = "aggTrades", start: Optional[int] = None, end: Optional[int] = None,
+    ) -> TradeChunk:
+        """
+        Trade trong [start, end] (ms) của mọi partition, gộp thành một `TradeChunk`
+        (không sao chép nếu chỉ có một partition).
+        """
+        parts = list(self.scan(market_type, symbol, data_type, start, end, ("ids", "times", "trades")))
+        if len(parts) == 1:
+            return TradeChunk(parts[0]["ids"], parts[0]["times"], parts[0]["trades"])
+        if not parts:
+            return TradeChunk(np.empty(0, np.int64), np.empty(0, np.int64), np.empty((0, len(TRADE_COLUMNS))))
+        return TradeChunk(*(np.concatenate([part[name] for part in parts]) for name in ("ids", "times", "trades")))
+
+    def read_klines(
+        self, market_type: MarketType, symbol: str, interval: str, start: Optional[int] = None, end: Optional[int] = None,
+    ) -> KlineChunk:
+        """
+        Kline `interval` (VD: "1m") trong [start, end] (ms, theo open time) của mọi partition, gộp thành một `KlineChunk`.
+        """
+        parts = list(self.scan(market_type, symbol, "klines", start, end, ("times", "close_times", "klines"), interval))
+        if len(parts) == 1:
+            return KlineChunk(parts[0]["times"], parts[0]["close_times"], parts[0]["klines"])
+        if not parts:
+            return KlineChunk(np.empty(0, np.int64), np.empty(0, np.int64), np.empty((0, len(KLINE_COLUMNS))))
+        return KlineChunk(*(np.concatenate([part[name] for part in parts]) for name in ("times", "close_times", "klines")))
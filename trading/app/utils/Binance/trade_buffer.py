@@ -0,0 +1,172 @@
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+from .dispatch import DispatchMode
+from .events import AggTradeEvent
+
+# Các cột của `TradeRingBuffer.trades`, cùng thứ tự với `trades_to_numpy` / `calc_average_trades`
+TRADE_COLUMNS = ("price", "quantity", "quote_quantity", "direction")
+
+Views = Tuple[np.ndarray, ...]
+
+
+class TradeRingBuffer:
+    """
+    Bộ đệm vòng (ring buffer) cấp phát trước, lưu N trade gần nhất của một symbol:
+        - `trades`: mảng (capacity, 4) [price, quantity, quote_quantity, direction], dùng trực tiếp
+          với `calc_average_trades`, `net_volume`, ... của `app.utils.calc_average`.
+        - `times` / `ids`: thời gian (ms) và trade ID của từng dòng.
+        - `append` là O(1), không cấp phát bộ nhớ.
+        - Đọc theo số lượng (`last`) hoặc theo khoảng thời gian (`between`, `since`) trả về view không sao chép:
+          một view nếu dữ liệu liền mạch, hai view (phần cũ, phần mới) khi vắt qua cuối mảng.
+          Tìm theo thời gian bằng binary search (`np.searchsorted`).
+
+    Chỉ có một writer (vòng event asyncio) nên không cần khóa. View trỏ thẳng vào bộ đệm:
+    dùng ngay hoặc `np.concatenate` / `.copy()` nếu cần giữ qua `await` (dữ liệu cũ có thể bị ghi đè).
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self.trades = np.zeros((capacity, len(TRADE_COLUMNS)), dtype=np.float64)
+        self.times = np.zeros(capacity, dtype=np.int64)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.head = 0  # vị trí ghi tiếp theo
+        self.size = 0
+        self.total = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, time: int, price: float, qty: float, is_buyer_maker: bool, trade_id: int = 0):
+        """
+        Ghi một trade (O(1)). `is_buyer_maker` = True là lệnh bán chủ động (direction = -1).
+        """
+        i = self.head
+        row = self.trades[i]
+        row[0] = price
+        row[1] = qty
+        row[2] = price * qty
+        row[3] = -1.0 if is_buyer_maker else 1.0
+        self.times[i] = time
+        self.ids[i] = trade_id
+        self.head = i + 1 if i + 1 < self.capacity else 0
+        if self.size < self.capacity:
+            self.size += 1
+        self.total += 1
+
+    def on_agg_trade(self, data: Union[dict, AggTradeEvent]):
+        """
+        Ghi một message aggTrade (dict của stream / REST `/aggTrades` hoặc `AggTradeEvent`).
+        """
+        if isinstance(data, AggTradeEvent):
+            self.append(data.trade_time, data.price, data.qty, data.is_buyer_maker, data.agg_id)
+        else:
+            self.append(data["T"], float(data["p"]), float(data["q"]), data["m"], data["a"])
+
+    def _segments(self) -> Tuple[Tuple[int, int], ...]:
+        """
+        Các đoạn [start, end) theo thứ tự thời gian: (cũ, mới) khi đã vòng, ngược lại một đoạn.
+        """
+        if self.size < self.capacity:
+            return ((0, self.size),)
+        if self.head == 0:
+            return ((0, self.capacity),)
+        return ((self.head, self.capacity), (0, self.head))
+
+    def _views(self, array: np.ndarray, start: int, count: int) -> Views:
+        """
+        View của `count` dòng bắt đầu từ vị trí logic `start` (0 = trade cũ nhất còn giữ).
+        """
+        if count <= 0:
+            return (array[0:0],)
+        first = (self.head - self.size + start) % self.capacity
+        end = first + count
+        if end <= self.capacity:
+            return (array[first:end],)
+        return (array[first:], array[:end - self.capacity])
+
+    def last(self, n: int) -> Views:
+        """
+        View của n trade gần nhất (cũ -> mới).
+        """
+        n = min(n, self.size)
+        return self._views(self.trades, self.size - n, n)
+
+    def _position(self, time: int, side: str) -> int:
+        """
+        Vị trí logic của `time` trong chuỗi thời gian (binary search trên từng đoạn).
+        """
+        offset = 0
+        for start, end in self._segments():
+            segment = self.times[start:end]
+            position = int(np.searchsorted(segment, time, side=side))
+            if position < len(segment):
+                return offset + position
+            offset += end - start
+        return offset
+
+    def between(self, start_time: int, end_time: Optional[int] = None, array: Optional[np.ndarray] = None) -> Views:
+        """
+        View các trade có start_time <= time <= end_time.
+
+        :param array: Mảng cần lấy view (mặc định `trades`; có thể truyền `times`, `ids`).
+        """
+        lo = self._position(start_time, "left")
+        hi = self.size if end_time is None else self._position(end_time, "right")
+        return self._views(self.trades if array is None else array, lo, hi - lo)
+
+    def since(self, start_time: int) -> Views:
+        """
+        View các trade từ start_time tới hiện tại.
+        """
+        return self.between(start_time)
+
+    @staticmethod
+    def to_array(views: Views) -> np.ndarray:
+        """
+        Ghép các view thành một mảng liền (chỉ sao chép khi có hai đoạn).
+        """
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+
+class TradeBuffers:
+    """
+    Ring buffer trade cho nhiều symbol, ghi trực tiếp từ stream aggTrade.
+
+    Ví dụ:
+    ```python
+    buffers = TradeBuffers(capacity=200_000)
+    await buffers.attach(stream, ["BTCUSDT", "ETHUSDT"])
+    trades = TradeRingBuffer.to_array(buffers["BTCUSDT"].since(now - 60_000))
+    calc_average_trades(trades)
+    ```
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self.buffers: Dict[str, TradeRingBuffer] = {}
+
+    def __getitem__(self, symbol: str) -> TradeRingBuffer:
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            buffer = self.buffers[symbol] = TradeRingBuffer(self.capacity)
+        return buffer
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.buffers
+
+    async def on_agg_trade(self, data: Union[dict, AggTradeEvent]):
+        """
+        Callback cho stream `<symbol>@aggTrade` (định dạng DICT hoặc TYPED).
+        """
+        symbol = data.symbol if isinstance(data, AggTradeEvent) else data["s"]
+        self[symbol].on_agg_trade(data)
+
+    async def attach(self, stream, symbols: Iterable[str]):
+        """
+        Subscribe aggTrade của các symbol (theo thứ tự) trên `StreamFuture`/`StreamSpot`/`StreamManager`.
+        """
+        for symbol in symbols:
+            self[symbol.upper()]
+            await stream.subscribe(f"{symbol.lower()}@aggTrade", self.on_agg_trade, mode=DispatchMode.ORDERED)
@@ -1,16 +1,17 @@
 
 class KlineMap:
     openTime = 0
-    open = 1,
-    high = 2,
-    low = 3,
-    close = 4,
-    volume = 5,
-    closeTime = 6,
-    quoteAssetVolume = 7,
-    numberOfTrades = 8,
-    takerBuyBaseAssetVolume = 9,
-    takerBuyQuoteAssetVolume = 10,
+    open = 1
+    high = 2
+    low = 3
+    close = 4
+    volume = 5
+    closeTime = 6
+    quoteAssetVolume = 7
+    numberOfTrades = 8
+    takerBuyBaseAssetVolume = 9
+    takerBuyQuoteAssetVolume = 10
+    ignore = 11
 
 
 
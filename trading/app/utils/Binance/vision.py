@@ -17,14 +17,20 @@ class BinanceVisionData:
     BASE_URL = "https://data.binance.vision/data"
 
     @staticmethod
-    def build_url(symbol: str, market_type: MarketType, data_type: DataType, date: datetime, prefer_monthly: bool) -> str:
+    def build_url(symbol: str, market_type: MarketType, data_type: DataType, date: datetime, prefer_monthly: bool, interval: Optional[str] = None) -> str:
         """
         Tạo URL tải dữ liệu từ Binance Vision.
+        Kline nằm trong thư mục con theo interval: `.../klines/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.zip`.
         """
         type_folder = "monthly" if prefer_monthly else "daily"
         date_str = date.strftime("%Y-%m") if prefer_monthly else date.strftime("%Y-%m-%d")
-        filename = f"{symbol.upper()}-{data_type}-{date_str}.zip"
-        return f"{BinanceVisionData.BASE_URL}/{market_type}{'s/um' if market_type=="future" else ''}/{type_folder}/{data_type}/{symbol.upper()}/{filename}"
+        market_folder = "futures/um" if market_type == "future" else market_type
+        folder = f"{BinanceVisionData.BASE_URL}/{market_folder}/{type_folder}/{data_type}/{symbol.upper()}"
+        if data_type == "klines":
+            if not interval:
+                raise ValueError("interval is required for klines (e.g. '1m')")
+            return f"{folder}/{interval}/{symbol.upper()}-{interval}-{date_str}.zip"
+        return f"{folder}/{symbol.upper()}-{data_type}-{date_str}.zip"
 
 
     @staticmethod
@@ -40,9 +46,12 @@ class BinanceVisionData:
         log.info(f"⬇️  Đang tải: {url}")
         response = requests.get(url, stream=True)
         if response.status_code == 200:
-            with open(dest_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
+            # ghi ra file tạm rồi đổi tên, file dở dang (crash) không bị coi là đã tải xong
+            part_path = dest_path.with_name(dest_path.name + ".part")
+            with open(part_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1024 * 1024):
                     f.write(chunk)
+            part_path.replace(dest_path)
             # log.info(f"✅ Đã tải: {dest_path.name}")
         else:
             log.error(f"❌ Không thể tải: {url} ({response.status_code})")
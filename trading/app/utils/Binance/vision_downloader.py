@@ -0,0 +1,270 @@
+import asyncio
+import hashlib
+import inspect
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+import aiohttp
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.types import MarketType
+from .vision import BinanceVisionData, DataType
+
+CHECKSUM_SUFFIX = ".CHECKSUM"
+PART_SUFFIX = ".part"
+
+
+class ChecksumError(Exception):
+    """
+    File tải về không khớp với SHA-256 trong file `.CHECKSUM`.
+    """
+
+
+@dataclass
+class DownloadResult:
+    url: str
+    path: Path
+    downloaded: int = 0  # số byte tải trong lần chạy này
+    size: int = 0  # kích thước file
+    resumed: bool = False  # tải tiếp từ file `.part` dở dang
+    skipped: bool = False  # file đã có sẵn
+    verified: bool = False  # đã đối chiếu `.CHECKSUM`
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def sha256_file(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class VisionDownloader:
+    """
+    Tải song song các file của Binance Vision (https://data.binance.vision) bằng aiohttp:
+        - Một session dùng chung (keep-alive), tối đa `concurrency` file cùng lúc.
+        - Ghi vào `<file>.part` rồi đổi tên sau khi đã kiểm tra, file đích tồn tại nghĩa là đã tải trọn vẹn.
+        - File `.part` còn lại (crash, mất mạng) được tải tiếp bằng HTTP Range.
+        - Đối chiếu SHA-256 với file `<url>.CHECKSUM` của sàn, sai thì tải lại.
+        - `report()` trả về tổng số byte và tốc độ tải.
+
+    Ví dụ:
+    ```python
+    async with VisionDownloader("data/vision", concurrency=8) as downloader:
+        results = await downloader.download_range("BTCUSDT", "future", "aggTrades", datetime(2024, 1, 1), datetime(2024, 1, 31))
+    downloader.report()
+    ```
+    """
+
+    def __init__(
+        self,
+        download_dir: Union[str, Path],
+        concurrency: int = 8,
+        verify_checksum: bool = True,
+        retries: int = 3,
+        retry_delay: float = 1.0,
+        chunk_size: int = 1024 * 1024,
+        base_url: str = BinanceVisionData.BASE_URL,
+        timeout: float = 60.0,
+    ):
+        """
+        :param download_dir: Thư mục lưu file.
+        :param concurrency: Số file tải cùng lúc (cũng là số kết nối tối đa).
+        :param verify_checksum: Đối chiếu file `.CHECKSUM`.
+        :param retries: Số lần thử lại khi lỗi mạng hoặc sai checksum.
+        :param retry_delay: Thời gian chờ trước lần thử lại đầu tiên (gấp đôi sau mỗi lần, tối đa 30 giây).
+        :param chunk_size: Kích thước mỗi lần ghi xuống file.
+        :param base_url: URL gốc (đổi thành server cục bộ khi kiểm thử).
+        :param timeout: Thời gian tối đa chờ dữ liệu trên socket (giây).
+        """
+        self.download_dir = Path(download_dir)
+        self.concurrency = concurrency
+        self.verify_checksum = verify_checksum
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.chunk_size = chunk_size
+        self.base_url = base_url
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.results: List[DownloadResult] = []
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    async def __aenter__(self) -> "VisionDownloader":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def url(self, symbol: str, market_type: MarketType, data_type: DataType, date: datetime, prefer_monthly: bool = False, interval: Optional[str] = None) -> str:
+        return BinanceVisionData.build_url(symbol, market_type, data_type, date, prefer_monthly, interval).replace(BinanceVisionData.BASE_URL, self.base_url, 1)
+
+    async def download_range(
+        self,
+        symbol: str,
+        market_type: MarketType,
+        data_type: DataType,
+        start_date: datetime,
+        end_date: datetime,
+        prefer_monthly: bool = False,
+        on_downloaded: Optional[Callable[[Path, datetime], None]] = None,
+        interval: Optional[str] = None,
+    ) -> List[DownloadResult]:
+        """
+        Tải mọi ngày (hoặc tháng) trong khoảng [start_date, end_date], tên file giống `BinanceVisionData.download_range_trades`.
+        :param on_downloaded: (optional) Callback (sync hoặc async) nhận (đường dẫn, ngày) khi một file sẵn sàng.
+        :param interval: Interval của kline (VD: "1m"), bắt buộc khi `data_type` là "klines".
+        """
+        dates = []
+        current_date = start_date.replace(day=1) if prefer_monthly else start_date
+        while current_date <= end_date:
+            dates.append(current_date)
+            if prefer_monthly:
+                current_date = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
+            else:
+                current_date += timedelta(days=1)
+
+        async def download(date: datetime) -> DownloadResult:
+            url = self.url(symbol, market_type, data_type, date, prefer_monthly, interval)
+            result = await self.download(url, self.download_dir / f"{market_type}_{url.rsplit('/', 1)[-1]}")
+            if result.ok and on_downloaded:
+                if inspect.iscoroutinefunction(on_downloaded):
+                    await on_downloaded(result.path, date)
+                else:
+                    on_downloaded(result.path, date)
+            return result
+
+        return list(await asyncio.gather(*(download(date) for date in dates)))
+
+    async def download_many(self, urls: List[str]) -> List[DownloadResult]:
+        """
+        Tải nhiều URL, lưu theo tên file trong URL.
+        """
+        return list(await asyncio.gather(*(self.download(url, self.download_dir / url.rsplit("/", 1)[-1]) for url in urls)))
+
+    async def download(self, url: str, dest_path: Path) -> DownloadResult:
+        """
+        Tải một file (chờ nếu đang có đủ `concurrency` file được tải). Lỗi được ghi vào `DownloadResult.error`.
+        """
+        result = DownloadResult(url, dest_path)
+        self.results.append(result)
+        if dest_path.exists():
+            result.skipped = True
+            result.size = dest_path.stat().st_size
+            return result
+
+        await self.open()
+        async with self._semaphore:
+            if self._started is None:
+                self._started = time.perf_counter()
+            started = time.perf_counter()
+            for attempt in range(1, self.retries + 2):
+                try:
+                    await self._download(result)
+                    result.error = None
+                    break
+                except FileNotFoundError as e:
+                    result.error = str(e)
+                    break
+                except (aiohttp.ClientError, asyncio.TimeoutError, ChecksumError, OSError) as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    if attempt > self.retries:
+                        break
+                    log.warning(f"{Fore.YELLOW}⚠️ Download {url} failed ({result.error}), retry {attempt}/{self.retries}")
+                    await asyncio.sleep(min(self.retry_delay * 2 ** (attempt - 1), 30))
+            result.seconds = time.perf_counter() - started
+            self._finished = time.perf_counter()
+
+        if result.ok:
+            log.info(f"✅ Đã tải: {dest_path.name} ({result.size / 1024 / 1024:.1f}MB{', resumed' if result.resumed else ''})")
+        else:
+            log.error(f"{Fore.RED}❌ Không thể tải: {url} ({result.error})")
+        return result
+
+    async def _download(self, result: DownloadResult):
+        dest_path = result.path
+        part_path = dest_path.with_name(dest_path.name + PART_SUFFIX)
+        dest_path.parent.mkdir(parents=True, exist_ok=True)
+
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        async with self.session.get(result.url, headers=headers) as response:
+            if response.status == 404:
+                raise FileNotFoundError(f"Not found: {result.url}")
+            if response.status == 416:  # file .part đã đủ, chỉ còn kiểm tra
+                pass
+            else:
+                response.raise_for_status()
+                if response.status == 206:
+                    result.resumed = result.resumed or offset > 0
+                    mode = "ab"
+                else:  # server bỏ qua Range: tải lại từ đầu
+                    mode = "wb"
+                with open(part_path, mode) as file:
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        file.write(chunk)
+                        result.downloaded += len(chunk)
+
+        expected = await self._checksum(result.url) if self.verify_checksum else None
+        if expected is not None:
+            actual = await asyncio.to_thread(sha256_file, part_path)
+            if actual != expected:
+                part_path.unlink()
+                raise ChecksumError(f"{dest_path.name}: sha256 {actual} != {expected}")
+            result.verified = True
+        part_path.replace(dest_path)
+        result.size = dest_path.stat().st_size
+
+    async def _checksum(self, url: str) -> Optional[str]:
+        """
+        SHA-256 trong file `.CHECKSUM` (dạng `<sha256>  <tên file>`), None nếu sàn không có.
+        """
+        async with self.session.get(url + CHECKSUM_SUFFIX) as response:
+            if response.status == 404:
+                log.warning(f"{Fore.YELLOW}⚠️ No checksum for {url}, skipping verification")
+                return None
+            response.raise_for_status()
+            return (await response.text()).split()[0].lower()
+
+    def report(self) -> dict:
+        """
+        Tổng kết: số file tải / bỏ qua / lỗi, số byte đã tải và tốc độ (MB/s, tính theo thời gian chạy thực).
+        """
+        elapsed = (self._finished - self._started) if self._started and self._finished else 0.0
+        downloaded = sum(result.downloaded for result in self.results)
+        report = {
+            "files": sum(1 for result in self.results if result.ok and not result.skipped),
+            "skipped": sum(1 for result in self.results if result.skipped),
+            "resumed": sum(1 for result in self.results if result.resumed),
+            "failed": sum(1 for result in self.results if not result.ok),
+            "bytes": downloaded,
+            "seconds": elapsed,
+            "mb_per_second": downloaded / 1024 / 1024 / elapsed if elapsed else 0.0,
+        }
+        log.info(
+            f"{Fore.CYAN}Vision download: {report['files']} files ({report['skipped']} skipped, {report['failed']} failed), "
+            f"{downloaded / 1024 / 1024:.1f}MB in {elapsed:.1f}s ({report['mb_per_second']:.1f}MB/s)"
+        )
+        return report
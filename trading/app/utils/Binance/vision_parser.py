@@ -0,0 +1,171 @@
+import asyncio
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.utils.types import MarketType
+from .trade_buffer import TRADE_COLUMNS
+from .vision import DataType
+from .vision_downloader import VisionDownloader
+
+# Các cột của `KlineChunk.klines`
+KLINE_COLUMNS = ("open", "high", "low", "close", "volume", "quote_volume", "trades", "taker_buy_volume", "taker_buy_quote_volume")
+
+# Vị trí cột trong CSV của Binance Vision (file futures có dòng header, file spot thì không)
+AGG_TRADE_CSV = {"id": 0, "price": 1, "qty": 2, "time": 5, "is_buyer_maker": 6}
+TRADE_CSV = {"id": 0, "price": 1, "qty": 2, "quote": 3, "time": 4, "is_buyer_maker": 5}
+KLINE_CSV = {"open_time": 0, "open": 1, "high": 2, "low": 3, "close": 4, "volume": 5, "close_time": 6,
+             "quote_volume": 7, "trades": 8, "taker_buy_volume": 9, "taker_buy_quote_volume": 10}
+
+# Từ 2025, file spot dùng micro giây: thời gian lớn hơn ngưỡng này được đổi về mili giây
+MICROSECOND_THRESHOLD = 10 ** 14
+
+
+@dataclass
+class TradeChunk:
+    """
+    Một khối trade / aggTrade: `trades` (n, 4) [price, quantity, quote_quantity, direction] cùng bố cục với
+    `TradeRingBuffer` (dùng trực tiếp với `calc_average_trades`), `times` (ms) và `ids`.
+    """
+    ids: np.ndarray
+    times: np.ndarray
+    trades: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+@dataclass
+class KlineChunk:
+    """
+    Một khối kline: `times` / `close_times` (ms) và `klines` (n, 9) theo `KLINE_COLUMNS`.
+    """
+    times: np.ndarray
+    close_times: np.ndarray
+    klines: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+Chunk = Union[TradeChunk, KlineChunk]
+
+
+def _milliseconds(times: np.ndarray) -> np.ndarray:
+    if len(times) and times[0] > MICROSECOND_THRESHOLD:
+        return times // 1000
+    return times
+
+
+def _is_true(values: np.ndarray) -> np.ndarray:
+    if values.dtype == np.bool_:
+        return values
+    return np.char.lower(values.astype(str)) == "true"
+
+
+def _trade_chunk(frame: pd.DataFrame, columns: dict) -> TradeChunk:
+    price = frame[columns["price"]].to_numpy(np.float64)
+    qty = frame[columns["qty"]].to_numpy(np.float64)
+    trades = np.empty((len(frame), len(TRADE_COLUMNS)), dtype=np.float64)
+    trades[:, 0] = price
+    trades[:, 1] = qty
+    trades[:, 2] = frame[columns["quote"]].to_numpy(np.float64) if "quote" in columns else price * qty
+    trades[:, 3] = np.where(_is_true(frame[columns["is_buyer_maker"]].to_numpy()), -1.0, 1.0)
+    return TradeChunk(
+        frame[columns["id"]].to_numpy(np.int64),
+        _milliseconds(frame[columns["time"]].to_numpy(np.int64)),
+        trades,
+    )
+
+
+def _kline_chunk(frame: pd.DataFrame) -> KlineChunk:
+    return KlineChunk(
+        _milliseconds(frame[KLINE_CSV["open_time"]].to_numpy(np.int64)),
+        _milliseconds(frame[KLINE_CSV["close_time"]].to_numpy(np.int64)),
+        frame[[KLINE_CSV[column] for column in KLINE_COLUMNS]].to_numpy(np.float64),
+    )
+
+
+def parse_vision_zip(path: Union[str, Path], data_type: DataType, chunk_size: int = 1_000_000) -> Iterator[Chunk]:
+    """
+    Đọc file zip của Binance Vision theo từng khối `chunk_size` dòng, giải nén trực tiếp từ zip
+    (không ghi CSV ra đĩa), bộ nhớ chỉ phụ thuộc `chunk_size` chứ không phụ thuộc kích thước file.
+    :param data_type: "aggTrades", "trades" (-> `TradeChunk`) hoặc "klines" (-> `KlineChunk`).
+
+    Ví dụ:
+    ```python
+    for chunk in parse_vision_zip("future_BTCUSDT-aggTrades-2024-01-01.zip", "aggTrades"):
+        calc_average_trades(chunk.trades)
+    ```
+    """
+    if data_type == "aggTrades":
+        columns = AGG_TRADE_CSV
+    elif data_type == "trades":
+        columns = TRADE_CSV
+    elif data_type == "klines":
+        columns = KLINE_CSV
+    else:
+        raise ValueError(f"Loại dữ liệu không hỗ trợ: {data_type}")
+
+    with zipfile.ZipFile(path) as archive:
+        member = next(name for name in archive.namelist() if name.endswith(".csv"))
+        with archive.open(member) as file:
+            has_header = file.peek(1)[:1].isalpha()
+            reader = pd.read_csv(file, header=None, skiprows=1 if has_header else 0, usecols=sorted(columns.values()), chunksize=chunk_size)
+            for frame in reader:
+                yield _kline_chunk(frame) if data_type == "klines" else _trade_chunk(frame, columns)
+
+
+async def stream_vision_range(
+    downloader: VisionDownloader,
+    symbol: str,
+    market_type: MarketType,
+    data_type: DataType,
+    start_date: datetime,
+    end_date: datetime,
+    chunk_size: int = 1_000_000,
+    interval: Optional[str] = None,
+) -> AsyncIterator[Chunk]:
+    """
+    Tải và đọc các file trong khoảng [start_date, end_date] theo thứ tự ngày: các file sau được tải song song
+    (giới hạn bởi `downloader.concurrency`) trong lúc file trước đang được parse trong thread,
+    vòng event không bị chặn. Ngày không tải được bị bỏ qua (xem `downloader.results`).
+    Với "klines", `interval` (VD: "1m") là bắt buộc.
+
+    Ví dụ:
+    ```python
+    async with VisionDownloader("data/vision") as downloader:
+        async for chunk in stream_vision_range(downloader, "BTCUSDT", "future", "aggTrades", start, end):
+            ...
+    ```
+    """
+    dates = []
+    current_date = start_date
+    while current_date <= end_date:
+        dates.append(current_date)
+        current_date += timedelta(days=1)
+
+    async def download(date: datetime):
+        url = downloader.url(symbol, market_type, data_type, date, interval=interval)
+        return await downloader.download(url, downloader.download_dir / f"{market_type}_{url.rsplit('/', 1)[-1]}")
+
+    tasks = [asyncio.create_task(download(date)) for date in dates]
+    try:
+        for task in tasks:
+            result = await task
+            if not result.ok:
+                continue
+            chunks = parse_vision_zip(result.path, data_type, chunk_size)
+            try:
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    yield chunk
+            finally:
+                chunks.close()
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,493 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import orjson
+from colorama import Fore
+from websockets import State, connect
+from websockets.exceptions import ConnectionClosed
+
+from app.utils.log import log
+
+
+# Trọng số (weight) của các method WebSocket API mà client đang dùng.
+# Docs: https://developers.binance.com/docs/binance-spot-api-docs/websocket-api
+REQUEST_WEIGHTS: Dict[str, int] = {
+    "ping": 1,
+    "time": 1,
+    "klines": 2,
+    "uiKlines": 2,
+    "trades.recent": 25,
+    "trades.historical": 25,
+    "trades.aggregate": 2,
+    "depth": 50,
+    "ticker.price": 2,
+    "ticker.24hr": 40,
+    "exchangeInfo": 20,
+}
+DEFAULT_REQUEST_WEIGHT = 1
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0) -> float:
+    """
+    Thời gian chờ exponential backoff có jitter ("full jitter").
+
+    :param attempt: Lần thử thứ mấy (bắt đầu từ 0).
+    :param base: Thời gian chờ cơ sở (giây).
+    :param cap: Thời gian chờ tối đa (giây).
+    :return: Số giây cần chờ, ngẫu nhiên trong [base/2, min(cap, base * 2^attempt)].
+    """
+    upper = min(cap, base * (2 ** max(attempt, 0)))
+    return random.uniform(min(base / 2, upper), upper)
+
+
+class WeightLimiter:
+    """
+    Theo dõi request weight trong cửa sổ trượt (mặc định 60 giây) để không vượt giới hạn của Binance.
+    Nếu server trả về `rateLimits` thì đồng bộ lại số weight đã dùng theo server.
+    """
+
+    def __init__(self, limit: int = 6000, window: float = 60.0):
+        self.limit = limit
+        self.window = window
+        self._events: Deque[Tuple[float, int]] = deque()  # (thời điểm, weight)
+        self._used = 0
+        self._server_used = 0
+        self._server_used_at = 0.0
+        self._blocked_until = 0.0
+
+    def _expire(self, now: float):
+        events = self._events
+        while events and now - events[0][0] >= self.window:
+            self._used -= events.popleft()[1]
+
+    def used(self) -> int:
+        """
+        Số weight đã dùng trong cửa sổ hiện tại (lấy giá trị lớn hơn giữa local và server).
+        """
+        now = time.monotonic()
+        self._expire(now)
+        server_used = self._server_used if now - self._server_used_at < self.window else 0
+        return max(self._used, server_used)
+
+    def blocked(self) -> bool:
+        """
+        Limiter đang bị khóa do server trả về 429/418.
+        """
+        return time.monotonic() < self._blocked_until
+
+    def headroom(self) -> int:
+        """
+        Số weight còn lại có thể dùng trong cửa sổ hiện tại.
+        """
+        if self.blocked():
+            return 0
+        return self.limit - self.used()
+
+    def wait_time(self, weight: int) -> float:
+        """
+        Thời gian (giây) cần chờ trước khi có thể dùng thêm `weight`.
+        """
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if self.used() + weight <= self.limit:
+            return 0.0
+        if self._events:
+            return max(self.window - (now - self._events[0][0]), 0.05)
+        return max(self.window - (now - self._server_used_at), 0.05)
+
+    def add(self, weight: int):
+        """
+        Ghi nhận một request với `weight`.
+        """
+        now = time.monotonic()
+        self._expire(now)
+        self._events.append((now, weight))
+        self._used += weight
+
+    async def acquire(self, weight: int):
+        """
+        Chờ cho tới khi có đủ weight rồi ghi nhận request.
+        """
+        delay = self.wait_time(weight)
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.wait_time(weight)
+        self.add(weight)
+
+    def sync(self, server_used: int):
+        """
+        Đồng bộ số weight đã dùng theo server (trường `rateLimits` hoặc header `X-MBX-USED-WEIGHT-1M`).
+        """
+        self._server_used = server_used
+        self._server_used_at = time.monotonic()
+
+    def block(self, seconds: float):
+        """
+        Tạm khóa limiter trong `seconds` giây (khi server trả về 429/418).
+        """
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class ConnectionLostError(ConnectionError):
+    """
+    Kết nối bị đóng khi request đang chờ phản hồi. Request có thể gửi lại trên kết nối khác.
+    """
+
+
+class RateLimitTimeoutError(asyncio.TimeoutError):
+    """
+    Hết `request_timeout` khi còn đang chờ weight (request chưa được gửi). Kết nối vẫn dùng được.
+    """
+
+
+class PooledConnection:
+    """
+    Một kết nối WebSocket API trong pool.
+    Phản hồi được ghép với request theo `id` nên nhiều request có thể chạy đồng thời trên cùng một kết nối.
+    """
+
+    def __init__(self, index: int, url: str, weight_limit: int, request_timeout: float):
+        self.index = index
+        self.url = url
+        self.request_timeout = request_timeout
+        self.limiter = WeightLimiter(weight_limit)
+        self.connection = None
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.failures = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._closed = asyncio.Event()
+
+    def is_open(self) -> bool:
+        """
+        Kết nối WebSocket đang mở.
+        """
+        return self.connection is not None and self.connection.state == State.OPEN
+
+    def is_healthy(self) -> bool:
+        """
+        Kết nối đang mở và không bị khóa do rate limit.
+        """
+        return self.is_open() and not self.limiter.blocked()
+
+    async def open(self):
+        """
+        Mở kết nối và chạy task đọc phản hồi.
+        """
+        self.connection = await connect(self.url)
+        self._closed.clear()
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def close(self):
+        """
+        Đóng kết nối, các request đang chờ sẽ nhận `ConnectionLostError`.
+        """
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            await connection.close()
+        if self._reader:
+            self._reader.cancel()
+            self._reader = None
+        self._fail_pending(ConnectionLostError(f"Connection #{self.index} closed"))
+        self._closed.set()
+
+    async def wait_closed(self):
+        await self._closed.wait()
+
+    def _fail_pending(self, exc: Exception):
+        pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def _read_loop(self):
+        try:
+            async for message in self.connection:
+                data = orjson.loads(message)
+                self._sync_rate_limits(data)
+                future = self.pending.pop(data.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(data)
+        except ConnectionClosed as e:
+            self.last_error = f"{e.rcvd.code if e.rcvd else ''} {e}"
+            log.error(f"{Fore.RED}🚨 WebSocket API connection #{self.index} closed: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.last_error = str(e)
+            log.error(f"{Fore.RED}🚨 WebSocket API connection #{self.index} error: {e}")
+        finally:
+            self.connection = None
+            self._fail_pending(ConnectionLostError(f"Connection #{self.index} lost: {self.last_error}"))
+            self._closed.set()
+
+    def _sync_rate_limits(self, data: dict):
+        for rate_limit in data.get("rateLimits") or ():
+            if rate_limit.get("rateLimitType") == "REQUEST_WEIGHT" and rate_limit.get("interval") == "MINUTE":
+                self.limiter.sync(rate_limit.get("count", 0))
+        status = data.get("status")
+        if status in (418, 429):
+            error = data.get("error") or {}
+            retry_after = error.get("data", {}).get("retryAfter") if isinstance(error.get("data"), dict) else None
+            seconds = (retry_after / 1000 - time.time()) if retry_after else 60
+            self.limiter.block(max(seconds, 1))
+
+    async def ping(self, timeout: float) -> bool:
+        """
+        Health check: gửi ping frame và chờ pong.
+        """
+        if not self.is_open():
+            return False
+        try:
+            pong = await self.connection.ping()
+            await asyncio.wait_for(pong, timeout)
+            return True
+        except Exception:
+            return False
+
+    async def request(self, payload: dict, weight: int) -> dict:
+        """
+        Gửi request (payload phải có `id` duy nhất) và chờ phản hồi.
+        `request_timeout` tính cả thời gian chờ weight lẫn thời gian chờ phản hồi.
+        """
+        if not self.is_open():
+            raise ConnectionLostError(f"Connection #{self.index} is not open")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        if self.limiter.wait_time(weight) > 0:
+            try:
+                await asyncio.wait_for(self.limiter.acquire(weight), self.request_timeout)
+            except asyncio.TimeoutError:
+                raise RateLimitTimeoutError(f"Connection #{self.index}: no weight available within {self.request_timeout}s") from None
+            if not self.is_open():
+                raise ConnectionLostError(f"Connection #{self.index} is not open")
+        else:
+            # ghi nhận ngay (không nhường vòng event) để `_pick` của request kế tiếp thấy weight này
+            self.limiter.add(weight)
+        future = loop.create_future()
+        self.pending[payload["id"]] = future
+        try:
+            await self.connection.send(orjson.dumps(payload).decode())
+            return await asyncio.wait_for(future, max(deadline - loop.time(), 0))
+        except ConnectionClosed as e:
+            raise ConnectionLostError(str(e)) from e
+        finally:
+            self.pending.pop(payload["id"], None)
+
+
+class WebSocketPool:
+    """
+    Pool các kết nối Binance WebSocket API, tự phục hồi khi kết nối lỗi:
+        - Health check định kỳ bằng ping/pong, kết nối lỗi sẽ được đóng và mở lại với jittered backoff.
+        - Lỗi 1008 (policy violation) chỉ làm hỏng một kết nối, không dừng cả process.
+        - Request đang chờ trên kết nối bị mất sẽ được gửi lại trên một kết nối khỏe khác.
+        - Mỗi kết nối theo dõi request weight riêng, request được gửi tới kết nối còn nhiều weight nhất,
+          kết nối bị khóa do 429/418 chỉ được dùng khi không còn kết nối nào khác.
+
+    Ví dụ:
+    ```python
+    pool = WebSocketPool("wss://ws-api.binance.com:443/ws-api/v3", size=2)
+    await pool.start()
+    spot = Spot(pool=pool)
+    trades = await spot.get_trades_in_time_range("BTCUSDT", start, end)
+    ```
+    """
+
+    def __init__(
+        self,
+        url: str,
+        size: int = 2,
+        weight_limit: int = 6000,
+        request_timeout: float = 10.0,
+        health_interval: float = 20.0,
+        max_attempts: int = 3,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        connect_timeout: Optional[float] = None,
+    ):
+        """
+        :param url: URL WebSocket API (VD: "wss://ws-api.binance.com:443/ws-api/v3").
+        :param size: Số kết nối trong pool.
+        :param weight_limit: Giới hạn request weight mỗi phút cho mỗi kết nối.
+        :param request_timeout: Thời gian chờ phản hồi tối đa (giây).
+        :param health_interval: Chu kỳ health check (giây).
+        :param max_attempts: Số lần gửi lại tối đa khi kết nối bị mất.
+        :param backoff_base: Thời gian chờ cơ sở khi reconnect (giây).
+        :param backoff_cap: Thời gian chờ tối đa khi reconnect (giây).
+        :param connect_timeout: Thời gian chờ tối đa để `start()` có kết nối đầu tiên (giây), mặc định bằng `backoff_cap`.
+        """
+        self.url = url
+        self.size = size
+        self.health_interval = health_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.connect_timeout = backoff_cap if connect_timeout is None else connect_timeout
+        self.connections: List[PooledConnection] = [
+            PooledConnection(i, url, weight_limit, request_timeout) for i in range(size)
+        ]
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._supervisors: List[asyncio.Task] = []
+        self._healthy = asyncio.Event()
+        self._running = False
+        self.rescheduled = 0
+
+    async def start(self):
+        """
+        Mở tất cả kết nối và chạy các task giám sát.
+        Raise `ConnectionError` (và dừng pool) nếu không mở được kết nối nào trong `connect_timeout` giây.
+        """
+        if self._running:
+            return
+        self._running = True
+        for connection in self.connections:
+            self._supervisors.append(asyncio.create_task(self._supervise(connection)))
+        try:
+            await asyncio.wait_for(self._healthy.wait(), self.connect_timeout)
+        except asyncio.TimeoutError:
+            errors = "; ".join(f"#{c.index}: {c.last_error}" for c in self.connections if c.last_error)
+            await self.stop()
+            raise ConnectionError(
+                f"WebSocket API pool {self.url} not connected after {self.connect_timeout}s ({errors or 'no error reported'})"
+            ) from None
+        log.info(f"{Fore.GREEN}Connected WebSocket API pool ({self.size} connections) {self.url}")
+
+    async def stop(self):
+        """
+        Dừng giám sát và đóng tất cả kết nối.
+        """
+        self._running = False
+        for task in self._supervisors:
+            task.cancel()
+        self._supervisors.clear()
+        for connection in self.connections:
+            await connection.close()
+        self._healthy.clear()
+        log.info(f"{Fore.RED}Disconnected WebSocket API pool {self.url}")
+
+    def is_connected(self) -> bool:
+        """
+        Có ít nhất một kết nối đang mở (có thể đang bị khóa do rate limit).
+        """
+        return any(c.is_open() for c in self.connections)
+
+    def stats(self) -> List[dict]:
+        """
+        Trạng thái từng kết nối: health, weight đã dùng, số request đang chờ, số lần reconnect.
+        """
+        return [
+            {
+                "index": c.index,
+                "open": c.is_open(),
+                "healthy": c.is_healthy(),
+                "used_weight": c.limiter.used(),
+                "pending": len(c.pending),
+                "reconnects": c.reconnects,
+                "last_error": c.last_error,
+            }
+            for c in self.connections
+        ]
+
+    async def _supervise(self, connection: PooledConnection):
+        """
+        Giữ cho `connection` luôn mở: mở lại với jittered backoff khi lỗi, health check định kỳ.
+        """
+        attempt = 0
+        while self._running:
+            try:
+                await connection.open()
+                attempt = 0
+                self._update_health()
+                while self._running and connection.is_open():
+                    try:
+                        await asyncio.wait_for(connection.wait_closed(), self.health_interval)
+                    except asyncio.TimeoutError:
+                        if not await connection.ping(timeout=self.health_interval / 2):
+                            log.error(f"{Fore.RED}🚨 Health check failed for connection #{connection.index}")
+                            await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                connection.last_error = str(e)
+                log.error(f"{Fore.RED}🚨 Cannot connect WebSocket API #{connection.index}: {e}")
+
+            await connection.close()
+            self._update_health()
+            if not self._running:
+                break
+
+            # policy violation (1008) thường do vượt rate limit: chờ lâu hơn
+            base = self.backoff_base
+            if connection.last_error and ("1008" in connection.last_error or "policy violation" in connection.last_error.lower()):
+                base = max(base, 5.0)
+                connection.limiter.block(self.backoff_cap)
+            delay = backoff_delay(attempt, base, self.backoff_cap)
+            attempt += 1
+            connection.failures += 1
+            connection.reconnects += 1
+            log.info(f"{Fore.YELLOW}Reconnecting WebSocket API #{connection.index} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _update_health(self):
+        if self.is_connected():
+            self._healthy.set()
+        else:
+            self._healthy.clear()
+
+    def _pick(self, weight: int, exclude: set) -> Optional[PooledConnection]:
+        """
+        Chọn kết nối khỏe còn nhiều weight nhất (ưu tiên kết nối không nằm trong `exclude`,
+        kết nối bị khóa do rate limit chỉ được chọn khi không còn kết nối khỏe).
+        """
+        candidates = [c for c in self.connections if c.is_healthy()] or [c for c in self.connections if c.is_open()]
+        if not candidates:
+            return None
+        preferred = [c for c in candidates if c.index not in exclude] or candidates
+        return max(preferred, key=lambda c: (c.limiter.headroom() >= weight, c.limiter.headroom() - len(c.pending)))
+
+    async def send(self, payload: dict, weight: Optional[int] = None) -> dict:
+        """
+        Gửi request qua pool và trả về phản hồi (dict đầy đủ, gồm `result` hoặc `error`).
+        Nếu kết nối bị mất trong lúc chờ, request được gửi lại trên kết nối khỏe khác.
+
+        :param payload: Request theo định dạng WebSocket API (`method`, `params`). `id` sẽ được gán lại.
+        :param weight: Request weight, mặc định lấy theo `REQUEST_WEIGHTS`.
+        """
+        if weight is None:
+            weight = REQUEST_WEIGHTS.get(payload.get("method"), DEFAULT_REQUEST_WEIGHT)
+
+        tried = set()
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_attempts):
+            if not self.is_connected():
+                try:
+                    await asyncio.wait_for(self._healthy.wait(), self.backoff_cap)
+                except asyncio.TimeoutError:
+                    last_error = ConnectionLostError(f"No open connection within {self.backoff_cap}s")
+                    break
+            connection = self._pick(weight, tried)
+            if connection is None:
+                # kết nối vừa bị đóng sau khi `_healthy` được set: chờ supervisor mở lại trước khi thử tiếp
+                last_error = ConnectionLostError("No open connection")
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+                continue
+
+            payload = {**payload, "id": next(self._ids)}
+            try:
+                return await connection.request(payload, weight)
+            except (ConnectionLostError, asyncio.TimeoutError) as e:
+                last_error = e
+                tried.add(connection.index)
+                self.rescheduled += 1
+                log.error(f"⚠️ Rescheduling {payload.get('method')} (attempt {attempt + 1}): {e}")
+                if isinstance(e, asyncio.TimeoutError) and not isinstance(e, RateLimitTimeoutError):
+                    # kết nối không phản hồi: đóng để supervisor mở lại
+                    await connection.close()
+
+        raise RuntimeError(f"WebSocket API pool request failed after {self.max_attempts} attempts: {last_error}")
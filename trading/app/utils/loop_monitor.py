@@ -0,0 +1,117 @@
+import asyncio
+import importlib.util
+from typing import Optional
+
+from colorama import Fore
+
+from app.utils.log import log
+from app.utils.metrics import MetricsRegistry, metrics
+
+# Độ trễ của callback so với thời điểm đã hẹn, micro giây
+LOOP_LAG = "event_loop_lag_us"
+LOOP_LAG_ALERTS = "event_loop_lag_alerts"
+
+
+def resolve_loop(name: str) -> str:
+    """
+    Chọn event loop cho uvicorn ("asyncio", "uvloop" hoặc "auto"): uvloop chỉ được dùng khi đã cài
+    (uvloop không chạy trên Windows), nếu không thì quay về asyncio.
+    """
+    if name not in ("asyncio", "uvloop", "auto"):
+        raise ValueError(f"Event loop không hợp lệ: {name} (asyncio, uvloop, auto)")
+    if name == "asyncio":
+        return name
+    if importlib.util.find_spec("uvloop") is None:
+        if name == "uvloop":
+            log.warning(f"{Fore.YELLOW}⚠️ uvloop is not installed, falling back to asyncio")
+        return "asyncio"
+    return "uvloop"
+
+
+def loop_name(loop: Optional[asyncio.AbstractEventLoop] = None) -> str:
+    """
+    Tên event loop đang chạy: "uvloop" hoặc "asyncio".
+    """
+    loop = loop or asyncio.get_running_loop()
+    return "uvloop" if type(loop).__module__.startswith("uvloop") else "asyncio"
+
+
+class LoopLagMonitor:
+    """
+    Đo độ trễ của event loop: mỗi `interval` giây hẹn một lần thức dậy và ghi lại thức dậy muộn bao nhiêu
+    vào histogram `event_loop_lag_us` (nhãn `loop`). Độ trễ lớn nghĩa là có code chặn vòng event
+    (VD: gọi `requests` đồng bộ, tính toán nặng trong callback).
+        - Vượt `warn_ms` / `critical_ms`: ghi log và tăng bộ đếm `event_loop_lag_alerts` (nhãn `level`).
+        - Chi phí: một lần thức dậy mỗi `interval` giây.
+
+    Ví dụ:
+    ```python
+    monitor = LoopLagMonitor(interval=0.5, warn_ms=100)
+    monitor.start()
+    ...
+    monitor.histogram.snapshot()  # {"p50": ..., "p99": ..., "max": ...}
+    await monitor.stop()
+    ```
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        warn_ms: float = 100.0,
+        critical_ms: float = 1000.0,
+        registry: MetricsRegistry = metrics,
+    ):
+        """
+        :param interval: Chu kỳ đo (giây).
+        :param warn_ms: Ngưỡng cảnh báo (mili giây).
+        :param critical_ms: Ngưỡng nghiêm trọng (mili giây).
+        :param registry: Registry chứa histogram và bộ đếm cảnh báo.
+        """
+        if interval <= 0:
+            raise ValueError("interval phải lớn hơn 0")
+        self.interval = interval
+        self.warn_us = int(warn_ms * 1000)
+        self.critical_us = int(critical_ms * 1000)
+        self.registry = registry
+        self.histogram = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """
+        Chạy task đo trên event loop hiện tại.
+        """
+        if self._task is not None and not self._task.done():
+            return
+        loop = asyncio.get_running_loop()
+        self.histogram = self.registry.histogram(LOOP_LAG, loop=loop_name(loop))
+        self._task = asyncio.create_task(self._run())
+        log.info(f"{Fore.GREEN}Monitoring event loop lag ({loop_name(loop)}, every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = self.interval
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.observe(int((loop.time() - expected) * 1_000_000))
+
+    def observe(self, lag_us: int):
+        """
+        Ghi một lần đo (micro giây) và cảnh báo nếu vượt ngưỡng.
+        """
+        self.histogram.record(lag_us)
+        if lag_us >= self.critical_us:
+            self.registry.counter(LOOP_LAG_ALERTS, level="critical").add()
+            log.error(f"{Fore.RED}❌ Event loop blocked for {lag_us / 1000:.0f}ms")
+        elif lag_us >= self.warn_us:
+            self.registry.counter(LOOP_LAG_ALERTS, level="warning").add()
+            log.warning(f"{Fore.YELLOW}⚠️ Event loop lag {lag_us / 1000:.0f}ms")
@@ -0,0 +1,237 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+class Counter:
+    """
+    Bộ đếm tăng dần.
+    """
+    __slots__ = ("name", "labels", "value")
+    kind = "counter"
+
+    def __init__(self, name: str, labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+
+    def add(self, value: Union[int, float] = 1):
+        self.value += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self.value}
+
+
+class Meter:
+    """
+    Đếm số sự kiện và tốc độ trung bình mỗi giây trong `window` giây gần nhất
+    (vòng `window` ô, mỗi ô một giây, không cấp phát khi ghi).
+    """
+    __slots__ = ("name", "labels", "window", "total", "_slots", "_second")
+    kind = "meter"
+
+    def __init__(self, name: str, labels: Dict[str, str], window: int = 10):
+        self.name = name
+        self.labels = labels
+        self.window = window
+        self.total = 0
+        self._slots = [0] * window
+        self._second = 0
+
+    def _advance(self, second: int):
+        elapsed = second - self._second
+        if elapsed > 0:
+            slots = self._slots
+            for i in range(1, min(elapsed, self.window) + 1):
+                slots[(self._second + i) % self.window] = 0
+            self._second = second
+
+    def mark(self, value: Union[int, float] = 1, now: Optional[float] = None):
+        """
+        Ghi nhận `value` sự kiện (hoặc byte) tại thời điểm `now` (giây, mặc định `time.time()`).
+        """
+        second = int(now if now is not None else time.time())
+        if second != self._second:
+            self._advance(second)
+        self._slots[second % self.window] += value
+        self.total += value
+
+    def rate(self, now: Optional[float] = None) -> float:
+        """
+        Tốc độ trung bình mỗi giây trong `window` giây đã trọn (không tính giây hiện tại).
+        """
+        second = int(now if now is not None else time.time())
+        self._advance(second)
+        return (sum(self._slots) - self._slots[second % self.window]) / (self.window - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"total": self.total, "rate": self.rate()}
+
+
+class Histogram:
+    """
+    Histogram kiểu HDR cho số nguyên không âm (VD: độ trễ tính bằng micro giây):
+    các bucket tuyến tính trong từng khoảng lũy thừa của 2, cấp phát trước, sai số tương đối ~ 2^-(precision-1).
+    Ghi một giá trị là vài phép toán bit và một lần tăng phần tử của list, đủ rẻ để luôn bật.
+    """
+    __slots__ = ("name", "labels", "precision", "max_value", "counts", "count", "sum", "min", "max", "_sub", "_half")
+    kind = "histogram"
+
+    def __init__(self, name: str, labels: Dict[str, str], precision: int = 5, max_value: int = 1 << 36):
+        """
+        :param precision: Số bit có nghĩa của mỗi bucket (5 -> sai số ~6%).
+        :param max_value: Giá trị lớn nhất (giá trị lớn hơn được tính vào bucket cuối).
+        """
+        self.name = name
+        self.labels = labels
+        self.precision = precision
+        self.max_value = max_value
+        self._sub = 1 << precision
+        self._half = self._sub >> 1
+        self.counts = [0] * (self._index(max_value) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = max_value
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._sub:
+            return value
+        shift = value.bit_length() - self.precision
+        return shift * self._half + (value >> shift)
+
+    def _bounds(self, index: int) -> Tuple[int, int]:
+        """
+        Khoảng giá trị [thấp, cao] của một bucket.
+        """
+        if index < self._sub:
+            return index, index
+        shift = index // self._half - 1
+        mantissa = index - shift * self._half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int):
+        """
+        Ghi một giá trị (số nguyên không âm, giá trị âm được tính là 0).
+        """
+        if value < 0:
+            value = 0
+        elif value > self.max_value:
+            value = self.max_value
+        if value < self._sub:
+            self.counts[value] += 1
+        else:
+            shift = value.bit_length() - self.precision
+            self.counts[shift * self._half + (value >> shift)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+        if value < self.min:
+            self.min = value
+
+    def percentile(self, percent: float) -> int:
+        """
+        Giá trị tại phân vị `percent` (0-100), làm tròn lên cận trên của bucket.
+        """
+        if not self.count:
+            return 0
+        target = max(int(self.count * percent / 100 + 0.5), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._bounds(index)[1], self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = self.sum = self.max = 0
+        self.min = self.max_value
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+Metric = Union[Counter, Meter, Histogram]
+
+
+class MetricsRegistry:
+    """
+    Registry các metric trong process, theo (tên, nhãn).
+
+    Ví dụ:
+    ```python
+    from app.utils.metrics import metrics
+
+    metrics.meter("stream_messages", market="future", stream="btcusdt@aggTrade").mark()
+    metrics.histogram("stream_exchange_latency_us", market="future", type="aggTrade").record(1250)
+    metrics.snapshot()
+    ```
+    """
+
+    def __init__(self):
+        self.metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Metric] = {}
+
+    def _get(self, cls, name: str, labels: Dict[str, str], **kwargs) -> Metric:
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            metric = self.metrics[key] = cls(name, labels, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} {labels} đã tồn tại với kiểu {metric.kind}")
+        return metric
+
+    def counter(self, name: str, **labels: str) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def meter(self, name: str, **labels: str) -> Meter:
+        return self._get(Meter, name, labels)
+
+    def histogram(self, name: str, precision: int = 5, max_value: int = 1 << 36, **labels: str) -> Histogram:
+        return self._get(Histogram, name, labels, precision=precision, max_value=max_value)
+
+    def remove(self, name: str, **labels: str):
+        self.metrics.pop((name, tuple(sorted(labels.items()))), None)
+
+    def snapshot(self, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Giá trị hiện tại của mọi metric (hoặc các metric có tên `name`).
+        """
+        return [
+            {"name": metric.name, "kind": metric.kind, "labels": metric.labels, **metric.snapshot()}
+            for metric in list(self.metrics.values())
+            if name is None or metric.name == name
+        ]
+
+    def to_prometheus(self) -> str:
+        """
+        Xuất theo định dạng text của Prometheus (histogram dưới dạng summary theo phân vị).
+        """
+        lines = []
+        for metric in list(self.metrics.values()):
+            labels = ",".join(f'{k}="{v}"' for k, v in metric.labels.items())
+            if isinstance(metric, Histogram):
+                for quantile in (0.5, 0.9, 0.99, 0.999):
+                    quantile_labels = f'{labels},quantile="{quantile}"' if labels else f'quantile="{quantile}"'
+                    lines.append(f"{metric.name}{{{quantile_labels}}} {metric.percentile(quantile * 100)}")
+                lines.append(f"{metric.name}_sum{{{labels}}} {metric.sum}")
+                lines.append(f"{metric.name}_count{{{labels}}} {metric.count}")
+            elif isinstance(metric, Meter):
+                lines.append(f"{metric.name}_total{{{labels}}} {metric.total}")
+                lines.append(f"{metric.name}_rate{{{labels}}} {metric.rate()}")
+            else:
+                lines.append(f"{metric.name}{{{labels}}} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+# Registry mặc định của process
+metrics = MetricsRegistry()
@@ -0,0 +1,68 @@
+"""
+Benchmark chi phí của DispatchMode.ORDERED so với CONCURRENT.
+
+Chạy: `python -m benchmarks.bench_dispatch --streams 50 --messages 2000`
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.utils.Binance.dispatch import Dispatcher, DispatchMode, OverflowPolicy
+
+
+async def run(mode: DispatchMode, streams: int, messages: int, concurrency: int) -> dict:
+    dispatcher = Dispatcher(maxsize=1000, policy=OverflowPolicy.BLOCK, concurrency=concurrency, mode=mode)
+    last_seen = {}
+    out_of_order = 0
+    done = asyncio.Event()
+    remaining = streams * messages
+
+    def make_callback(stream: str):
+        async def callback(seq: int):
+            nonlocal out_of_order, remaining
+            # mô phỏng callback có await (ghi DB, cập nhật order book, ...)
+            if random.random() < 0.1:
+                await asyncio.sleep(0)
+            if seq < last_seen.get(stream, -1):
+                out_of_order += 1
+            last_seen[stream] = max(seq, last_seen.get(stream, -1))
+            remaining -= 1
+            if not remaining:
+                done.set()
+        return callback
+
+    names = [f"s{i}@aggTrade" for i in range(streams)]
+    for name in names:
+        dispatcher.add(name, make_callback(name))
+
+    started = time.perf_counter()
+    for seq in range(messages):
+        for name in names:
+            await dispatcher.dispatch(name, seq)
+    await done.wait()
+    elapsed = time.perf_counter() - started
+    dispatcher.close()
+    return {
+        "mode": mode.value,
+        "messages": streams * messages,
+        "elapsed": round(elapsed, 3),
+        "msg_per_s": round(streams * messages / elapsed),
+        "us_per_msg": round(elapsed / (streams * messages) * 1e6, 2),
+        "out_of_order": out_of_order,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--streams", type=int, default=50)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    for mode in (DispatchMode.CONCURRENT, DispatchMode.ORDERED):
+        print(await run(mode, args.streams, args.messages, args.concurrency))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
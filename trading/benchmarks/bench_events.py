@@ -0,0 +1,67 @@
+"""
+Benchmark decode message stream: json.loads + float() (cách cũ) so với orjson + event có kiểu và chế độ RAW.
+
+Chạy: `python -m benchmarks.bench_events --messages 200000`
+"""
+import argparse
+import json
+import time
+
+import orjson
+
+from app.utils.Binance.events import decode_event, split_combined
+from app.utils.Binance.mock_server import SyntheticMarket
+
+
+def build_messages(count: int) -> list:
+    market = SyntheticMarket(["BTCUSDT", "ETHUSDT"])
+    streams = ["btcusdt@aggTrade", "ethusdt@aggTrade", "btcusdt@depth", "btcusdt@markPrice", "btcusdt@kline_1m"]
+    messages = []
+    for i in range(count):
+        stream = streams[i % len(streams)]
+        messages.append(orjson.dumps({"stream": stream, "data": market.stream_event(stream)}).decode())
+    return messages
+
+
+def baseline(message: str):
+    # Cách cũ: json.loads rồi callback tự float() từng field
+    data = json.loads(message)["data"]
+    if data["e"] == "aggTrade":
+        return float(data["p"]) * float(data["q"])
+    if data["e"] == "depthUpdate":
+        return [(float(p), float(q)) for p, q in data["b"]]
+    if data["e"] == "kline":
+        return float(data["k"]["c"])
+    return float(data["p"])
+
+
+def typed(message: str):
+    _, raw = split_combined(message)
+    return decode_event(orjson.loads(raw))
+
+
+def dict_only(message: str):
+    _, raw = split_combined(message)
+    return orjson.loads(raw)
+
+
+def raw_only(message: str):
+    return split_combined(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+
+    messages = build_messages(args.messages)
+    for name, fn in (("json + float()", baseline), ("orjson dict", dict_only), ("orjson typed", typed), ("raw pass-through", raw_only)):
+        started = time.perf_counter()
+        for message in messages:
+            fn(message)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<18} {len(messages) / elapsed:>12,.0f} msg/s  {elapsed / len(messages) * 1e6:6.2f} us/msg")
+
+
+if __name__ == "__main__":
+    main()
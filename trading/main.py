@@ -1,5 +1,6 @@
 import uvicorn
 from app.core.config import settings
+from app.utils.loop_monitor import resolve_loop
 
 
 def run_server() -> None:
@@ -8,6 +9,7 @@ def run_server() -> None:
         "app.main:app",
         host=settings.UVICORN_HOST,
         port=settings.UVICORN_PORT,
+        loop=resolve_loop(settings.UVICORN_LOOP),
         reload=False,  # Always disable reload for performance
         access_log=False,  # Disable access logs for performance
     )
@@ -0,0 +1,114 @@
+# tests/utils/test_backfill.py
+
+import time
+
+import pytest
+
+from app.utils.Binance.Future import Future
+from app.utils.Binance.backfill import BackfillScheduler
+from app.utils.Binance.mock_server import MockBinanceServer
+
+
+@pytest.fixture
+async def server(monkeypatch):
+    server = await MockBinanceServer().start()
+    monkeypatch.setattr(Future, "url_http", server.future_http_url)
+    yield server
+    await server.stop()
+
+
+@pytest.fixture
+async def trades_client(server):
+    client = Future(url=server.ws_api_url)
+    await client.connect()
+    yield client
+    await client.disconnect()
+
+
+class RecordingClient(Future):
+    """Future ghi lại mọi trade `trades.historical` trả về."""
+
+    def __init__(self, url):
+        super().__init__(url=url)
+        self.fetched = []
+
+    async def get_historical_trades(self, symbol, from_id=None, limit=1000):
+        batch = await super().get_historical_trades(symbol, from_id=from_id, limit=limit)
+        self.fetched.extend(batch)
+        return batch
+
+
+def scheduler(tmp_path, trades_client, start_time, end_time, **kwargs):
+    return BackfillScheduler(
+        ["BTCUSDT"], [], start_time, end_time, trades_client=trades_client,
+        checkpoint_path=tmp_path / "checkpoint.json", report_interval=0, **kwargs,
+    )
+
+
+async def test_trades_backfill_starts_at_end_time(server, tmp_path):
+    """Tests that the trades job seeks to end_time instead of walking back from the latest trade."""
+    client = RecordingClient(server.ws_api_url)
+    await client.connect()
+    try:
+        now = int(time.time() * 1000)
+        start_time, end_time = now - 300_000, now - 200_000
+        received = []
+        await scheduler(tmp_path, client, start_time, end_time, on_trades=lambda job, trades: received.extend(trades)).run()
+    finally:
+        await client.disconnect()
+
+    assert all(trade["time"] <= end_time for trade in client.fetched)
+    ids = [trade["id"] for trade in received]
+    assert sorted(ids) == list(range(min(ids), max(ids) + 1))
+    assert all(start_time <= trade["time"] <= end_time for trade in received)
+    market = server.market
+    assert market.trade_time("BTCUSDT", min(ids) - 1) < start_time
+    assert market.trade_time("BTCUSDT", max(ids) + 1) > end_time
+
+
+async def test_trades_backfill_resumes_from_checkpoint(server, trades_client, tmp_path):
+    """Tests that a failed run saves the cursor and a new scheduler continues without gaps or duplicates."""
+    now = int(time.time() * 1000)
+    start_time, end_time = now - 300_000, now - 200_000
+    received = []
+
+    def failing_sink(job, trades):
+        if received:
+            raise RuntimeError("disk full")
+        received.extend(trades)
+
+    first = scheduler(tmp_path, trades_client, start_time, end_time, on_trades=failing_sink, max_retries=0)
+    report = await first.run()
+    assert not report[0]["done"] and report[0]["error"] == "disk full"
+    saved_items = report[0]["items"]
+    assert saved_items == len(received) > 0
+
+    second = scheduler(tmp_path, trades_client, start_time, end_time, on_trades=lambda job, trades: received.extend(trades))
+    report = await second.run()
+    assert report[0]["done"] and report[0]["items"] == len(received) > saved_items
+
+    ids = [trade["id"] for trade in received]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == list(range(min(ids), max(ids) + 1))
+
+
+async def test_finished_jobs_are_not_run_again(server, tmp_path):
+    """Tests that klines jobs marked done in the checkpoint are skipped, and a different range starts over."""
+    now = int(time.time() * 1000) // 60_000 * 60_000
+    start_time, end_time = now - 120 * 60_000, now
+    frames = []
+    first = BackfillScheduler(["BTCUSDT"], ["1m", "1h"], start_time, end_time, on_klines=lambda job, frame: frames.append(frame),
+                              checkpoint_path=tmp_path / "checkpoint.json", report_interval=0)
+    assert all(row["done"] for row in await first.run())
+    assert sum(len(frame) for frame in frames) == 120 + 2
+
+    frames.clear()
+    again = BackfillScheduler(["BTCUSDT"], ["1m", "1h"], start_time, end_time, on_klines=lambda job, frame: frames.append(frame),
+                              checkpoint_path=tmp_path / "checkpoint.json", report_interval=0)
+    assert all(row["done"] for row in await again.run())
+    assert frames == []
+
+    other = BackfillScheduler(["BTCUSDT"], ["1m"], start_time - 60_000, end_time, on_klines=lambda job, frame: frames.append(frame),
+                              checkpoint_path=tmp_path / "checkpoint.json", report_interval=0)
+    await other.run()
+    assert sum(len(frame) for frame in frames) == 121
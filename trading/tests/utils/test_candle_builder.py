@@ -0,0 +1,87 @@
+# tests/utils/test_candle_builder.py
+
+import asyncio
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from app.utils.Binance.candle_builder import CandleBuilder, CandleEngine, candle_close_time, candle_open_time
+from app.utils.calc_average import calc_average_trades
+from app.utils.timeframe import Timeframe
+
+
+def ms(*args) -> int:
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_open_time_aligns_week_to_monday_and_month_to_calendar():
+    """Tests that weekly candles open on Monday, monthly candles on the calendar month and others on timeframe multiples."""
+    time = ms(2024, 2, 29, 13, 47)  # thứ Năm
+    assert candle_open_time(time, Timeframe.W1) == ms(2024, 2, 26)
+    assert candle_open_time(time, Timeframe.Mo1) == ms(2024, 2, 1)
+    assert candle_close_time(ms(2024, 2, 1), Timeframe.Mo1) == ms(2024, 3, 1) - 1
+    assert candle_close_time(ms(2024, 12, 1), Timeframe.Mo1) == ms(2025, 1, 1) - 1
+    assert candle_open_time(time, Timeframe.H4) == ms(2024, 2, 29, 12)
+    assert candle_open_time(time, Timeframe.M15) == ms(2024, 2, 29, 13, 45)
+
+
+async def test_rolled_up_candles_match_direct_aggregation():
+    """Tests that candles rolled up from 1m candles match OHLCV and calc_average_trades computed directly on the trades."""
+    rng = random.Random(7)
+    start = ms(2024, 3, 4)
+    trades = []
+    time = start
+    for i in range(600):
+        time += rng.randint(1_000, 30_000)
+        trades.append((time, round(100 + rng.uniform(-5, 5), 1), round(rng.uniform(0.1, 2), 3), rng.random() < 0.5, i))
+    # giờ cuối: mua và bán cùng giá, cùng khối lượng nên net volume bù trừ hết
+    time = candle_open_time(time, Timeframe.H1) + 3_600_000
+    for i, (price, qty, is_sell) in enumerate([(101.0, 0.5, False), (99.0, 0.75, True), (101.0, 1.0, True), (99.0, 0.75, False), (101.0, 0.5, False)]):
+        time += 60_000
+        trades.append((time, price, qty, is_sell, 600 + i))
+
+    builder = CandleBuilder("BTCUSDT", [Timeframe.M1, Timeframe.M5, Timeframe.H1], history=1000)
+    closed = []
+    builder.on_close(lambda candle: asyncio.sleep(0, closed.append(candle)))
+
+    for trade in trades:
+        await builder.add(*trade)
+    await builder.advance(time + 2 * 3_600_000)
+    hours = [c for c in closed if c.timeframe == Timeframe.H1]
+    assert [c.open_time for c in hours] == sorted({candle_open_time(t[0], Timeframe.H1) for t in trades})
+
+    balanced = hours[-1].average()
+    assert balanced.volume_buy == balanced.volume_sell == 0.0
+    assert (balanced.price_buy, balanced.price_sell) == pytest.approx((100.33333333, 100.0))
+
+    for candle in hours + [c for c in closed if c.timeframe == Timeframe.M5][:5]:
+        rows = [t for t in trades if candle.open_time <= t[0] <= candle.close_time]
+        array = np.array([[p, q, p * q, -1 if m else 1] for _, p, q, m, _ in rows])
+        expected = calc_average_trades(array)
+        assert candle.closed and candle.trades == len(rows)
+        assert (candle.open, candle.close, candle.first_id, candle.last_id) == (rows[0][1], rows[-1][1], rows[0][4], rows[-1][4])
+        assert candle.volume == pytest.approx(array[:, 1].sum())
+        assert candle.taker_buy_volume == pytest.approx(array[array[:, 3] == 1, 1].sum())
+        average = candle.average()
+        for field in ("price_buy", "volume_buy", "price_sell", "volume_sell", "price", "volume", "quote_volume",
+                      "order_price_buy", "order_count_buy", "order_price", "order_count", "high_price", "low_price"):
+            assert getattr(average, field) == pytest.approx(getattr(expected, field)), field
+
+
+async def test_live_candle_includes_current_minute_and_engine_routes_symbols():
+    """Tests that an open higher timeframe candle includes the current 1m candle and that CandleEngine keeps a builder per symbol."""
+    engine = CandleEngine([Timeframe.M1, Timeframe.M5])
+    start = ms(2024, 3, 4)
+
+    def message(symbol, time, price, agg_id):
+        return {"e": "aggTrade", "s": symbol, "a": agg_id, "p": str(price), "q": "1", "f": agg_id * 2, "l": agg_id * 2 + 1, "T": time, "m": False}
+
+    await engine.on_agg_trade(message("BTCUSDT", start + 1_000, 100, 1))
+    await engine.on_agg_trade(message("BTCUSDT", start + 61_000, 105, 2))
+    await engine.on_agg_trade(message("ETHUSDT", start + 61_000, 10, 1))
+    live = engine["BTCUSDT"].candle(Timeframe.M5)
+    assert (live.open, live.high, live.close, live.volume, live.trades) == (100, 105, 105, 2, 4)
+    assert engine["BTCUSDT"].candle(Timeframe.M1).open == 105
+    assert engine["ETHUSDT"].candle(Timeframe.M5).volume == 1
@@ -0,0 +1,72 @@
+# tests/utils/test_conflation.py
+
+import asyncio
+
+import orjson
+
+from app.utils.Binance.conflation import Conflator
+from app.utils.Binance.Future import Future
+from app.utils.Binance.order_book import OrderBook
+from app.utils.Binance.Spot import Spot
+
+
+async def test_subscribers_get_latest_state_at_their_own_rate():
+    """Tests that fast updates are conflated per subscriber and serialized once per published version."""
+    serialized = []
+
+    def serialize(value):
+        serialized.append(value)
+        return orjson.dumps(value)
+
+    conflator = Conflator(serialize)
+    fast, slow = [], []
+
+    async def on_fast(payload):
+        fast.append(orjson.loads(payload))
+
+    async def on_slow(payload):
+        slow.append(orjson.loads(payload))
+
+    conflator.subscribe("BTCUSDT", on_fast, max_rate=50)
+    conflator.subscribe("BTCUSDT", on_slow, max_rate=5)
+    for i in range(100):
+        conflator.set("BTCUSDT", {"u": i})
+        await asyncio.sleep(0.002)
+    await asyncio.sleep(0.25)
+
+    assert fast[-1] == slow[-1] == {"u": 99}
+    assert len(slow) < len(fast) < 100
+    assert len(serialized) == len({v["u"] for v in serialized})
+    stats = conflator.stats()[0]
+    assert stats["serializations"] == len(serialized) <= len(fast) + len(slow)
+    conflator.close()
+
+
+async def test_futures_and_spot_books_of_one_symbol_get_separate_keys():
+    """Tests that add_book keys books by market and symbol unless an explicit key is given."""
+    conflator = Conflator()
+    future_book, spot_book, other_book = OrderBook("BTCUSDT", Future), OrderBook("btcusdt", Spot()), OrderBook("BTCUSDT", Future)
+    for book, bid in ((future_book, "100"), (spot_book, "99"), (other_book, "98")):
+        book.load_snapshot({"lastUpdateId": 1, "bids": [[bid, "1"]], "asks": [["101", "1"]]})
+
+    assert conflator.add_book(future_book, levels=1) == "future:BTCUSDT"
+    assert conflator.add_book(spot_book, levels=1) == "spot:BTCUSDT"
+    assert conflator.add_book(other_book, levels=1, key="replay") == "replay"
+    assert set(conflator.channels) == {"future:BTCUSDT", "spot:BTCUSDT", "replay"}
+
+    received = {}
+
+    def collect(key):
+        async def callback(payload):
+            received[key] = orjson.loads(payload)
+        return callback
+
+    for key in conflator.channels:
+        conflator.subscribe(key, collect(key), max_rate=100)
+    await asyncio.sleep(0)
+    for book in (future_book, spot_book, other_book):
+        for listener in book.listeners:
+            listener(book)
+    await asyncio.sleep(0.05)
+    assert {key: snapshot["bids"][0][0] for key, snapshot in received.items()} == {"future:BTCUSDT": 100.0, "spot:BTCUSDT": 99.0, "replay": 98.0}
+    conflator.close()
@@ -0,0 +1,110 @@
+# tests/utils/test_dispatch.py
+
+import asyncio
+
+from app.utils.Binance.dispatch import Dispatcher, DispatchMode, OverflowPolicy, stream_route_key
+
+
+async def test_overflow_policies_bound_queue_and_count_drops():
+    """Tests that drop-oldest and conflate-latest keep the queue bounded and count dropped messages."""
+    dispatcher = Dispatcher(maxsize=3, concurrency=1)
+    gate = asyncio.Event()
+    seen = {"drop": [], "conflate": []}
+
+    def slow(name):
+        async def callback(data):
+            await gate.wait()
+            seen[name].append(data)
+        return callback
+
+    drop = dispatcher.add("a", slow("drop"), policy=OverflowPolicy.DROP_OLDEST)
+    conflate = dispatcher.add("b", slow("conflate"), policy=OverflowPolicy.CONFLATE_LATEST)
+    await asyncio.sleep(0)
+    for i in range(10):
+        await dispatcher.dispatch("a", i)
+        await dispatcher.dispatch("b", i)
+
+    assert drop.depth <= 3 and conflate.depth <= 3
+    assert dispatcher.totals()[1] == drop.dropped + conflate.dropped > 0
+
+    gate.set()
+    await asyncio.sleep(0.01)
+    assert seen["drop"][-3:] == [7, 8, 9]
+    assert seen["conflate"][-1] == 9
+    dispatcher.close()
+
+
+async def test_block_policy_applies_backpressure():
+    """Tests that the block policy waits for the consumer instead of dropping."""
+    dispatcher = Dispatcher(maxsize=2, policy=OverflowPolicy.BLOCK, concurrency=1)
+    received = []
+
+    async def callback(data):
+        await asyncio.sleep(0.001)
+        received.append(data)
+
+    subscription = dispatcher.add("s", callback)
+    for i in range(20):
+        await dispatcher.dispatch("s", i)
+        assert subscription.depth <= 2
+    await asyncio.sleep(0.05)
+
+    assert received == list(range(20))
+    assert subscription.dropped == 0
+    dispatcher.close()
+
+
+async def test_remove_releases_blocked_producer():
+    """Tests that removing a subscription wakes a producer blocked on a full queue and drops later messages."""
+    dispatcher = Dispatcher(maxsize=1, policy=OverflowPolicy.BLOCK, concurrency=1)
+    gate = asyncio.Event()
+
+    async def stuck(data):
+        await gate.wait()
+
+    subscription = dispatcher.add("s", stuck)
+    await dispatcher.dispatch("s", 0)
+    await asyncio.sleep(0)
+    await dispatcher.dispatch("s", 1)
+    producer = asyncio.create_task(subscription.put(2))
+    await asyncio.sleep(0.01)
+    assert not producer.done()
+
+    dispatcher.remove("s", stuck)
+    await asyncio.wait_for(producer, 1)
+    await subscription.put(3)
+    assert subscription.depth == 0
+    await subscription.join()
+
+
+async def test_ordered_mode_delivers_each_stream_in_sequence():
+    """Tests that ordered mode keeps per-stream order while streams still interleave."""
+    dispatcher = Dispatcher(maxsize=100, concurrency=4, mode=DispatchMode.ORDERED)
+    received = {"a": [], "b": []}
+
+    def make_callback(name):
+        async def callback(data):
+            if data % 3 == 0:
+                await asyncio.sleep(0)
+            received[name].append(data)
+        return callback
+
+    dispatcher.add("a", make_callback("a"))
+    dispatcher.add("b", make_callback("b"))
+    for i in range(50):
+        await dispatcher.dispatch("a", i)
+        await dispatcher.dispatch("b", i)
+    await asyncio.sleep(0.05)
+
+    assert received["a"] == list(range(50))
+    assert received["b"] == list(range(50))
+    dispatcher.close()
+
+
+def test_stream_route_key_matches_event_fields():
+    """Tests that stream names map to the (e, s[, interval]) keys Binance sends on /ws."""
+    assert stream_route_key("btcusdt@kline_1m") == ("kline", "BTCUSDT", "1m")
+    assert stream_route_key("btcusdt@depth@100ms") == ("depthUpdate", "BTCUSDT")
+    assert stream_route_key("ethusdt@markPrice@1s") == ("markPriceUpdate", "ETHUSDT")
+    assert stream_route_key("btcusdt@ticker") == ("24hrTicker", "BTCUSDT")
+    assert stream_route_key("!ticker@arr") is None
@@ -0,0 +1,47 @@
+# tests/utils/test_events.py
+
+import asyncio
+
+import orjson
+
+from app.utils.Binance.dispatch import Dispatcher
+from app.utils.Binance.events import AggTradeEvent, EventFormat, KlineEvent, loads_event, split_combined
+
+AGG_TRADE = {"e": "aggTrade", "E": 2, "s": "BTCUSDT", "a": 7, "p": "65000.10", "q": "0.250", "f": 10, "l": 11, "T": 1, "m": True}
+
+
+def test_typed_events_convert_numbers_once():
+    """Tests that aggTrade and kline payloads decode into typed events with numeric fields."""
+    event = loads_event(orjson.dumps({"stream": "btcusdt@aggTrade", "data": AGG_TRADE}))
+    assert event == AggTradeEvent("BTCUSDT", 2, 7, 65000.10, 0.25, 10, 11, 1, True)
+
+    kline = loads_event(orjson.dumps({"e": "kline", "E": 5, "s": "ETHUSDT", "k": {
+        "t": 0, "T": 59999, "i": "1m", "o": "1", "h": "2", "l": "0.5", "c": "1.5", "v": "10", "q": "15",
+        "n": 3, "V": "4", "Q": "6", "x": True}}))
+    assert isinstance(kline, KlineEvent)
+    assert (kline.high, kline.trades, kline.closed) == (2.0, 3, True)
+
+
+async def test_raw_subscribers_get_payload_without_parsing():
+    """Tests that a combined message is split without parsing and each format is built only when needed."""
+    message = orjson.dumps({"stream": "btcusdt@aggTrade", "data": AGG_TRADE}).decode()
+    stream, raw = split_combined(message)
+    assert stream == "btcusdt@aggTrade" and orjson.loads(raw) == AGG_TRADE
+
+    dispatcher = Dispatcher(concurrency=1)
+    received = {}
+
+    def make_callback(name):
+        async def callback(data):
+            received[name] = data
+        return callback
+
+    for event_format in EventFormat:
+        dispatcher.add(stream, make_callback(event_format), event_format=event_format)
+    await dispatcher.dispatch(stream, None, raw)
+    await asyncio.sleep(0.01)
+
+    assert received[EventFormat.RAW] is raw
+    assert received[EventFormat.DICT] == AGG_TRADE
+    assert received[EventFormat.TYPED].price == 65000.10
+    dispatcher.close()
@@ -0,0 +1,106 @@
+# tests/utils/test_exchange_info.py
+
+import orjson
+import pytest
+
+from app.utils.Binance.Future import Future
+from app.utils.Binance.exchange_info import ExchangeInfoService, SymbolInfo
+from app.utils.Binance.mock_server import MockBinanceServer
+
+
+BTCUSDT = {
+    "symbol": "BTCUSDT",
+    "status": "TRADING",
+    "contractType": "PERPETUAL",
+    "baseAsset": "BTC",
+    "quoteAsset": "USDT",
+    "filters": [
+        {"filterType": "PRICE_FILTER", "tickSize": "0.10", "minPrice": "556.80", "maxPrice": "4529764"},
+        {"filterType": "LOT_SIZE", "stepSize": "0.001", "minQty": "0.001", "maxQty": "1000"},
+        {"filterType": "MIN_NOTIONAL", "notional": "100"},
+    ],
+}
+
+
+def test_symbol_info_from_filters():
+    """Tests parsing of tick size, step size and min notional filters."""
+    info = SymbolInfo.from_exchange_info(BTCUSDT)
+
+    assert info.tick_size == 0.1
+    assert info.step_size == 0.001
+    assert info.min_notional == 100
+    assert info.contract_type == "PERPETUAL"
+    assert (info.price_scale, info.tick_ticks) == (10, 1)
+    assert info.price_to_ticks(65000.17) == 650001
+    assert info.round_price(65000.17) == 65000.1
+
+
+def test_validate_order():
+    """Tests order validation against the symbol filters."""
+    info = SymbolInfo.from_exchange_info(BTCUSDT)
+
+    assert info.validate_order(65000.1, 0.002) == []
+    errors = info.validate_order(65000.15, 0.0025)
+    assert len(errors) == 2
+    assert info.validate_order(65000.0, 0.001)[0].startswith("notional")
+
+
+def test_snapshot_roundtrip(tmp_path):
+    """Tests that the indexed metadata survives a restart through the snapshot file."""
+    path = tmp_path / "exchangeInfo.json"
+    service = ExchangeInfoService(Future, snapshot_path=path)
+    service._index({"symbols": [BTCUSDT]})
+    service.etag = "abc"
+    service.save_snapshot()
+
+    restored = ExchangeInfoService(Future, snapshot_path=path)
+    assert restored.load_snapshot()
+    assert restored["BTCUSDT"].step_size == 0.001
+    assert restored.etag == "abc"
+    assert [i.symbol for i in restored.find(contract_type="PERPETUAL")] == ["BTCUSDT"]
+
+
+@pytest.mark.parametrize("content", [b'{"fetched_at": 1', b'{"version": 2, "symbols": []}', b'{"data": [1, 2]}'])
+async def test_unreadable_snapshot_falls_back_to_refresh(tmp_path, monkeypatch, content):
+    """Tests that a truncated or foreign snapshot makes load_snapshot return False and load() fetch from Binance."""
+    path = tmp_path / "exchangeInfo.json"
+    path.write_bytes(content)
+    service = ExchangeInfoService(Future, snapshot_path=path)
+    assert not service.load_snapshot()
+
+    calls = []
+
+    async def refresh(force=False):
+        calls.append(force)
+        service._index({"symbols": [BTCUSDT]})
+
+    monkeypatch.setattr(service, "refresh", refresh)
+    await service.load()
+    assert calls == [True] and "BTCUSDT" in service
+
+
+@pytest.fixture
+async def server():
+    server = await MockBinanceServer().start()
+    yield server
+    await server.stop()
+
+
+async def test_conditional_refresh_with_instance_client(server, tmp_path):
+    """Tests that an instance client works, a 304 keeps the index but refreshes fetched_at and the snapshot, and a 200 re-indexes."""
+    path = tmp_path / "exchangeInfo.json"
+    service = ExchangeInfoService(Future(url_http=server.future_http_url), snapshot_path=path)
+    assert service.name == "Future"
+
+    assert await service.refresh(force=True)
+    symbols, etag, fetched_at = service.symbols, service.etag, service.fetched_at
+    assert etag and set(symbols) == set(server.market.symbols)
+
+    assert not await service.refresh()
+    assert service.symbols is symbols and service.etag == etag and service.fetched_at > fetched_at
+    assert orjson.loads(path.read_bytes())["fetched_at"] == service.fetched_at
+
+    service.etag = '"stale"'
+    assert await service.refresh()
+    assert service.symbols is not symbols and set(service.symbols) == set(symbols)
+    assert service.etag == etag and orjson.loads(path.read_bytes())["etag"] == etag
@@ -0,0 +1,142 @@
+# tests/utils/test_ingest.py
+
+import asyncio
+
+import pytest
+
+from app.utils.Binance.events import AggTradeEvent, DepthUpdateEvent, EventFormat, KlineEvent, MarkPriceEvent, TickerEvent
+from app.utils.Binance.ingest import IngestClient, SharedRing, decode_record, encode_event
+from app.utils.Binance.mock_server import MockBinanceServer
+from app.utils.metrics import MetricsRegistry
+
+
+def test_ring_wraps_around_and_reads_in_order():
+    """Tests that records of varying length read back in order while the ring wraps around several times."""
+    ring = SharedRing(size=256)
+    consumer = SharedRing(ring.name, create=False)
+    try:
+        expected = []
+        for i in range(200):
+            record = bytes([i % 256]) * (i % 37 + 1)
+            assert ring.write(record)
+            expected.append(record)
+            if i % 3 == 2:
+                assert consumer.read() == expected
+                expected = []
+        assert consumer.read() == expected and not consumer.available()
+        assert ring.dropped == 0 and ring.written == 200
+    finally:
+        consumer.close()
+        ring.close()
+
+
+def test_full_ring_drops_new_records_without_overwriting():
+    """Tests that a full ring drops new records and counts `dropped`, keeping unread data intact."""
+    ring = SharedRing(size=64)
+    try:
+        records = [bytes([i]) * 12 for i in range(5)]
+        results = [ring.write(record) for record in records]
+        assert results == [True, True, True, True, False] and ring.dropped == 1
+        assert ring.read() == records[:4]
+        assert ring.write(records[4]) and ring.read() == [records[4]]
+    finally:
+        ring.close()
+
+
+def test_events_round_trip_through_binary_records():
+    """Tests that aggTrade, markPrice, depth, other typed events, dicts and raw payloads survive an encode/decode round trip."""
+    events = [
+        ("btcusdt@aggTrade", AggTradeEvent("BTCUSDT", 1, 2, 100.5, 0.25, 3, 4, 5, True)),
+        ("btcusdt@markPrice@1s", MarkPriceEvent("BTCUSDT", 1, 100.0, 100.1, 100.2, 0.0001, 6)),
+        ("btcusdt@depth@100ms", DepthUpdateEvent("BTCUSDT", 1, 10, 12, 9, 2, [(100.0, 1.5)], [(101.0, 0.0), (102.0, 2.0)])),
+        ("ethusdt@depth", DepthUpdateEvent("ETHUSDT", 1, 10, 12, None, None, [], [])),
+        ("!forceOrder@arr", {"e": "forceOrder", "E": 1, "o": {"s": "BTCUSDT"}}),
+        ("btcusdt@kline_1m", KlineEvent("BTCUSDT", 1, "1m", 0, 59_999, 1.0, 2.0, 0.5, 1.5, 10.0, 15.0, 7, 4.0, 6.0, False)),
+        ("!ticker@arr", [TickerEvent("BTCUSDT", 1, 0.5, 0.1, 100.0, 101.0, 0.2, 100.5, 102.0, 99.0, 10.0, 1000.0, 0, 1, 5)]),
+        ("btcusdt@aggTrade", '{"e":"aggTrade","E":1,"s":"BTCUSDT","a":1,"p":"100.5"}'),
+    ]
+    for stream_name, event in events:
+        assert decode_record(encode_event(stream_name, event)) == (stream_name, event)
+
+
+class CommandQueue(list):
+    put = list.append
+
+
+async def test_subscribe_requests_raw_payloads_only_when_needed():
+    """Tests that streams are sent typed until a dict/raw callback needs the raw payload, and duplicate names subscribe once."""
+    client = IngestClient()
+    client._commands = commands = CommandQueue()
+
+    async def noop(data):
+        pass
+
+    await client.subscribe("btcusdt@aggTrade", noop)
+    await client.subscribe("btcusdt@aggTrade", noop, event_format=EventFormat.TYPED)
+    await client.subscribe("btcusdt@aggTrade", noop, event_format=EventFormat.DICT)
+    await client.subscribe("btcusdt@aggTrade", noop, event_format=EventFormat.TYPED)
+    await client.subscribe_multiple(["ethusdt@kline_1m", "ethusdt@kline_1m", "btcusdt@aggTrade"], noop)
+    assert commands == [
+        ("SUBSCRIBE", [("btcusdt@aggTrade", "typed")]),
+        ("SUBSCRIBE", [("btcusdt@aggTrade", "raw")]),
+        ("SUBSCRIBE", [("ethusdt@kline_1m", "typed")]),
+    ]
+    assert len(client.dispatcher.subscriptions["ethusdt@kline_1m"]) == 1
+    assert [s.event_format for s in client.dispatcher.subscriptions["btcusdt@aggTrade"]] == ["typed", "typed", "dict", "typed", "typed"]
+    client.dispatcher.close()
+
+
+async def test_subscribe_before_connect_raises():
+    """Tests that subscribing before connect() raises a clear error and leaves no subscription behind."""
+    client = IngestClient()
+
+    async def noop(data):
+        pass
+
+    with pytest.raises(RuntimeError, match="not connected"):
+        await client.subscribe("btcusdt@aggTrade", noop)
+    with pytest.raises(RuntimeError, match="not connected"):
+        await client.subscribe_multiple(["btcusdt@aggTrade"], noop)
+    assert not client.subscriptions and not client.dispatcher.subscriptions
+
+
+@pytest.fixture
+async def server():
+    server = await MockBinanceServer(rate=200).start()
+    yield server
+    await server.stop()
+
+
+async def test_callbacks_receive_their_event_format_across_processes(server):
+    """Tests that typed, dict and raw callbacks on one stream each get their format from the ingest process."""
+    registry = MetricsRegistry()
+    client = IngestClient(url=server.stream_url, url_http=server.future_http_url, metrics=registry)
+    received = {EventFormat.TYPED: [], EventFormat.DICT: [], EventFormat.RAW: []}
+
+    def collect(event_format):
+        async def callback(data):
+            received[event_format].append(data)
+        return callback
+
+    await client.connect()
+    try:
+        await client.subscribe("btcusdt@aggTrade", collect(EventFormat.TYPED))
+        await client.subscribe("btcusdt@aggTrade", collect(EventFormat.DICT), event_format=EventFormat.DICT)
+        await client.subscribe("btcusdt@aggTrade", collect(EventFormat.RAW), event_format=EventFormat.RAW)
+        for _ in range(500):
+            if all(len(items) >= 5 for items in received.values()):
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await client.disconnect()
+
+    assert all(isinstance(event, AggTradeEvent) for event in received[EventFormat.TYPED])
+    assert all(isinstance(event, dict) and event["e"] == "aggTrade" for event in received[EventFormat.DICT])
+    assert all(isinstance(event, str) and '"aggTrade"' in event for event in received[EventFormat.RAW])
+    typed_ids = {event.agg_id for event in received[EventFormat.TYPED]}
+    assert len(typed_ids.intersection(event["a"] for event in received[EventFormat.DICT])) >= 3
+
+    # metric được ghi trong process API, không phải trong process ingest
+    snapshot = {(m["name"], tuple(m["labels"].values())): m for m in registry.snapshot()}
+    assert snapshot[("stream_messages", ("future", "btcusdt@aggTrade"))]["total"] >= len(received[EventFormat.TYPED])
+    assert snapshot[("stream_callback_latency_us", ("future", "aggTrade"))]["count"] > 0
@@ -0,0 +1,68 @@
+# tests/utils/test_klines.py
+
+import numpy as np
+import orjson
+import pytest
+
+from app.utils.Binance.types import KlineMap
+from app.utils.Binance.klines import KlineFrameBuilder, decode_kline_events, decode_klines
+
+
+ROWS = [
+    [1700000000000, "100.5", "101.0", "99.5", "100.0", "12.5", 1700000059999, "1250.0", 42, "6.25", "625.0", "0"],
+    [1700000060000, "100.0", "102.0", "100.0", "101.5", "8.0", 1700000119999, "812.0", 17, "3.0", "304.5", "0"],
+]
+
+
+def test_kline_map_indexes_are_ints():
+    """Tests that every KlineMap field is a plain int index (no accidental tuples)."""
+    assert KlineMap.close == 4
+    assert ROWS[0][KlineMap.numberOfTrades] == 42
+
+
+def test_decode_rest_payload():
+    """Tests decoding a REST klines payload into typed columns."""
+    frame = decode_klines(orjson.dumps(ROWS))
+
+    assert len(frame) == 2
+    assert frame.open_time.dtype == np.int64
+    assert frame.trades.dtype == np.int32
+    assert frame.close.tolist() == [100.0, 101.5]
+    assert frame.taker_buy_quote_volume.tolist() == [625.0, 304.5]
+    assert frame[-1].close_time.tolist() == [1700000119999]
+
+
+def test_decode_ws_api_payload_and_error():
+    """Tests decoding a WebSocket API response and surfacing its error."""
+    frame = decode_klines({"id": 1, "status": 200, "result": ROWS})
+    assert frame.high.tolist() == [101.0, 102.0]
+
+    with pytest.raises(RuntimeError):
+        decode_klines({"id": 1, "status": 400, "error": {"code": -1121}})
+
+
+def test_decode_kline_events_closed_only():
+    """Tests decoding kline stream events, including combined-stream messages."""
+    kline = {"t": 1, "T": 2, "o": "1", "h": "3", "l": "0.5", "c": "2", "v": "10", "n": 5,
+             "x": True, "q": "20", "V": "4", "Q": "8"}
+    messages = [
+        orjson.dumps({"e": "kline", "k": kline}),
+        {"stream": "btcusdt@kline_1m", "data": {"e": "kline", "k": {**kline, "t": 3, "x": False}}},
+    ]
+
+    assert decode_kline_events(messages).open_time.tolist() == [1, 3]
+    closed = decode_kline_events(messages, closed_only=True)
+    assert closed.open_time.tolist() == [1]
+    assert closed.taker_buy_volume.tolist() == [4.0]
+
+
+def test_builder_grows_and_keeps_order():
+    """Tests that the builder appends pages past its initial capacity."""
+    builder = KlineFrameBuilder(capacity=1)
+    builder.append(ROWS[:1])
+    builder.append(orjson.dumps(ROWS[1:]))
+
+    frame = builder.build()
+    assert len(frame) == 2
+    assert builder.last_open_time() == 1700000060000
+    assert frame.volume.tolist() == [12.5, 8.0]
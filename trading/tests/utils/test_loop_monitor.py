@@ -0,0 +1,39 @@
+# tests/utils/test_loop_monitor.py
+
+import asyncio
+import importlib.util
+import time
+
+import pytest
+
+from app.utils.loop_monitor import LOOP_LAG_ALERTS, LoopLagMonitor, resolve_loop
+from app.utils.metrics import MetricsRegistry
+
+
+async def test_blocking_call_is_recorded_and_alerted():
+    """Tests that a synchronous call blocking the event loop is recorded in the histogram and raises the alert counter."""
+    registry = MetricsRegistry()
+    monitor = LoopLagMonitor(interval=0.01, warn_ms=30, critical_ms=10_000, registry=registry)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    time.sleep(0.08)  # VD: requests.post trong một coroutine
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    histogram = monitor.histogram
+    assert histogram.count >= 3 and histogram.max >= 50_000
+    assert histogram.percentile(50) < 30_000
+    assert registry.counter(LOOP_LAG_ALERTS, level="warning").value == 1
+    assert registry.counter(LOOP_LAG_ALERTS, level="critical").value == 0
+
+
+def test_resolve_loop_falls_back_when_uvloop_is_missing(monkeypatch):
+    """Tests that choosing uvloop without it installed falls back to asyncio and an unknown name raises."""
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    assert resolve_loop("uvloop") == "asyncio"
+    assert resolve_loop("auto") == "asyncio"
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: object())
+    assert resolve_loop("auto") == "uvloop"
+    assert resolve_loop("asyncio") == "asyncio"
+    with pytest.raises(ValueError):
+        resolve_loop("trio")
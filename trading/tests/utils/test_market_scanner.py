@@ -0,0 +1,123 @@
+# tests/utils/test_market_scanner.py
+
+import time
+
+import pytest
+
+from app.utils.Binance.Future import Future
+from app.utils.Binance.market_scanner import MarketScanner
+
+
+def ticker(symbol, quote_volume, change=0.0, high=110.0, low=100.0, last_qty=1.0, volume=10.0, close_time=None):
+    return {
+        "symbol": symbol, "lastPrice": "105", "lastQty": str(last_qty), "openPrice": "100", "highPrice": str(high),
+        "lowPrice": str(low), "priceChange": "5", "priceChangePercent": str(change), "weightedAvgPrice": "104",
+        "volume": str(volume), "quoteVolume": str(quote_volume), "count": 100,
+        "closeTime": close_time if close_time is not None else int(time.time() * 1000),
+    }
+
+
+def stream_ticker(symbol, quote_volume, change=0.0):
+    t = ticker(symbol, quote_volume, change)
+    return {
+        "s": symbol, "c": t["lastPrice"], "Q": t["lastQty"], "o": t["openPrice"], "h": t["highPrice"], "l": t["lowPrice"],
+        "p": t["priceChange"], "P": t["priceChangePercent"], "w": t["weightedAvgPrice"], "v": t["volume"],
+        "q": t["quoteVolume"], "n": t["count"], "C": t["closeTime"],
+    }
+
+
+TICKERS = [
+    ticker("BTCUSDT", 5000, change=2.0, high=120.0),
+    ticker("ETHUSDT", 3000, change=-8.0, high=150.0),
+    ticker("SOLUSDT", 1000, change=5.0),
+    ticker("ETHBTC", 4000, change=1.0),
+    ticker("1000PEPEUSDT", 9000, change=30.0),
+    ticker("BTCDOMUSDT", 100, change=0.5),
+    ticker("ETHUSDT_240628", 8000),
+    ticker("ZEROUSDT", 7000, last_qty=0.0),
+    ticker("OLDUSDT", 6000, close_time=int(time.time() * 1000) - 3 * 24 * 60 * 60 * 1000),
+]
+
+
+class FakeClient:
+    calls = 0
+
+    @staticmethod
+    async def ticker_24hr_all(url_http=None):
+        FakeClient.calls += 1
+        return TICKERS
+
+
+def symbols(records):
+    return [record["symbol"] for record in records]
+
+
+def test_top_sorts_by_each_criterion():
+    """Tests that top returns the N best symbols in order for each sort key and direction."""
+    scanner = MarketScanner(FakeClient)
+    scanner.update(TICKERS)
+    assert symbols(scanner.top(3)) == ["BTCUSDT", "ETHBTC", "ETHUSDT"]
+    assert symbols(scanner.top(2, ascending=True)) == ["BTCDOMUSDT", "SOLUSDT"]
+    assert symbols(scanner.top(2, by="change")) == ["SOLUSDT", "BTCUSDT"]
+    assert symbols(scanner.top(1, by="abs_change")) == ["ETHUSDT"]
+    assert symbols(scanner.top(1, by="volatility")) == ["ETHUSDT"]
+    assert len(scanner.top(100)) == 5
+    assert scanner.top(0) == []
+    with pytest.raises(ValueError):
+        scanner.top(3, by="price")
+
+
+def test_filter_drops_special_zero_and_stale_tickers():
+    """Tests that filter applies the stable-coin suffix, special pattern, zero quantity, age and volume conditions."""
+    scanner = MarketScanner(FakeClient)
+    scanner.update(TICKERS)
+    assert set(symbols(scanner.top(100, stable_coins=["USDT"]))) == {"BTCUSDT", "ETHUSDT", "SOLUSDT", "BTCDOMUSDT"}
+    assert set(symbols(scanner.top(100, stable_coins=["BTC"]))) == {"ETHBTC"}
+    assert set(symbols(scanner.top(100, min_quote_volume=3000))) == {"BTCUSDT", "ETHUSDT", "ETHBTC"}
+
+    everything = set(symbols(scanner.top(100, exclude_special=False, max_age_ms=None)))
+    assert {"1000PEPEUSDT", "ETHUSDT_240628", "OLDUSDT"} <= everything
+    assert "ZEROUSDT" not in everything
+
+
+def test_update_stream_updates_rows_and_adds_symbols():
+    """Tests that stream tickers update existing rows in place and append new symbols without losing old values."""
+    scanner = MarketScanner(FakeClient)
+    scanner.update(TICKERS)
+    scanner.update_stream([stream_ticker("SOLUSDT", 20000, change=1.0), stream_ticker("NEWUSDT", 10000)])
+
+    assert len(scanner) == len(TICKERS) + 1
+    assert symbols(scanner.top(2)) == ["SOLUSDT", "NEWUSDT"]
+    assert scanner.records(scanner.filter(stable_coins=["BTC"]).nonzero()[0])[0]["quote_volume"] == 4000
+    assert symbols(scanner.top(3, stable_coins=["USDT"]))[-1] == "BTCUSDT"
+
+
+async def test_start_refreshes_through_client():
+    """Tests that start loads the table through the client and attach only refreshes when the table is empty."""
+    class FakeStream:
+        def __init__(self):
+            self.subscribed = []
+
+        async def subscribe(self, stream_name, callback):
+            self.subscribed.append(stream_name)
+
+    FakeClient.calls = 0
+    scanner = MarketScanner(FakeClient, interval=3600)
+    await scanner.start()
+    scanner.stop()
+    assert FakeClient.calls == 1 and len(scanner) == len(TICKERS)
+
+    stream = FakeStream()
+    await scanner.attach(stream)
+    assert stream.subscribed == ["!ticker@arr"] and FakeClient.calls == 1
+
+
+async def test_filter_matches_ticker_24hr(monkeypatch):
+    """Tests that the scanner selects the same symbols as Future.ticker_24hr, both excluding EXCLUDED_SYMBOL_PATTERN."""
+    monkeypatch.setattr(Future, "ticker_24hr_all", FakeClient.ticker_24hr_all)
+    expected = {t["symbol"] for t in await Future.ticker_24hr(["USDT"])}
+
+    scanner = MarketScanner(Future)
+    await scanner.refresh()
+    assert set(symbols(scanner.top(len(scanner), stable_coins=["USDT"]))) == expected
+    assert "1000PEPEUSDT" not in expected and "ETHUSDT_240628" not in expected
@@ -0,0 +1,110 @@
+# tests/utils/test_metrics.py
+
+import asyncio
+import random
+import time
+
+import numpy as np
+import orjson
+
+from app.utils.Binance.StreamFuture import StreamFuture
+from app.utils.Binance.StreamSpot import StreamSpot
+from app.utils.Binance.stream_metrics import raw_event_time, stream_type
+from app.utils.metrics import MetricsRegistry
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    """Tests that HDR histogram percentiles are within the bucket precision."""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_us", type="aggTrade")
+    rng = random.Random(1)
+    values = [int(rng.lognormvariate(7, 1.5)) for _ in range(20_000)]
+    for value in values:
+        histogram.record(value)
+    assert histogram.count == len(values) and histogram.max == max(values) and histogram.min == min(values)
+    for percent in (50, 90, 99, 99.9):
+        expected = np.percentile(values, percent)
+        assert abs(histogram.percentile(percent) - expected) <= expected * 2 ** -(histogram.precision - 1) + 1
+    assert registry.histogram("latency_us", type="aggTrade") is histogram
+
+
+def test_meter_rate_over_window_and_prometheus_export():
+    """Tests that a meter averages its rate over completed seconds and the registry exports the Prometheus format."""
+    registry = MetricsRegistry()
+    meter = registry.meter("stream_messages", stream="btcusdt@aggTrade")
+    for second in range(1000, 1010):
+        for _ in range(5):
+            meter.mark(1, second + 0.5)
+    assert meter.total == 50
+    assert meter.rate(1010.2) == 5.0
+    assert meter.rate(1030) == 0.0
+    registry.counter("reconnects").add()
+    text = registry.to_prometheus()
+    assert 'stream_messages_total{stream="btcusdt@aggTrade"} 50' in text
+    assert "reconnects{} 1" in text
+
+
+def test_raw_event_time_and_stream_type():
+    """Tests that event time is read from the raw JSON and histograms are grouped by stream type."""
+    assert raw_event_time('{"e":"aggTrade","E":1700000000123,"s":"BTCUSDT"}') == 1700000000123
+    assert raw_event_time('{"u":1,"T":42,"s":"BTCUSDT"}') == 42
+    assert raw_event_time('{"u":1}') == 0
+    assert stream_type("btcusdt@depth@100ms") == "depth@100ms"
+    assert stream_type("!ticker@arr") == "!ticker@arr"
+
+
+class FakeConnection:
+    def __init__(self, messages):
+        self.messages = messages
+
+    async def send(self, message):
+        pass
+
+    async def __aiter__(self):
+        for message in self.messages:
+            yield message
+
+
+async def test_stream_records_rates_and_latencies():
+    """Tests that StreamFuture records message and byte counts, exchange -> receive and receive -> callback latency per stream."""
+    registry = MetricsRegistry()
+    now_ms = int(time.time() * 1000)
+    messages = [
+        orjson.dumps({"stream": "btcusdt@aggTrade", "data": {"e": "aggTrade", "E": now_ms - 50, "s": "BTCUSDT", "a": i}}).decode()
+        for i in range(10)
+    ]
+    stream = StreamFuture(metrics=registry, gap_fill=False)
+    stream._register("btcusdt@aggTrade")
+    stream.subscriptions["btcusdt@aggTrade"].append(None)
+
+    async def callback(data):
+        await asyncio.sleep(0.002)
+
+    stream.dispatcher.add("btcusdt@aggTrade", callback)
+    stream.connection = FakeConnection(messages)
+    await stream.on_message()
+    await stream.dispatcher.join()
+    stream.dispatcher.close()
+
+    snapshot = {(m["name"], tuple(m["labels"].values())): m for m in registry.snapshot()}
+    assert snapshot[("stream_messages", ("future", "btcusdt@aggTrade"))]["total"] == 10
+    assert snapshot[("stream_bytes", ("future", "btcusdt@aggTrade"))]["total"] == sum(map(len, messages))
+    exchange = snapshot[("stream_exchange_latency_us", ("future", "aggTrade"))]
+    assert exchange["count"] == 10 and 50_000 <= exchange["p50"] < 1_000_000
+    callback = snapshot[("stream_callback_latency_us", ("future", "aggTrade"))]
+    assert callback["count"] == 10 and callback["min"] >= 2_000
+
+
+def test_futures_and_spot_streams_keep_separate_metrics():
+    """Tests that Futures and Spot streams with the same name get separate meters and unsubscribing one keeps the other."""
+    registry = MetricsRegistry()
+    future, spot = StreamFuture(metrics=registry), StreamSpot(metrics=registry)
+    for stream in (future, spot):
+        stream._register("btcusdt@aggTrade")
+    assert future._stream_metrics["btcusdt@aggTrade"].messages is not spot._stream_metrics["btcusdt@aggTrade"].messages
+    assert future._stream_metrics["btcusdt@aggTrade"].exchange_latency is not spot._stream_metrics["btcusdt@aggTrade"].exchange_latency
+
+    spot._stream_metrics["btcusdt@aggTrade"].observe(100, 0, 1000.5)
+    assert future._unregister("btcusdt@aggTrade")
+    meters = {tuple(m["labels"].values()): m for m in registry.snapshot("stream_messages")}
+    assert list(meters) == [("spot", "btcusdt@aggTrade")] and meters[("spot", "btcusdt@aggTrade")]["total"] == 1
@@ -0,0 +1,126 @@
+# tests/utils/test_mock_server.py
+
+import asyncio
+import time
+
+import httpx
+import orjson
+import pytest
+from websockets import connect
+from websockets.exceptions import ConnectionClosed
+
+from app.utils.Binance.Future import Future
+from app.utils.Binance.StreamFuture import StreamFuture
+from app.utils.Binance.mock_server import MockBinanceServer
+
+
+@pytest.fixture
+async def server():
+    server = await MockBinanceServer(rate=200).start()
+    yield server
+    await server.stop()
+
+
+async def receive(ws, count: int, timeout: float = 2.0) -> list:
+    messages = []
+    while len(messages) < count:
+        message = orjson.loads(await asyncio.wait_for(ws.recv(), timeout))
+        if "result" not in message:
+            messages.append(message)
+    return messages
+
+
+async def test_rest_through_instance_url_http(server):
+    """Tests that REST calls made on a Future instance go to its url_http, leaving the class URL untouched."""
+    client = Future(url=server.ws_api_url, url_http=server.future_http_url)
+    now = int(time.time() * 1000) // 60_000 * 60_000
+
+    depth = await client.get_depth("BTCUSDT", 100)
+    frame = await client.get_klines_frame("BTCUSDT", now - 10 * 60_000, now - 1, "1m")
+    tickers = await client.ticker_24hr_all()
+    trades = await client.get_agg_trades("BTCUSDT", start_time=now - 60_000, limit=5)
+
+    assert len(depth["bids"]) == len(depth["asks"]) == 100
+    assert len(frame) == 10
+    assert {t["symbol"] for t in tickers} == set(server.market.symbols)
+    assert len(trades) == 5 and trades[0]["T"] >= now - 60_000
+    assert Future.url_http == "https://fapi.binance.com/fapi/v1"
+
+
+async def test_rest_weight_limit_returns_429(server):
+    """Tests that REST responses carry the used weight header and turn into 429 past the limit."""
+    server.weight_limit = 50
+    async with httpx.AsyncClient() as client:
+        first = await client.get(f"{server.future_http_url}/ticker/24hr")
+        second = await client.get(f"{server.future_http_url}/ticker/24hr")
+    assert first.status_code == 200 and first.headers["X-MBX-USED-WEIGHT-1M"] == "40"
+    assert second.status_code == 429 and second.json()["code"] == -1003
+
+
+async def test_stream_future_against_mock(server):
+    """Tests that StreamFuture receives aggTrades from the mock stream endpoint."""
+    stream = StreamFuture(url=server.stream_url, combined=True, url_http=server.future_http_url)
+    received = []
+
+    async def on_trade(data):
+        received.append(data)
+
+    await stream.connect()
+    try:
+        await stream.subscribe("btcusdt@aggTrade", on_trade)
+        for _ in range(100):
+            if len(received) >= 5:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await stream.disconnect()
+    ids = [trade["a"] for trade in received]
+    assert len(ids) >= 5 and ids == sorted(ids)
+
+
+async def test_too_many_control_messages_close_with_1008(server):
+    """Tests that more than 10 control messages per second close the stream connection with 1008."""
+    async with connect(server.stream_url) as ws:
+        with pytest.raises(ConnectionClosed) as info:
+            for i in range(20):
+                await ws.send(orjson.dumps({"method": "LIST_SUBSCRIPTIONS", "id": i}).decode())
+            while True:
+                await asyncio.wait_for(ws.recv(), 2)
+    assert info.value.rcvd.code == 1008
+
+
+async def test_failing_client_is_dropped_without_stopping_publisher(server):
+    """Tests that a client whose send fails is dropped while other clients keep receiving events."""
+    async with connect(f"{server.stream_url}/btcusdt@markPrice") as healthy, connect(f"{server.stream_url}/btcusdt@markPrice") as broken:
+        await receive(healthy, 1)
+        server_ws = [ws for ws in server.connections if (ws, False) in server.stream_clients["btcusdt@markPrice"]]
+        assert len(server_ws) == 2
+
+        async def fail(data):
+            raise ConnectionResetError("Cannot write to closing transport")
+
+        server_ws[1].send_str = fail
+        await receive(healthy, 20)
+        assert len(server.stream_clients["btcusdt@markPrice"]) == 1
+        assert not server.publishers["btcusdt@markPrice"].done()
+
+    # mọi client đã đóng: subscribe lại phải chạy publisher mới
+    await asyncio.sleep(0.05)
+    async with connect(f"{server.combined_stream_url}?streams=btcusdt@markPrice") as ws:
+        messages = await receive(ws, 3)
+    assert all(message["stream"] == "btcusdt@markPrice" for message in messages)
+
+
+async def test_recorded_messages_are_replayed(tmp_path):
+    """Tests that a recorded JSONL file is replayed in order instead of synthetic data."""
+    path = tmp_path / "recorded.jsonl"
+    rows = [{"stream": "btcusdt@bookTicker", "data": {"u": i, "s": "BTCUSDT"}} for i in range(3)]
+    path.write_bytes(b"\n".join(orjson.dumps(row) for row in rows))
+
+    server = await MockBinanceServer(rate=100, recorded=path).start()
+    try:
+        async with connect(f"{server.stream_url}/btcusdt@bookTicker") as ws:
+            messages = await receive(ws, 5)
+    finally:
+        await server.stop()
+    assert [message["u"] for message in messages] == [0, 1, 2, 0, 1]
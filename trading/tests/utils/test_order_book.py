@@ -0,0 +1,56 @@
+# tests/utils/test_order_book.py
+
+import asyncio
+
+from app.utils.Binance.order_book import OrderBook
+
+
+class FakeClient:
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+        self.calls = 0
+
+    async def get_depth(self, symbol, limit=1000):
+        snapshot = self.snapshots[min(self.calls, len(self.snapshots) - 1)]
+        self.calls += 1
+        return snapshot
+
+
+def diff(first, last, previous, bids=(), asks=()):
+    return {"e": "depthUpdate", "E": last, "s": "BTCUSDT", "U": first, "u": last, "pu": previous,
+            "b": [[str(p), str(q)] for p, q in bids], "a": [[str(p), str(q)] for p, q in asks]}
+
+
+SNAPSHOT = {"lastUpdateId": 10, "bids": [["100.0", "1"], ["99.0", "2"]], "asks": [["101.0", "3"], ["102.0", "4"]]}
+
+
+async def test_buffered_diffs_are_applied_after_snapshot():
+    """Tests that diffs received before the snapshot are filtered by update ID and applied in order."""
+    book = OrderBook("BTCUSDT", FakeClient([SNAPSHOT]))
+    await book.on_depth(diff(5, 8, 4, bids=[(98.0, 9)]))               # older than the snapshot, dropped
+    await book.on_depth(diff(9, 12, 8, bids=[(100.5, 1)], asks=[(101.0, 0)]))
+    await book.on_depth(diff(13, 14, 12, bids=[(99.0, 0)]))
+    await asyncio.sleep(0.01)
+
+    assert book.synced and book.last_update_id == 14
+    assert book.top(2) == {"bids": [(100.5, 1.0), (100.0, 1.0)], "asks": [(102.0, 4.0)]}
+    assert book.depth_within(1.0) == (1.0, 4.0)
+    assert book.depth_within(2.0) == (2.0, 4.0)
+    assert book.microprice() == (100.5 * 4 + 102.0 * 1) / 5
+
+
+async def test_gap_in_update_ids_triggers_resync():
+    """Tests that a broken pu chain discards the book and reloads it from a new snapshot."""
+    second = {"lastUpdateId": 30, "bids": [["100.0", "5"]], "asks": [["101.0", "5"]]}
+    client = FakeClient([SNAPSHOT, second])
+    book = OrderBook("BTCUSDT", client)
+    await book.on_depth(diff(9, 11, 8))
+    await asyncio.sleep(0.01)
+    assert book.synced
+
+    await book.on_depth(diff(25, 31, 24, bids=[(100.0, 6)]))        # pu 24 != 11
+    assert not book.synced
+    await asyncio.sleep(0.01)
+
+    assert book.synced and book.resyncs == 1 and client.calls == 2
+    assert book.best_bid() == (100.0, 6.0) and book.last_update_id == 31
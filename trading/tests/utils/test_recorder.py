@@ -0,0 +1,89 @@
+# tests/utils/test_recorder.py
+
+import asyncio
+
+import orjson
+
+from app.utils.Binance.recorder import StreamRecorder, StreamReplayer, read_records, segment_paths
+
+
+def agg_trade(agg_id, symbol="BTCUSDT"):
+    data = {"e": "aggTrade", "E": agg_id, "s": symbol, "a": agg_id, "p": "100.0", "q": "1.0", "f": agg_id, "l": agg_id, "T": agg_id, "m": False}
+    return orjson.dumps({"stream": f"{symbol.lower()}@aggTrade", "data": data}).decode()
+
+
+def test_recorder_rotates_segments_and_reads_back_in_order(tmp_path):
+    """Tests that records are split into segments, control replies are skipped and records read back in order."""
+    recorder = StreamRecorder(tmp_path, segment_bytes=2_000, flush_bytes=512)
+    recorder.record('{"result":null,"id":1}')
+    for i in range(100):
+        recorder.record(agg_trade(i), received_ns=1_000_000 * i)
+    recorder.close()
+
+    assert len(segment_paths(tmp_path)) > 1 and recorder.records == 100
+    records = list(read_records(tmp_path))
+    assert [ns for ns, _ in records] == [1_000_000 * i for i in range(100)]
+    assert records[42][1] == agg_trade(42)
+
+
+def test_truncated_segment_stops_at_last_complete_record(tmp_path):
+    """Tests that a truncated segment (e.g. after a crash) still yields the records that were flushed."""
+    recorder = StreamRecorder(tmp_path)
+    for i in range(50):
+        recorder.record(agg_trade(i), received_ns=i)
+    recorder.flush()
+    path = recorder.segments[0]
+    data = path.read_bytes()
+    recorder.close()
+    path.write_bytes(data[:-20])
+
+    records = list(read_records(tmp_path))
+    assert 0 < len(records) < 50
+    assert records == [(i, agg_trade(i)) for i in range(len(records))]
+
+
+async def test_idle_stream_is_flushed_in_background(tmp_path):
+    """Tests that buffered records are flushed after flush_interval even when no further frame arrives."""
+    recorder = StreamRecorder(tmp_path, flush_interval=0.05)
+    for i in range(5):
+        recorder.record(agg_trade(i), received_ns=i)
+    assert list(read_records(tmp_path)) == []
+
+    await asyncio.sleep(0.2)
+    assert list(read_records(tmp_path)) == [(i, agg_trade(i)) for i in range(5)]
+    flusher = recorder._flusher
+    recorder.close()
+    await asyncio.sleep(0)
+    assert flusher.cancelled()
+
+
+async def test_replayer_feeds_subscriptions_deterministically():
+    """Tests that StreamReplayer replays through the subscribe API, each callback getting its stream's messages in recorded order."""
+    records = []
+    for i in range(300):
+        records.append((i, agg_trade(i, "BTCUSDT" if i % 3 else "ETHUSDT")))
+    records.append((300, orjson.dumps({"e": "markPriceUpdate", "E": 1, "s": "BTCUSDT", "p": "1"}).decode()))
+
+    async def replay():
+        replayer = StreamReplayer(records, speed=None, queue_size=10)
+        await replayer.connect()
+        btc, marks = [], []
+
+        async def on_btc(data):
+            await asyncio.sleep(0)
+            btc.append(data["a"])
+
+        async def on_mark(data):
+            marks.append(data["p"])
+
+        await replayer.subscribe("btcusdt@aggTrade", on_btc)
+        await replayer.subscribe("btcusdt@markPrice", on_mark)
+        assert await replayer.list_subscriptions() == ["btcusdt@aggTrade", "btcusdt@markPrice"]
+        await replayer.run()
+        replayer.dispatcher.close()
+        return btc, marks, replayer.replayed
+
+    btc, marks, replayed = await replay()
+    assert btc == [i for i in range(300) if i % 3]
+    assert marks == ["1"] and replayed == 301
+    assert await replay() == (btc, marks, replayed)
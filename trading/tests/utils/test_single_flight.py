@@ -0,0 +1,87 @@
+# tests/utils/test_single_flight.py
+
+import asyncio
+
+import pytest
+
+from app.utils.timeframe import Timeframe
+from app.utils.Binance.single_flight import SingleFlight, coalesce
+from app.utils.metrics import MetricsRegistry
+
+
+async def test_concurrent_identical_calls_share_one_upstream_call():
+    """Tests that identical concurrent calls (after key normalization) hit upstream once."""
+    flight = SingleFlight()
+    calls = []
+
+    @coalesce("test.klines", flight)
+    async def get_klines(symbol: str, timeframe: Timeframe, limit: int = 1000):
+        calls.append((symbol, timeframe))
+        await asyncio.sleep(0.01)
+        return [symbol]
+
+    results = await asyncio.gather(
+        get_klines("BTCUSDT", Timeframe.M1),
+        get_klines("btcusdt", "1m"),
+        get_klines(symbol="BTCUSDT", timeframe="1m", limit=1000),
+        get_klines("ETHUSDT", "1m"),
+    )
+
+    assert len(calls) == 2
+    assert results[0] is results[1] is results[2]
+    assert flight.stats()["deduplicated"] == 2
+    assert flight.stats()["inflight"] == 0
+
+
+async def test_errors_are_shared_and_not_cached():
+    """Tests that an upstream error reaches every waiter and the next call retries."""
+    flight = SingleFlight()
+    attempts = 0
+
+    async def failing():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("k", failing), flight.do("k", failing), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    with pytest.raises(RuntimeError):
+        await flight.do("k", failing)
+    assert attempts == 2
+
+
+async def test_counters_are_registered_by_request_name():
+    """Tests that calls, upstream, deduplicated, errors and in-flight counters reach the metrics registry per key prefix."""
+    registry = MetricsRegistry()
+    flight = SingleFlight(metrics=registry)
+    release = asyncio.Event()
+
+    @coalesce("test.depth", flight)
+    async def get_depth(symbol: str):
+        await release.wait()
+        return symbol
+
+    @coalesce("test.time", flight)
+    async def get_time():
+        raise RuntimeError("boom")
+
+    def values():
+        return {(m["name"], m["labels"]["request"]): m["value"] for m in registry.snapshot()}
+
+    calls = [asyncio.ensure_future(get_depth(symbol)) for symbol in ("BTCUSDT", "btcusdt", "ETHUSDT")]
+    await asyncio.sleep(0)
+    assert values()[("single_flight_inflight", "test.depth")] == 2
+    release.set()
+    await asyncio.gather(*calls)
+    with pytest.raises(RuntimeError):
+        await get_time()
+
+    snapshot = values()
+    assert snapshot[("single_flight_calls", "test.depth")] == 3
+    assert snapshot[("single_flight_upstream", "test.depth")] == 2
+    assert snapshot[("single_flight_deduplicated", "test.depth")] == 1
+    assert snapshot[("single_flight_inflight", "test.depth")] == 0
+    assert snapshot[("single_flight_errors", "test.time")] == 1
+    assert 'single_flight_deduplicated{request="test.depth"} 1' in registry.to_prometheus()
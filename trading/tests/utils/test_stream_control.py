@@ -0,0 +1,99 @@
+# tests/utils/test_stream_control.py
+
+import asyncio
+import importlib
+import json
+
+import pytest
+
+from app.utils.Binance.StreamFuture import StreamFuture
+from app.utils.Binance.ws_pool import ConnectionLostError
+
+
+class FakeConnection:
+    """Records control messages and replies like Binance (or rejects the streams in `reject`, or never replies if `silent`)."""
+
+    def __init__(self, stream: StreamFuture, reject=(), silent=False):
+        self.stream = stream
+        self.reject = set(reject)
+        self.silent = silent
+        self.sent = []
+
+    async def send(self, message):
+        payload = json.loads(message)
+        self.sent.append(payload)
+        if self.silent:
+            return
+        if self.reject.intersection(payload["params"]):
+            reply = {"error": {"code": 2, "msg": "Invalid request"}, "id": payload["id"]}
+        else:
+            reply = {"result": None, "id": payload["id"]}
+        asyncio.get_running_loop().call_soon(self.stream._on_reply, reply)
+
+
+async def noop(data):
+    pass
+
+
+async def test_concurrent_subscribes_are_batched_with_unique_ids():
+    """Tests that concurrent subscribes are batched into few messages with unique ids and streams only go live once acknowledged."""
+    stream = StreamFuture(control_batch_size=50, control_rate=100)
+    stream.connection = FakeConnection(stream)
+    names = [f"s{i}usdt@aggTrade" for i in range(120)]
+    await stream.subscribe(names[0], noop)
+    await asyncio.gather(*(stream.subscribe(name, noop) for name in names[1:]))
+    sent = stream.connection.sent
+    assert [len(m["params"]) for m in sent] == [1, 50, 50, 19]
+    assert len({m["id"] for m in sent}) == len(sent)
+    assert sorted(stream.live_streams) == sorted(names) and not stream.pending_streams
+    await stream.wait_until_live(names, timeout=1)
+
+    await stream.unsubscribe_multiple(names[:70])
+    assert [len(m["params"]) for m in sent[4:]] == [50, 20]
+    assert all(m["method"] == "UNSUBSCRIBE" for m in sent[4:])
+    assert len(stream.live_streams) == 50
+    stream.dispatcher.close()
+
+
+async def test_rejected_subscribe_raises_and_stays_pending():
+    """Tests that a SUBSCRIBE rejected by the server raises to the caller and the stream is not marked live."""
+    stream = StreamFuture(control_rate=100)
+    stream.connection = FakeConnection(stream, reject={"bad@trade"})
+    with pytest.raises(RuntimeError, match="rejected"):
+        await stream.subscribe("bad@trade", noop)
+    assert stream.pending_streams == ["bad@trade"]
+    with pytest.raises(asyncio.TimeoutError):
+        await stream.wait_until_live(["bad@trade"], timeout=0.05)
+    with pytest.raises(ValueError):
+        await stream.wait_until_live(["other@trade"])
+    stream.dispatcher.close()
+
+
+async def test_reconnect_resubscribes_without_waiting_for_dead_connection(monkeypatch):
+    """Tests that requests stuck on a replaced connection fail right away and the new connection is resubscribed first."""
+    # `app.utils.Binance.StreamFuture` trong package là class, lấy module qua importlib
+    module = importlib.import_module("app.utils.Binance.StreamFuture")
+    stream = StreamFuture(control_rate=100, ack_timeout=30)
+    stream.connection = dead = FakeConnection(stream, silent=True)
+    first = asyncio.create_task(stream.subscribe("a@trade", noop))
+    while not dead.sent:
+        await asyncio.sleep(0)
+    queued = asyncio.create_task(stream.subscribe("b@trade", noop))
+    await asyncio.sleep(0)
+
+    fresh = FakeConnection(stream)
+
+    async def connect(url):
+        return fresh
+
+    monkeypatch.setattr(module, "connect", connect)
+    monkeypatch.setattr(module, "backoff_delay", lambda attempt, base, cap: 0)
+    await stream._reconnect()
+    await asyncio.wait_for(stream._recovery, 1)
+
+    for task in (first, queued):
+        with pytest.raises(ConnectionLostError):
+            await task
+    assert [(m["method"], m["params"]) for m in fresh.sent] == [("SUBSCRIBE", ["a@trade", "b@trade"])]
+    assert sorted(stream.live_streams) == ["a@trade", "b@trade"] and stream.reconnects == 1
+    stream.dispatcher.close()
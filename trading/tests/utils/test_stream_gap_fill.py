@@ -0,0 +1,72 @@
+# tests/utils/test_stream_gap_fill.py
+
+import asyncio
+import importlib
+
+import pytest
+
+from app.utils.Binance.Future import Future
+from app.utils.Binance.Spot import Spot
+from app.utils.Binance.StreamFuture import StreamFuture
+from app.utils.Binance.StreamSpot import StreamSpot
+from app.utils.Binance.mock_server import MockBinanceServer
+
+
+async def wait_for(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.02)):
+        if condition():
+            return
+        await asyncio.sleep(0.02)
+    raise AssertionError("condition not met")
+
+
+@pytest.fixture
+async def server(monkeypatch):
+    # `app.utils.Binance.StreamFuture` trong package là class, lấy module qua importlib
+    for module in ("StreamFuture", "StreamSpot"):
+        monkeypatch.setattr(importlib.import_module(f"app.utils.Binance.{module}"), "backoff_delay", lambda attempt, base, cap: 0.05)
+    server = await MockBinanceServer(rate=200).start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.parametrize("stream_class, client, market", [(StreamFuture, Future, "future"), (StreamSpot, Spot, "spot")])
+async def test_sequence_gap_and_failed_reconnect_are_backfilled(server, monkeypatch, stream_class, client, market):
+    """Tests that a jump in aggTrade IDs and a reconnect whose first backfill fails both end with every ID delivered once, in order."""
+    stream = stream_class(url=server.stream_url, combined=True, url_http=getattr(server, f"{market}_http_url"))
+    ids = []
+
+    async def on_trade(data):
+        ids.append(data["a"])
+
+    await stream.connect()
+    try:
+        await stream.subscribe("btcusdt@aggTrade", on_trade)
+        await wait_for(lambda: len(ids) >= 10)
+
+        # server bỏ qua 30 ID: stream phải tự bù qua REST
+        server.market.live_trade_id["BTCUSDT"] += 30
+        await wait_for(lambda: stream.gap_filled >= 30)
+
+        real = client.__dict__["get_agg_trades"].fn
+        calls = []
+
+        async def flaky(*args, **kwargs):
+            calls.append(kwargs.get("from_id"))
+            if len(calls) == 1:
+                raise RuntimeError("Failed to fetch aggTrades: 503")
+            return await real(*args, **kwargs)
+
+        monkeypatch.setattr(client, "get_agg_trades", flaky)
+        await server.close_connections()
+        await wait_for(lambda: stream.reconnects == 1)
+        received = len(ids)
+        await wait_for(lambda: len(ids) >= received + 10)
+
+        assert len(calls) >= 2
+        assert len(server.connections) == 1  # kết nối của lần phục hồi lỗi đã được đóng
+        assert stream.live_streams == ["btcusdt@aggTrade"]
+    finally:
+        await stream.disconnect()
+
+    assert ids == list(range(ids[0], ids[0] + len(ids)))
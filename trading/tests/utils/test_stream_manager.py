@@ -0,0 +1,71 @@
+# tests/utils/test_stream_manager.py
+
+from app.utils.Binance.dispatch import Dispatcher
+from app.utils.Binance.stream_manager import StreamManager
+
+
+class FakeStream:
+    def __init__(self, control_batch_size=100, **kwargs):
+        self.control_batch_size = control_batch_size
+        self.subscriptions = {}
+        self.dispatcher = Dispatcher()
+        self.sent = []
+        self.connected = False
+
+    async def connect(self):
+        self.connected = True
+
+    async def disconnect(self):
+        self.connected = False
+
+    def is_connected(self):
+        return self.connected
+
+    def stats(self):
+        return self.dispatcher.stats()
+
+    async def subscribe(self, stream_name, callback, policy=None, mode=None, event_format=None):
+        if stream_name not in self.subscriptions:
+            self.subscriptions[stream_name] = []
+            self.sent.append([stream_name])
+        self.subscriptions[stream_name].append(callback)
+        self.dispatcher.add(stream_name, callback, policy=policy, mode=mode, event_format=event_format)
+
+    async def subscribe_multiple(self, stream_names, callback):
+        # như StreamFuture: chia lô theo control_batch_size
+        for i in range(0, len(stream_names), self.control_batch_size):
+            self.sent.append(list(stream_names[i:i + self.control_batch_size]))
+        for stream_name in stream_names:
+            self.subscriptions.setdefault(stream_name, []).append(callback)
+            self.dispatcher.add(stream_name, callback)
+
+    async def unsubscribe(self, stream_name, callback=None):
+        self.dispatcher.remove(stream_name, callback)
+        if callback:
+            self.subscriptions[stream_name].remove(callback)
+            if not self.subscriptions[stream_name]:
+                del self.subscriptions[stream_name]
+        else:
+            del self.subscriptions[stream_name]
+
+
+async def test_streams_are_sharded_and_consolidated():
+    """Tests that subscriptions are spread by the per-connection limit and shards are merged after unsubscribing."""
+    manager = StreamManager(FakeStream, max_streams_per_connection=10, control_batch_size=4)
+    await manager.connect()
+
+    async def callback(data):
+        pass
+
+    symbols = [f"S{i}USDT" for i in range(25)]
+    await manager.subscribe_agg_trades(symbols, callback)
+    assert [s["streams"] for s in manager.stats()] == [10, 10, 5]
+    assert all(shard.control_batch_size == 4 for shard in manager.shards)
+    assert all(len(batch) <= 4 for shard in manager.shards for batch in shard.sent)
+    assert len(manager.subscriptions) == 25
+
+    await manager.unsubscribe_multiple([f"s{i}usdt@aggTrade" for i in range(12)])
+    assert sorted(s["streams"] for s in manager.stats()) == [5, 8]
+    assert set(manager.owner) == {f"s{i}usdt@aggTrade" for i in range(12, 25)}
+    assert all(manager.owner[name].subscriptions[name] == [callback] for name in manager.owner)
+    await manager.disconnect()
@@ -0,0 +1,79 @@
+# tests/utils/test_tick_store.py
+
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.utils.Binance.tick_store import TickStore
+from app.utils.Binance.vision_parser import KlineChunk, TradeChunk
+
+DAY = 86_400_000
+START = 1704067200000  # 2024-01-01
+
+
+def trade_chunks(day, count=1_000, chunk_size=300):
+    ids = np.arange(day * 10_000, day * 10_000 + count)
+    times = START + (day - 1) * DAY + np.arange(count) * 1_000
+    trades = np.column_stack([100.0 + ids % 7, np.ones(count), 100.0 + ids % 7, np.where(ids % 2, -1.0, 1.0)])
+    for i in range(0, count, chunk_size):
+        yield TradeChunk(ids[i:i + chunk_size], times[i:i + chunk_size], trades[i:i + chunk_size])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TickStore(tmp_path)
+    for day in (1, 2, 3):
+        store.write("future", "BTCUSDT", "aggTrades", datetime(2024, 1, day), trade_chunks(day))
+    return store
+
+
+def test_partitions_keep_min_max_stats_and_prune_by_time(store):
+    """Tests that each partition keeps per-column min/max and partitions outside the time range are pruned."""
+    partitions = store.partitions("future", "BTCUSDT", "aggTrades")
+    assert [path.name for path, _ in partitions] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    meta = partitions[1][1]
+    assert meta["rows"] == 1_000 and meta["stats"]["ids"] == [20_000, 20_999]
+    assert meta["stats"]["times"] == [START + DAY, START + DAY + 999_000] and meta["stats"]["direction"] == [-1.0, 1.0]
+
+    selected = store.partitions("future", "BTCUSDT", "aggTrades", start=START + DAY + 500_000, end=START + 2 * DAY)
+    assert [path.name for path, _ in selected] == ["2024-01-02", "2024-01-03"]
+
+
+def test_read_slices_memory_mapped_columns_by_time(store):
+    """Tests that time range reads are views of memory-mapped files matching the written data."""
+    chunk = store.read_trades("future", "BTCUSDT", "aggTrades", start=START + DAY + 10_000, end=START + DAY + 19_000)
+    assert chunk.ids.tolist() == list(range(20_010, 20_020))
+    assert isinstance(chunk.trades.base, np.memmap) or isinstance(chunk.trades, np.memmap)
+    expected = np.concatenate([c.trades for c in trade_chunks(2)])[10:20]
+    assert np.array_equal(chunk.trades, expected)
+
+    week = store.read_trades("future", "BTCUSDT", "aggTrades")
+    assert len(week) == 3_000 and (np.diff(week.times) > 0).all()
+
+
+def test_scan_projects_requested_columns(store):
+    """Tests that only the requested columns are returned, `trades` columns being column views."""
+    parts = list(store.scan("future", "BTCUSDT", "aggTrades", start=START + 2 * DAY, columns=("times", "price")))
+    assert len(parts) == 1 and set(parts[0]) == {"times", "price"}
+    assert parts[0]["price"][:3].tolist() == [100.0 + i % 7 for i in range(30_000, 30_003)]
+    with pytest.raises(ValueError):
+        next(store.scan("future", "BTCUSDT", "aggTrades", columns=("open",)))
+
+
+def test_klines_round_trip(tmp_path):
+    """Tests that klines are written and read back by open time, each interval in its own partitions."""
+    store = TickStore(tmp_path)
+    times = START + np.arange(10) * 60_000
+    klines = np.arange(90, dtype=np.float64).reshape(10, 9)
+    hours = START + np.arange(3) * 3_600_000
+    hour_klines = -np.arange(27, dtype=np.float64).reshape(3, 9)
+    store.write("spot", "ETHUSDT", "klines", datetime(2024, 1, 1), [KlineChunk(times, times + 59_999, klines)], interval="1m")
+    store.write("spot", "ETHUSDT", "klines", datetime(2024, 1, 1), [KlineChunk(hours, hours + 3_599_999, hour_klines)], interval="1h")
+
+    chunk = store.read_klines("spot", "ETHUSDT", "1m", start=START + 120_000, end=START + 240_000)
+    assert chunk.times.tolist() == times[2:5].tolist() and np.array_equal(chunk.klines, klines[2:5])
+    assert np.array_equal(store.read_klines("spot", "ETHUSDT", "1h").klines, hour_klines)
+    assert store.partition_path("spot", "ETHUSDT", "klines", datetime(2024, 1, 1), "1h") == tmp_path / "spot/ETHUSDT/klines/1h/2024-01-01"
+    with pytest.raises(ValueError):
+        store.partitions("spot", "ETHUSDT", "klines")
@@ -0,0 +1,57 @@
+# tests/utils/test_trade_buffer.py
+
+import numpy as np
+
+from app.utils.Binance.events import AggTradeEvent
+from app.utils.Binance.trade_buffer import TradeBuffers, TradeRingBuffer
+from app.utils.calc_average import calc_average_trades
+
+
+def fill(buffer, count, start=0):
+    for i in range(start, start + count):
+        buffer.append(1000 + i * 10, 100.0 + i, 1.0, i % 2 == 1, i)
+
+
+def test_last_returns_view_without_copy():
+    """Tests that last(n) returns a view into the buffer when the data is contiguous."""
+    buffer = TradeRingBuffer(capacity=8)
+    fill(buffer, 5)
+    (view,) = buffer.last(3)
+    assert np.shares_memory(view, buffer.trades)
+    assert view[:, 0].tolist() == [102.0, 103.0, 104.0]
+    assert view[:, 3].tolist() == [1.0, -1.0, 1.0]
+
+
+def test_wraparound_returns_two_views_in_order():
+    """Tests that last/since return two views in time order when the data wraps around the end of the array."""
+    buffer = TradeRingBuffer(capacity=8)
+    fill(buffer, 13)
+    assert len(buffer) == 8 and buffer.total == 13
+    views = buffer.last(6)
+    assert len(views) == 2
+    assert TradeRingBuffer.to_array(views)[:, 0].tolist() == [107.0, 108.0, 109.0, 110.0, 111.0, 112.0]
+    assert TradeRingBuffer.to_array(buffer.last(100))[0, 0] == 105.0
+
+
+def test_time_range_uses_binary_search_across_segments():
+    """Tests that between/since find the right time range even when the data is split into two segments."""
+    buffer = TradeRingBuffer(capacity=8)
+    fill(buffer, 13)  # times 1050..1120 còn giữ
+    prices = lambda views: TradeRingBuffer.to_array(views)[:, 0].tolist()
+    assert prices(buffer.between(1065, 1095)) == [107.0, 108.0, 109.0]
+    assert prices(buffer.since(1100)) == [110.0, 111.0, 112.0]
+    assert prices(buffer.between(0, 1060)) == [105.0, 106.0]
+    assert prices(buffer.since(2000)) == []
+    assert TradeRingBuffer.to_array(buffer.between(1070, 1080, array=buffer.ids)).tolist() == [7, 8]
+
+
+async def test_buffers_feed_calc_average_from_stream_messages():
+    """Tests that TradeBuffers stores aggTrade messages (dict or typed) per symbol in a layout calc_average_trades accepts."""
+    buffers = TradeBuffers(capacity=16)
+    message = {"e": "aggTrade", "E": 1, "s": "BTCUSDT", "a": 1, "p": "100", "q": "2", "f": 1, "l": 1, "T": 1, "m": False}
+    await buffers.on_agg_trade(message)
+    await buffers.on_agg_trade(AggTradeEvent("BTCUSDT", 2, 2, 110.0, 1.0, 2, 2, 2, True))
+    assert "BTCUSDT" in buffers and "ETHUSDT" not in buffers
+    result = calc_average_trades(TradeRingBuffer.to_array(buffers["BTCUSDT"].last(10)))
+    assert result.volume_buy == 2.0 and result.volume_sell == 1.0
+    assert result.high_price == 110.0 and result.low_price == 100.0
@@ -0,0 +1,100 @@
+# tests/utils/test_vision_downloader.py
+
+import hashlib
+import os
+from datetime import datetime
+
+import pytest
+from aiohttp import web
+
+from app.utils.Binance.vision_downloader import VisionDownloader
+
+
+async def serve(root):
+    """Local file server (with HTTP Range support) standing in for data.binance.vision."""
+    app = web.Application()
+    app.router.add_static("/data", root)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/data"
+
+
+def publish(root, name, content, checksum=None, folder="futures/um/daily/aggTrades/BTCUSDT"):
+    folder = root / folder
+    folder.mkdir(parents=True, exist_ok=True)
+    (folder / name).write_bytes(content)
+    digest = checksum or hashlib.sha256(content).hexdigest()
+    (folder / f"{name}.CHECKSUM").write_text(f"{digest}  {name}\n")
+
+
+async def test_download_range_resumes_partial_file_and_verifies_checksum(tmp_path):
+    """Tests that days download in parallel, a partial .part file resumes via Range, existing files are skipped and missing days fail."""
+    server_root, download_dir = tmp_path / "server", tmp_path / "download"
+    contents = {day: os.urandom(300_000 + day) for day in (1, 2, 3)}
+    for day, content in contents.items():
+        publish(server_root, f"BTCUSDT-aggTrades-2024-01-0{day}.zip", content)
+    download_dir.mkdir()
+    (download_dir / "future_BTCUSDT-aggTrades-2024-01-02.zip.part").write_bytes(contents[2][:100_000])
+    (download_dir / "future_BTCUSDT-aggTrades-2024-01-03.zip").write_bytes(contents[3])
+    downloaded = []
+
+    runner, base_url = await serve(server_root)
+    try:
+        async with VisionDownloader(download_dir, concurrency=2, base_url=base_url, chunk_size=65536, retry_delay=0) as downloader:
+            results = await downloader.download_range(
+                "BTCUSDT", "future", "aggTrades", datetime(2024, 1, 1), datetime(2024, 1, 4),
+                on_downloaded=lambda path, date: downloaded.append(date.day),
+            )
+    finally:
+        await runner.cleanup()
+
+    report = downloader.report()
+    assert [result.ok for result in results] == [True, True, True, False]
+    for day, content in contents.items():
+        assert (download_dir / f"future_BTCUSDT-aggTrades-2024-01-0{day}.zip").read_bytes() == content
+    assert results[0].verified and results[1].resumed and results[1].downloaded == len(contents[2]) - 100_000
+    assert results[2].skipped and sorted(downloaded) == [1, 2, 3]
+    assert report["files"] == 2 and report["skipped"] == 1 and report["failed"] == 1
+    assert report["bytes"] == len(contents[1]) + len(contents[2]) - 100_000
+    assert not list(download_dir.glob("*.part"))
+
+
+async def test_checksum_mismatch_leaves_no_file(tmp_path):
+    """Tests that a checksum mismatch is retried and, once retries run out, leaves neither the target nor a .part file."""
+    server_root, download_dir = tmp_path / "server", tmp_path / "download"
+    publish(server_root, "BTCUSDT-aggTrades-2024-01-01.zip", b"corrupted", checksum="0" * 64)
+
+    runner, base_url = await serve(server_root)
+    try:
+        async with VisionDownloader(download_dir, base_url=base_url, retries=1, retry_delay=0) as downloader:
+            [result] = await downloader.download_range("BTCUSDT", "future", "aggTrades", datetime(2024, 1, 1), datetime(2024, 1, 1))
+    finally:
+        await runner.cleanup()
+
+    assert not result.ok and "ChecksumError" in result.error
+    assert not list(download_dir.iterdir())
+
+
+async def test_klines_are_downloaded_from_interval_folder(tmp_path):
+    """Tests that klines URLs include the interval folder and file name, and that klines without an interval are refused."""
+    server_root, download_dir = tmp_path / "server", tmp_path / "download"
+    content = os.urandom(1_000)
+    publish(server_root, "BTCUSDT-1h-2024-01-01.zip", content, folder="spot/daily/klines/BTCUSDT/1h")
+
+    runner, base_url = await serve(server_root)
+    try:
+        async with VisionDownloader(download_dir, base_url=base_url, retry_delay=0) as downloader:
+            assert downloader.url("BTCUSDT", "future", "klines", datetime(2024, 1, 1), interval="1m") == (
+                f"{base_url}/futures/um/daily/klines/BTCUSDT/1m/BTCUSDT-1m-2024-01-01.zip"
+            )
+            [result] = await downloader.download_range("BTCUSDT", "spot", "klines", datetime(2024, 1, 1), datetime(2024, 1, 1), interval="1h")
+            with pytest.raises(ValueError):
+                await downloader.download_range("BTCUSDT", "spot", "klines", datetime(2024, 1, 1), datetime(2024, 1, 1))
+    finally:
+        await runner.cleanup()
+
+    assert result.ok and result.verified
+    assert (download_dir / "spot_BTCUSDT-1h-2024-01-01.zip").read_bytes() == content
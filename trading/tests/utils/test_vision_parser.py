@@ -0,0 +1,84 @@
+# tests/utils/test_vision_parser.py
+
+import zipfile
+from datetime import datetime
+
+import numpy as np
+from aiohttp import web
+
+from app.utils.Binance.vision_downloader import VisionDownloader
+from app.utils.Binance.vision_parser import KlineChunk, TradeChunk, parse_vision_zip, stream_vision_range
+from app.utils.calc_average import calc_average_trades
+
+
+def write_zip(path, name, lines):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(name, "\n".join(lines) + "\n")
+
+
+def agg_trade_lines(count, start_id=0, header=True):
+    lines = ["agg_trade_id,price,quantity,first_trade_id,last_trade_id,transact_time,is_buyer_maker"] if header else []
+    for i in range(start_id, start_id + count):
+        lines.append(f"{i},{100 + i % 10}.5,{1 + i % 3},{i},{i},{1704067200000 + i},{'true' if i % 2 else 'false'}")
+    return lines
+
+
+def test_agg_trades_are_parsed_in_fixed_size_chunks(tmp_path):
+    """Tests that a futures aggTrades file (with header) is read in equal-sized chunks usable by calc_average_trades."""
+    path = tmp_path / "BTCUSDT-aggTrades-2024-01-01.zip"
+    write_zip(path, "BTCUSDT-aggTrades-2024-01-01.csv", agg_trade_lines(2_500))
+
+    chunks = list(parse_vision_zip(path, "aggTrades", chunk_size=1_000))
+    assert [len(chunk) for chunk in chunks] == [1_000, 1_000, 500] and isinstance(chunks[0], TradeChunk)
+    ids = np.concatenate([chunk.ids for chunk in chunks])
+    trades = np.concatenate([chunk.trades for chunk in chunks])
+    assert (ids == np.arange(2_500)).all() and chunks[0].times[0] == 1704067200000
+    assert trades[1].tolist() == [101.5, 2.0, 203.0, -1.0] and trades[2][3] == 1.0
+    assert calc_average_trades(chunks[0].trades) is not None
+
+
+def test_spot_trades_without_header_and_microsecond_klines(tmp_path):
+    """Tests that spot files (no header, True/False, microsecond times) are normalised to milliseconds."""
+    trades_path = tmp_path / "trades.zip"
+    write_zip(trades_path, "BTCUSDT-trades-2025-01-01.csv", [
+        "1,100.0,2.0,200.0,1735689600000000,True,True",
+        "2,101.0,1.0,101.0,1735689600001000,False,True",
+    ])
+    [chunk] = parse_vision_zip(trades_path, "trades")
+    assert chunk.ids.tolist() == [1, 2] and chunk.times.tolist() == [1735689600000, 1735689600001]
+    assert chunk.trades.tolist() == [[100.0, 2.0, 200.0, -1.0], [101.0, 1.0, 101.0, 1.0]]
+
+    klines_path = tmp_path / "klines.zip"
+    write_zip(klines_path, "BTCUSDT-1m-2025-01-01.csv", [
+        "1735689600000000,100,110,90,105,10,1735689659999999,1000,7,4,400,0",
+    ])
+    [chunk] = parse_vision_zip(klines_path, "klines")
+    assert isinstance(chunk, KlineChunk) and chunk.times.tolist() == [1735689600000]
+    assert chunk.close_times.tolist() == [1735689659999]
+    assert chunk.klines.tolist() == [[100, 110, 90, 105, 10, 1000, 7, 4, 400]]
+
+
+async def test_stream_vision_range_downloads_and_parses_in_date_order(tmp_path):
+    """Tests that days download in parallel but chunks come back in date order, skipping missing days."""
+    folder = tmp_path / "server/futures/um/daily/aggTrades/BTCUSDT"
+    folder.mkdir(parents=True)
+    for day in (1, 2, 4):
+        write_zip(folder / f"BTCUSDT-aggTrades-2024-01-0{day}.zip", "trades.csv", agg_trade_lines(300, start_id=day * 1_000))
+
+    app = web.Application()
+    app.router.add_static("/data", tmp_path / "server")
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/data"
+    try:
+        async with VisionDownloader(tmp_path / "download", base_url=base_url, verify_checksum=False, retry_delay=0) as downloader:
+            first_ids = [
+                chunk.ids[0]
+                async for chunk in stream_vision_range(downloader, "BTCUSDT", "future", "aggTrades", datetime(2024, 1, 1), datetime(2024, 1, 4), chunk_size=200)
+            ]
+    finally:
+        await runner.cleanup()
+
+    assert first_ids == [1_000, 1_200, 2_000, 2_200, 4_000, 4_200]
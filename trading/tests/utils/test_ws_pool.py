@@ -0,0 +1,156 @@
+# tests/utils/test_ws_pool.py
+
+import asyncio
+import time
+
+import pytest
+from websockets.exceptions import ConnectionClosed
+
+from app.utils.Binance.mock_server import MockBinanceServer
+from app.utils.Binance.ws_pool import WebSocketPool, WeightLimiter, backoff_delay
+
+
+async def start_pool(pool: WebSocketPool):
+    # start() chỉ chờ kết nối đầu tiên
+    await pool.start()
+    for _ in range(100):
+        if all(connection.is_open() for connection in pool.connections):
+            return
+        await asyncio.sleep(0.01)
+
+def test_backoff_delay_is_jittered_and_capped():
+    """Tests that the backoff delay stays within [base/2, min(cap, base * 2^attempt)]."""
+    for attempt in range(10):
+        delay = backoff_delay(attempt, base=1.0, cap=8.0)
+        assert 0.5 <= delay <= min(8.0, 2 ** attempt)
+    assert len({backoff_delay(5, 1.0, 60.0) for _ in range(20)}) > 1
+    assert backoff_delay(3, base=5.0, cap=0.2) == pytest.approx(0.2)
+
+
+async def test_limiter_waits_for_window_and_block():
+    """Tests that acquire waits until the sliding window frees weight and that block() zeroes the headroom."""
+    limiter = WeightLimiter(limit=10, window=0.2)
+    limiter.add(10)
+    assert limiter.headroom() == 0
+    started = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - started >= 0.15
+    assert limiter.used() == 1
+
+    limiter.block(0.1)
+    assert limiter.blocked() and limiter.headroom() == 0 and limiter.wait_time(1) > 0
+    await asyncio.sleep(0.12)
+    assert not limiter.blocked() and limiter.headroom() == 9
+
+
+async def test_pool_spreads_requests_over_connections():
+    """Tests that the pool answers requests and spreads weight over its connections."""
+    server = await MockBinanceServer().start()
+    pool = WebSocketPool(server.ws_api_url, size=2)
+    try:
+        await start_pool(pool)
+        responses = await asyncio.gather(*(pool.send({"method": "time"}) for _ in range(10)))
+        assert all(response["status"] == 200 for response in responses)
+        stats = pool.stats()
+        assert all(stat["open"] and stat["healthy"] for stat in stats)
+        assert all(stat["used_weight"] > 0 for stat in stats)
+        assert sum(stat["pending"] for stat in stats) == 0
+    finally:
+        await pool.stop()
+        await server.stop()
+
+
+async def test_request_is_rescheduled_when_connection_is_lost():
+    """Tests that a request whose connection drops is resent on the other connection."""
+    server = await MockBinanceServer().start()
+    pool = WebSocketPool(server.ws_api_url, size=2)
+    try:
+        await start_pool(pool)
+        broken = pool.connections[0]
+
+        async def closed_send(message):
+            raise ConnectionClosed(None, None)
+
+        broken.connection.send = closed_send  # hai kết nối ngang nhau: _pick chọn kết nối đầu tiên
+        response = await pool.send({"method": "ping"})
+        assert response["status"] == 200
+        assert pool.rescheduled == 1
+        assert pool.connections[1].limiter.used() == 1
+    finally:
+        await pool.stop()
+        await server.stop()
+
+
+async def test_rate_limited_connection_is_blocked_but_kept_open():
+    """Tests that a 429 blocks the connection, and that request_timeout covers the wait for weight without closing it."""
+    server = await MockBinanceServer(weight_limit=3, ban_factor=100).start()
+    pool = WebSocketPool(server.ws_api_url, size=1, request_timeout=0.2, max_attempts=2)
+    try:
+        await pool.start()
+        for _ in range(3):
+            assert (await pool.send({"method": "ping"}))["status"] == 200
+        assert (await pool.send({"method": "ping"}))["status"] == 429
+
+        connection = pool.connections[0]
+        assert connection.is_open() and not connection.is_healthy()
+        assert pool.is_connected()
+        started = time.monotonic()
+        with pytest.raises(RuntimeError):
+            await pool.send({"method": "ping"})
+        assert time.monotonic() - started < 1.0
+        assert pool.rescheduled == 2
+        assert connection.is_open() and connection.reconnects == 0
+    finally:
+        await pool.stop()
+        await server.stop()
+
+
+async def test_policy_violation_reconnects_with_backoff():
+    """Tests that a 1008 close reconnects the connection after the backoff and blocks its limiter."""
+    server = await MockBinanceServer(weight_limit=2, ban_factor=1).start()
+    pool = WebSocketPool(server.ws_api_url, size=1, request_timeout=1.0, max_attempts=1, backoff_cap=0.2)
+    try:
+        await pool.start()
+        for _ in range(2):
+            await pool.send({"method": "ping"})
+        with pytest.raises(RuntimeError):
+            await pool.send({"method": "ping"})
+
+        connection = pool.connections[0]
+        assert "1008" in connection.last_error
+        for _ in range(50):
+            if connection.is_open():
+                break
+            await asyncio.sleep(0.02)
+        assert connection.is_open() and connection.reconnects == 1
+        assert pool.stats()[0]["open"]
+    finally:
+        await pool.stop()
+        await server.stop()
+
+
+async def test_start_times_out_when_no_connection_opens():
+    """Tests that start() raises a ConnectionError after connect_timeout and stops the pool when nothing connects."""
+    pool = WebSocketPool("ws://127.0.0.1:9/ws-api/v3", size=1, backoff_base=0.05, backoff_cap=0.1, connect_timeout=0.3)
+    started = time.monotonic()
+    with pytest.raises(ConnectionError, match="not connected after 0.3s"):
+        await pool.start()
+    assert time.monotonic() - started < 1.0
+    assert not pool._running and not pool._supervisors
+
+
+async def test_send_waits_before_retrying_when_no_connection_is_picked():
+    """Tests that send() backs off instead of burning its attempts when no connection can be picked."""
+    server = await MockBinanceServer().start()
+    pool = WebSocketPool(server.ws_api_url, size=1, max_attempts=3, backoff_base=0.1)
+    try:
+        await pool.start()
+        pick = pool._pick
+        unavailable_until = time.monotonic() + 0.08
+        # kết nối "vừa bị đóng": _pick không trả về kết nối nào trong 80ms
+        pool._pick = lambda weight, exclude: None if time.monotonic() < unavailable_until else pick(weight, exclude)
+        response = await pool.send({"method": "ping"})
+        assert response["status"] == 200
+    finally:
+        await pool.stop()
+        await server.stop()